@@ -0,0 +1,116 @@
+"""Hot/cold tiering for idle conversations.
+
+Archiving moves a chat's messages out of the hot message collection into one
+compressed document in `chats_archive`; the chat document stays (flagged
+archived) so the sidebar still lists it. Opening the chat restores the messages
+transparently.
+"""
+import os
+import zlib
+from datetime import datetime, timedelta
+import bson
+from bson import Binary
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+ARCHIVE_IDLE_DAYS = int(os.getenv("ARCHIVE_IDLE_DAYS", "90"))
+ARCHIVE_ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "10"))
+
+def compress(data: bytes):
+    """(codec, compressed bytes); zstd when installed, zlib otherwise"""
+    if ZSTD_AVAILABLE:
+        return "zstd", zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("chat was archived with zstd; install zstandard to restore it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def archive_chat(db, chat_id, cutoff, dry_run=False):
+    """Move one idle chat's messages to the cold tier.
+
+    Returns (messages, hot bytes, cold bytes), or None if the chat is not idle.
+    """
+    if db.writer is not None and db.writer.has_pending(chat_id):
+        return None  # still being written to
+    if db.chats.find_one({"fork_of.chat_id": chat_id}, {"_id": 1}) is not None:
+        return None  # forks read their inherited messages from this chat in place
+
+    messages = [
+        {"_id": msg["_id"], "role": msg["role"], "content": msg["content"], "timestamp": msg["timestamp"]}
+        for msg in db.store.all_messages(chat_id)
+    ]
+    # Logical size of the hot copy: one document per message (or its share of a bucket)
+    hot_bytes = sum(len(bson.encode(dict(msg, chat_id=chat_id))) for msg in messages)
+    codec, payload = compress(bson.encode({"messages": messages}))
+    if dry_run or not messages:
+        return len(messages), hot_bytes, len(payload)
+
+    # Claim the chat only if it is still idle; new activity after this point is
+    # newer than anything archived, so it is never deleted below
+    claimed = db.chats.update_one(
+        {**db.chat_filter(chat_id), "updated_at": {"$lt": cutoff}, "archived": {"$ne": True}, "deleted": {"$ne": True}},
+        {"$set": {"archived": True, "archived_at": datetime.utcnow()}}
+    )
+    if not claimed.modified_count:
+        return None
+
+    db.db["chats_archive"].replace_one({"_id": chat_id}, {
+        "_id": chat_id,
+        "codec": codec,
+        "messages": Binary(payload),
+        "message_count": len(messages),
+        "raw_bytes": hot_bytes,
+        "archived_at": datetime.utcnow()
+    }, upsert=True)
+    db.store.delete_through(chat_id, messages[-1]["timestamp"])
+    db.chat_cache.invalidate(chat_id)
+    db.search.forget_chat(chat_id)
+    return len(messages), hot_bytes, len(payload)
+
+def archive_idle_chats(db, idle_days=ARCHIVE_IDLE_DAYS, limit=None, dry_run=False):
+    """Archive every chat idle for idle_days; returns a report of bytes moved and reclaimed"""
+    cutoff = datetime.utcnow() - timedelta(days=idle_days)
+    report = {"chats": 0, "messages": 0, "hot_bytes": 0, "cold_bytes": 0}
+
+    idle = db.chats.find({"updated_at": {"$lt": cutoff}, "archived": {"$ne": True}, "deleted": {"$ne": True}}, {"_id": 1})
+    if limit:
+        idle = idle.limit(limit)
+    for chat in idle:
+        result = archive_chat(db, str(chat["_id"]), cutoff, dry_run)
+        if result is None:
+            continue
+        messages, hot_bytes, cold_bytes = result
+        report["chats"] += 1
+        report["messages"] += messages
+        report["hot_bytes"] += hot_bytes
+        report["cold_bytes"] += cold_bytes
+
+    report["reclaimed_bytes"] = report["hot_bytes"] - report["cold_bytes"]
+    report["codec"] = compress(b"")[0]
+    return report
+
+def restore_chat(db, chat_id):
+    """Move an archived chat's messages back to the hot tier; False if it is not archived"""
+    archived = db.db["chats_archive"].find_one({"_id": chat_id})
+    if archived is not None:
+        messages = bson.decode(decompress(archived["codec"], archived["messages"]))["messages"]
+        # Messages keep their _id, so a restore interrupted after this point is safe to repeat
+        db.store.restore(chat_id, messages)
+        db.search.index_messages(chat_id, messages)
+
+    result = db.chats.update_one(
+        {**db.chat_filter(chat_id), "archived": True},
+        {"$unset": {"archived": "", "archived_at": ""}}
+    )
+    if archived is not None:
+        db.db["chats_archive"].delete_one({"_id": chat_id})
+    db.chat_cache.invalidate(chat_id)
+    return archived is not None or result.modified_count > 0
@@ -0,0 +1,86 @@
+"""Maintenance commands for the chat database.
+
+    cd backend && python -m database.maintenance backfill-summaries
+    cd backend && python -m database.maintenance migrate-buckets [--dry-run] [--keep-flat]
+    cd backend && python -m database.maintenance archive-idle [--days 90] [--dry-run]
+"""
+import argparse
+import sys
+
+from database.mongodb import MongoDB
+from database.message_store import FlatMessageStore, BucketedMessageStore, MESSAGE_BUCKET_SIZE
+from database.archive import archive_idle_chats, ARCHIVE_IDLE_DAYS
+
+def backfill_summaries(db, args):
+    updated = db.backfill_chat_summaries()
+    print(f"✅ Backfilled summaries for {updated} chats")
+
+def migrate_buckets(db, args):
+    """Move every chat's flat messages into sealed buckets, oldest first.
+
+    Safe to run while the app serves traffic with MESSAGE_STORAGE=bucketed and
+    MESSAGE_DUAL_READ=true: reads merge both layouts until the flat copy is gone.
+    """
+    flat = FlatMessageStore(db.db)
+    buckets = BucketedMessageStore(db.db, args.bucket_size)
+    chats = messages = written = 0
+
+    for group in flat.collection.aggregate([{"$group": {"_id": "$chat_id"}}], allowDiskUse=True):
+        chat_id = group["_id"]
+        chat_messages = list(flat.collection.find({"chat_id": chat_id}).sort([("timestamp", 1), ("_id", 1)]))
+        chats += 1
+        messages += len(chat_messages)
+        if args.dry_run or not chat_messages:
+            continue
+
+        written += buckets.insert_buckets(chat_id, chat_messages)
+        if not args.keep_flat:
+            ids = [msg["_id"] for msg in chat_messages]
+            for start in range(0, len(ids), 1000):
+                flat.collection.delete_many({"_id": {"$in": ids[start:start + 1000]}})
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"✅ {action} {messages} messages from {chats} chats into {written} buckets of up to {args.bucket_size}")
+
+def configure_migrate_buckets(parser):
+    parser.add_argument("--bucket-size", type=int, default=MESSAGE_BUCKET_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would move")
+    parser.add_argument("--keep-flat", action="store_true", help="leave the flat messages in place")
+
+def archive_idle(db, args):
+    report = archive_idle_chats(db, args.days, args.limit, args.dry_run)
+    action = "Would archive" if args.dry_run else "Archived"
+    print(f"✅ {action} {report['messages']} messages from {report['chats']} chats idle for {args.days}+ days")
+    print(f"   hot tier: {report['hot_bytes'] / 2**20:.2f} MB -> cold tier: {report['cold_bytes'] / 2**20:.2f} MB ({report['codec']})")
+    print(f"   reclaimed: {report['reclaimed_bytes'] / 2**20:.2f} MB")
+
+def configure_archive_idle(parser):
+    parser.add_argument("--days", type=int, default=ARCHIVE_IDLE_DAYS, help="archive chats idle this long")
+    parser.add_argument("--limit", type=int, default=None, help="archive at most this many chats")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would move")
+
+# name -> (handler, help, argument setup)
+COMMANDS = {
+    "backfill-summaries": (backfill_summaries, "fill message_count/last message fields on older chats", None),
+    "migrate-buckets": (migrate_buckets, "move flat messages into bucketed storage", configure_migrate_buckets),
+    "archive-idle": (archive_idle, "move idle chats to the compressed cold tier", configure_archive_idle),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m database.maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text, configure) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if configure:
+            configure(subparser)
+    args = parser.parse_args(argv)
+
+    db = MongoDB()
+    try:
+        COMMANDS[args.command][0](db, args)
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
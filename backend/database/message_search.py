@@ -0,0 +1,208 @@
+"""Full-text search over message content.
+
+Two backends behind one search():
+- "mongo": a text index on messages.content, ranked by textScore. Used with the
+  flat message layout.
+- "memory": an in-process BM25 inverted index (services.text_index) built from
+  the message store in the background at startup and kept current as messages
+  are saved, archived, restored and deleted. Used where the text index cannot
+  be created (deployments without text search) and with the bucketed layout,
+  where a text index would rank whole buckets rather than messages.
+
+MESSAGE_SEARCH=auto picks mongo when it can. The choice is only made once
+MongoDB answers: while it is unreachable the backend stays unset and the
+next call tries again.
+"""
+import os
+import sys
+import time
+import base64
+import threading
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, TEXT
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
+
+from database.message_store import MESSAGE_PROJECTION
+from services.metrics import summary
+from services.text_index import InvertedIndex, snippet
+
+MESSAGE_SEARCH = os.getenv("MESSAGE_SEARCH", "auto")  # auto | mongo | memory
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "160"))
+
+# chat_id as a suffix key lets a per-chat search filter inside the text index
+TEXT_INDEX = ("content_text", [("content", TEXT), ("chat_id", ASCENDING)])
+
+def encode_search_cursor(hit):
+    """Opaque keyset cursor for a hit: its (score, timestamp, _id)"""
+    raw = f"{hit['score']!r}|{hit['timestamp'].isoformat()}|{hit['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_search_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    score, timestamp, message_id = raw.split("|")
+    return float(score), datetime.fromisoformat(timestamp), ObjectId(message_id)
+
+class MessageSearch:
+    def __init__(self, db, backend=MESSAGE_SEARCH):
+        self.db = db
+        self.requested = backend
+        self.backend = None
+        self.index = InvertedIndex()
+        self.loaded = threading.Event()
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    def ensure_index(self):
+        """Create the text index, or start building the in-memory one.
+
+        Returns the backend in use, or None while MongoDB can't be reached.
+        """
+        with self._lock:
+            if self.backend is not None:
+                return self.backend
+            if self.requested != "memory" and self.db.store.kind == "flat":
+                try:
+                    name, keys = TEXT_INDEX
+                    self.db.messages.create_index(keys, name=name)
+                    self.backend = "mongo"
+                    self.loaded.set()
+                    return self.backend
+                except OperationFailure as e:
+                    # The server refused the index: text search is not supported here
+                    print(f"⚠️ Text index unavailable ({e}); searching with the in-memory index")
+                except PyMongoError as e:
+                    print(f"⚠️ Message search not set up, MongoDB unavailable ({e}); retrying on next use")
+                    return None
+            elif self.requested == "mongo":
+                print("⚠️ Text search needs the flat message layout; searching with the in-memory index")
+
+            self.backend = "memory"
+            self.index = InvertedIndex()
+            self.loaded.clear()
+            threading.Thread(target=self._load, name="search-index", daemon=True).start()
+            return self.backend
+
+    def _load(self):
+        start_time = time.time()
+        try:
+            for msg in self.db.store.iter_messages():
+                self._add(msg["chat_id"], msg["_id"], msg["timestamp"], msg["content"])
+            self.load_seconds = round(time.time() - start_time, 1)
+            print(f"✅ Search index built: {len(self.index)} messages in {self.load_seconds}s")
+        except Exception as e:
+            print(f"Error building search index: {e}; rebuilding on next use")
+            # A partial index would silently miss messages; start over from the store next time
+            with self._lock:
+                self.backend = None
+        finally:
+            self.loaded.set()
+
+    def _add(self, chat_id, message_id, timestamp, content):
+        chat_id = sys.intern(chat_id)
+        # Key order is the tie-break order: newer messages first at equal score
+        self.index.add((timestamp, message_id, chat_id), content, chat_id)
+
+    def index_message(self, chat_id, message_id, timestamp, content):
+        """Keep the in-memory index current with a newly saved message"""
+        if self.backend == "memory":
+            self._add(chat_id, message_id, timestamp, content)
+
+    def index_messages(self, chat_id, messages):
+        if self.backend == "memory":
+            for msg in messages:
+                self._add(chat_id, msg["_id"], msg["timestamp"], msg["content"])
+
+    def forget_chat(self, chat_id):
+        """Drop a deleted or archived chat from the in-memory index"""
+        if self.backend == "memory":
+            self.index.remove_group(chat_id)
+
+    def _mongo_hits(self, query, chat_id, limit, position):
+        match = {"$text": {"$search": query}}
+        if chat_id:
+            match["chat_id"] = chat_id
+        pipeline = [{"$match": match}, {"$addFields": {"score": {"$meta": "textScore"}}}]
+        if position is not None:
+            score, timestamp, message_id = position
+            pipeline.append({"$match": {"$or": [
+                {"score": {"$lt": score}},
+                {"score": score, "timestamp": {"$lt": timestamp}},
+                {"score": score, "timestamp": timestamp, "_id": {"$lt": message_id}}
+            ]}})
+        pipeline += [
+            {"$sort": {"score": -1, "timestamp": -1, "_id": -1}},
+            {"$limit": limit},
+            {"$project": {**MESSAGE_PROJECTION, "chat_id": 1, "score": 1}}
+        ]
+        return list(self.db.messages.aggregate(pipeline))
+
+    def _memory_hits(self, query, chat_id, limit, position):
+        after = None
+        if position is not None:
+            score, timestamp, message_id = position
+            # Keys compare by (timestamp, _id) first, so any chat_id works for the bound
+            after = (score, (timestamp, message_id, ""))
+        ranked = self.index.search(query, limit, group=chat_id, after=after)
+        found = self.db.store.find_messages([(key[2], key[0], key[1]) for _, key in ranked])
+        hits = []
+        for score, (timestamp, message_id, message_chat_id) in ranked:
+            # Missing when archived or purged since it was indexed
+            msg = found.get(message_id)
+            hits.append(dict(msg, score=score) if msg else
+                        {"_id": message_id, "chat_id": message_chat_id, "timestamp": timestamp, "score": score})
+        return hits
+
+    def search(self, query, chat_id=None, limit=20, before=None):
+        """Ranked page of messages matching query, optionally within one chat.
+
+        Returns {"results": [...], "next_cursor": cursor for the next page or None,
+        "backend": "mongo" | "memory", "indexing": True while the in-memory index is still building}.
+        """
+        start_time = time.time()
+        if self.ensure_index() is None:
+            raise ConnectionFailure("message search is unavailable until MongoDB can be reached")
+        position = decode_search_cursor(before) if before else None
+        hits = (self._mongo_hits if self.backend == "mongo" else self._memory_hits)(query, chat_id, limit + 1, position)
+        has_more = len(hits) > limit
+        hits = hits[:limit]
+        next_cursor = encode_search_cursor(hits[-1]) if has_more else None
+
+        chat_ids = list({hit["chat_id"] for hit in hits})
+        chats = {
+            str(chat["_id"]): chat for chat in self.db.chats.find(
+                {"_id": {"$in": [self.db.chat_filter(cid)["_id"] for cid in chat_ids]}}, {"title": 1, "deleted": 1}
+            )
+        } if chat_ids else {}
+
+        results = []
+        for hit in hits:
+            chat = chats.get(hit["chat_id"], {})
+            if "content" not in hit or chat.get("deleted"):
+                continue
+            results.append({
+                "message_id": str(hit["_id"]),
+                "chat_id": hit["chat_id"],
+                "chat_title": chat.get("title"),
+                "role": hit["role"],
+                "timestamp": hit["timestamp"],
+                "score": round(hit["score"], 4),
+                "snippet": snippet(hit["content"], query, SEARCH_SNIPPET_CHARS)
+            })
+
+        summary("search.latency").observe(time.time() - start_time)
+        return {
+            "results": results,
+            "next_cursor": next_cursor,
+            "backend": self.backend,
+            "indexing": not self.loaded.is_set()
+        }
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "indexing": self.backend is not None and not self.loaded.is_set(),
+            "index_build_seconds": self.load_seconds,
+            "index": self.index.stats() if self.backend == "memory" else None,
+            "latency": summary("search.latency").snapshot()
+        }
@@ -0,0 +1,389 @@
+import os
+import math
+from datetime import timedelta
+from pymongo import UpdateOne, UpdateMany, DESCENDING
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+
+# "flat": one document per message; "bucketed": up to MESSAGE_BUCKET_SIZE messages per document
+MESSAGE_STORAGE = os.getenv("MESSAGE_STORAGE", "flat")
+MESSAGE_BUCKET_SIZE = int(os.getenv("MESSAGE_BUCKET_SIZE", "100"))
+# While migrating to buckets, also read (and delete from) the flat collection
+MESSAGE_DUAL_READ = os.getenv("MESSAGE_DUAL_READ", "true").lower() == "true"
+
+# Fields the client renders for a message
+MESSAGE_PROJECTION = {"role": 1, "content": 1, "timestamp": 1}
+
+def _sort_key(msg):
+    return msg["timestamp"], msg["_id"]
+
+def _newest(messages, limit):
+    """Newest `limit` messages (all when limit is None), newest first, without duplicates (by _id)"""
+    seen = set()
+    result = []
+    for msg in sorted(messages, key=_sort_key, reverse=True):
+        if msg["_id"] not in seen:
+            seen.add(msg["_id"])
+            result.append(msg)
+            if len(result) == limit:
+                break
+    return result
+
+def insert_ignoring_duplicates(collection, documents):
+    """insert_many that tolerates documents already written by an earlier attempt"""
+    try:
+        collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        # insert_many assigns _id on the first attempt, so a retried batch that was
+        # partly written reports duplicates for the part that already landed
+        details = e.details or {}
+        if details.get("writeConcernErrors") or any(
+            error.get("code") != 11000 for error in details.get("writeErrors", [])
+        ):
+            raise
+
+class FlatMessageStore:
+    """One document per message in `messages`, indexed on (chat_id, timestamp, _id)"""
+    kind = "flat"
+
+    def __init__(self, db):
+        self.collection = db["messages"]
+        self.parts = [self]
+
+    def insert(self, messages, replay=False):
+        """Insert messages (dicts with chat_id) in one round trip; already idempotent, so replay changes nothing"""
+        insert_ignoring_duplicates(self.collection, messages)
+
+    def page_cursor(self, chat_id, limit, before=None):
+        """Newest-first cursor; before is a decoded (timestamp, _id) keyset position"""
+        query = {"chat_id": chat_id}
+        if before is not None:
+            timestamp, message_id = before
+            # One index range (timestamp <= position); same-timestamp rows at or after the
+            # position are filtered on the index key, so the plan stays a reverse IXSCAN
+            query["timestamp"] = {"$lte": timestamp}
+            query["$nor"] = [{"timestamp": timestamp, "_id": {"$gte": message_id}}]
+        return self.collection.find(query, MESSAGE_PROJECTION).sort(
+            [("timestamp", DESCENDING), ("_id", DESCENDING)]
+        ).limit(limit)
+
+    def page(self, chat_id, limit, before=None):
+        """Up to `limit` messages older than `before`, newest first"""
+        return list(self.page_cursor(chat_id, limit, before))
+
+    def lookup_stages(self, limit):
+        """$lookup stages that attach the newest messages to a chat document"""
+        return [{"$lookup": {
+            "from": self.collection.name,
+            "let": {"chat_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$chat_id", "$$chat_id"]}}},
+                {"$sort": {"timestamp": -1, "_id": -1}},
+                {"$limit": limit},
+                {"$project": MESSAGE_PROJECTION}
+            ],
+            "as": "tail"
+        }}]
+
+    def tail_from_lookup(self, doc, limit):
+        """Pop the looked-up messages off a chat document, newest first"""
+        return doc.pop("tail", [])
+
+    def count(self, chat_id):
+        return self.collection.count_documents({"chat_id": chat_id})
+
+    def all_messages(self, chat_id):
+        """Every message of a chat, oldest first"""
+        return list(self.collection.find({"chat_id": chat_id}).sort([("timestamp", 1), ("_id", 1)]))
+
+    def get_message(self, chat_id, message_id):
+        return self.collection.find_one({"_id": message_id, "chat_id": chat_id}, MESSAGE_PROJECTION)
+
+    def iter_messages(self):
+        """Every stored message (with chat_id), in no particular order"""
+        return self.collection.find({}, {"chat_id": 1, "content": 1, "timestamp": 1})
+
+    def find_messages(self, refs):
+        """Messages by (chat_id, timestamp, _id) reference, as {_id: message}"""
+        ids = [message_id for _, _, message_id in refs]
+        return {msg["_id"]: msg for msg in self.collection.find(
+            {"_id": {"$in": ids}}, {**MESSAGE_PROJECTION, "chat_id": 1}
+        )} if ids else {}
+
+    def restore(self, chat_id, messages):
+        """Write back messages (with their original _id) exported by all_messages()"""
+        if messages:
+            insert_ignoring_duplicates(self.collection, [dict(msg, chat_id=chat_id) for msg in messages])
+
+    def delete_through(self, chat_id, timestamp):
+        """Delete a chat's messages up to and including timestamp"""
+        return self.collection.delete_many({"chat_id": chat_id, "timestamp": {"$lte": timestamp}}).deleted_count
+
+    def delete_chat(self, chat_id):
+        return self.collection.delete_many({"chat_id": chat_id}).deleted_count
+
+    def delete_batch(self, chat_id, limit):
+        """Delete up to `limit` of a chat's oldest messages; returns how many were deleted"""
+        ids = [doc["_id"] for doc in self.collection.find({"chat_id": chat_id}, {"_id": 1}).sort(
+            [("timestamp", 1), ("_id", 1)]
+        ).limit(limit)]
+        if not ids:
+            return 0
+        return self.collection.delete_many({"_id": {"$in": ids}}).deleted_count
+
+class BucketedMessageStore:
+    """Messages packed into per-chat buckets of up to bucket_size in `message_buckets`.
+
+    A bucket is {chat_id, open, count, start_ts, end_ts, messages: [...]}; writes
+    $push into the chat's single open bucket, sealing it and upserting a new one
+    when the messages do not fit, so a long conversation is a handful of documents
+    and index entries instead of one per message.
+    """
+    kind = "bucketed"
+
+    def __init__(self, db, bucket_size=MESSAGE_BUCKET_SIZE):
+        self.collection = db["message_buckets"]
+        self.bucket_size = bucket_size
+        self.parts = [self]
+
+    def insert(self, messages, replay=False):
+        """Append messages (dicts with chat_id) to their chats' buckets in one round trip.
+
+        $push is not idempotent, so a replay (a retry of a write that may have
+        partly landed) first drops the messages that are already in a bucket.
+        """
+        for msg in messages:
+            msg.setdefault("_id", ObjectId())
+        if replay:
+            stored = self.stored_ids(messages)
+            messages = [msg for msg in messages if msg["_id"] not in stored]
+
+        by_chat = {}
+        for msg in messages:
+            by_chat.setdefault(msg["chat_id"], []).append({
+                "_id": msg["_id"], "role": msg["role"], "content": msg["content"], "timestamp": msg["timestamp"]
+            })
+
+        updates = []
+        for chat_id, entries in by_chat.items():
+            for start in range(0, len(entries), self.bucket_size):
+                chunk = entries[start:start + self.bucket_size]
+                room = self.bucket_size - len(chunk)
+                # Seal the open bucket if the chunk does not fit, so the upsert below
+                # either appends to the one open bucket or starts the next one
+                updates.append(UpdateMany(
+                    {"chat_id": chat_id, "open": True, "count": {"$gt": room}},
+                    {"$set": {"open": False}}
+                ))
+                updates.append(UpdateOne(
+                    {"chat_id": chat_id, "open": True, "count": {"$lte": room}},
+                    {
+                        "$push": {"messages": {"$each": chunk}},
+                        "$inc": {"count": len(chunk)},
+                        "$min": {"start_ts": chunk[0]["timestamp"]},
+                        "$max": {"end_ts": chunk[-1]["timestamp"]}
+                    },
+                    upsert=True
+                ))
+        if updates:
+            self.collection.bulk_write(updates, ordered=True)
+
+    def stored_ids(self, messages):
+        """_ids of these messages that are already in their chats' buckets"""
+        ids = [msg["_id"] for msg in messages]
+        if not ids:
+            return set()
+        return {doc["_id"] for doc in self.collection.aggregate([
+            {"$match": {"chat_id": {"$in": list({msg["chat_id"] for msg in messages})}, "messages._id": {"$in": ids}}},
+            {"$unwind": "$messages"},
+            {"$match": {"messages._id": {"$in": ids}}},
+            {"$project": {"_id": "$messages._id"}}
+        ])}
+
+    def insert_buckets(self, chat_id, messages):
+        """Write already-sorted messages as whole, sealed buckets (used by the migration).
+
+        Each bucket's _id is its first message's _id, so re-running a migration
+        that was interrupted does not duplicate buckets.
+        """
+        buckets = []
+        for start in range(0, len(messages), self.bucket_size):
+            chunk = [{
+                "_id": msg["_id"], "role": msg["role"], "content": msg["content"], "timestamp": msg["timestamp"]
+            } for msg in messages[start:start + self.bucket_size]]
+            buckets.append({
+                "_id": chunk[0]["_id"],
+                "chat_id": chat_id,
+                # Sealed: never matched as the open bucket by insert()
+                "open": False,
+                "count": len(chunk),
+                "start_ts": chunk[0]["timestamp"],
+                "end_ts": chunk[-1]["timestamp"],
+                "messages": chunk
+            })
+        if buckets:
+            insert_ignoring_duplicates(self.collection, buckets)
+        return len(buckets)
+
+    def page_cursor(self, chat_id, limit, before=None):
+        """Newest-first cursor over the buckets that can hold messages older than `before`"""
+        query = {"chat_id": chat_id}
+        if before is not None:
+            query["start_ts"] = {"$lte": before[0]}
+        return self.collection.find(query, {"messages": 1, "end_ts": 1}).sort(
+            [("start_ts", DESCENDING), ("_id", DESCENDING)]
+        ).batch_size(math.ceil(limit / self.bucket_size) + 1)
+
+    def page(self, chat_id, limit, before=None):
+        collected = []
+        for bucket in self.page_cursor(chat_id, limit, before):
+            # Stop once this (and so every older) bucket ends before the page's oldest message
+            if len(collected) >= limit and bucket["end_ts"] < _newest(collected, limit)[-1]["timestamp"]:
+                break
+            collected.extend(
+                msg for msg in bucket["messages"]
+                if before is None or _sort_key(msg) < before
+            )
+        return _newest(collected, limit)
+
+    def lookup_stages(self, limit):
+        return [{"$lookup": {
+            "from": self.collection.name,
+            "let": {"chat_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$chat_id", "$$chat_id"]}}},
+                {"$sort": {"start_ts": -1, "_id": -1}},
+                # One extra bucket covers a partly filled newest bucket
+                {"$limit": math.ceil(limit / self.bucket_size) + 1},
+                {"$project": {"messages": 1}}
+            ],
+            "as": "tail_buckets"
+        }}]
+
+    def tail_from_lookup(self, doc, limit):
+        buckets = doc.pop("tail_buckets", [])
+        return _newest([msg for bucket in buckets for msg in bucket["messages"]], limit)
+
+    def count(self, chat_id):
+        result = next(self.collection.aggregate([
+            {"$match": {"chat_id": chat_id}},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}}
+        ]), None)
+        return result["count"] if result else 0
+
+    def all_messages(self, chat_id):
+        buckets = self.collection.find({"chat_id": chat_id}, {"messages": 1})
+        return list(reversed(_newest([msg for bucket in buckets for msg in bucket["messages"]], None)))
+
+    def get_message(self, chat_id, message_id):
+        # A message's _id is minted when it is saved, so its creation time bounds the
+        # bucket's start_ts and the index walk stops at the first bucket holding it
+        latest_start = message_id.generation_time.replace(tzinfo=None) + timedelta(seconds=1)
+        bucket = self.collection.find_one(
+            {"chat_id": chat_id, "start_ts": {"$lte": latest_start}, "messages._id": message_id},
+            {"messages": {"$elemMatch": {"_id": message_id}}},
+            sort=[("start_ts", DESCENDING), ("_id", DESCENDING)]
+        )
+        return bucket["messages"][0] if bucket else None
+
+    def iter_messages(self):
+        for bucket in self.collection.find({}, {"chat_id": 1, "messages": 1}):
+            for msg in bucket["messages"]:
+                yield dict(msg, chat_id=bucket["chat_id"])
+
+    def find_messages(self, refs):
+        # Only the buckets whose time range covers a wanted message (chat_id/start_ts index)
+        if not refs:
+            return {}
+        ids = {message_id for _, _, message_id in refs}
+        buckets = self.collection.find({"$or": [
+            {"chat_id": chat_id, "start_ts": {"$lte": timestamp}, "end_ts": {"$gte": timestamp}}
+            for chat_id, timestamp, _ in refs
+        ]}, {"chat_id": 1, "messages": 1})
+        return {
+            msg["_id"]: dict(msg, chat_id=bucket["chat_id"])
+            for bucket in buckets for msg in bucket["messages"] if msg["_id"] in ids
+        }
+
+    def restore(self, chat_id, messages):
+        self.insert_buckets(chat_id, messages)
+
+    def delete_through(self, chat_id, timestamp):
+        """Delete buckets that only hold messages up to timestamp (a straddling bucket stays)"""
+        return self.collection.delete_many({"chat_id": chat_id, "end_ts": {"$lte": timestamp}}).deleted_count
+
+    def delete_chat(self, chat_id):
+        deleted = self.count(chat_id)
+        self.collection.delete_many({"chat_id": chat_id})
+        return deleted
+
+    def delete_batch(self, chat_id, limit):
+        """Delete the oldest buckets holding about `limit` messages; returns how many messages went"""
+        buckets = list(self.collection.find({"chat_id": chat_id}, {"count": 1}).sort(
+            [("start_ts", 1), ("_id", 1)]
+        ).limit(max(1, limit // self.bucket_size)))
+        if not buckets:
+            return 0
+        self.collection.delete_many({"_id": {"$in": [bucket["_id"] for bucket in buckets]}})
+        return sum(bucket["count"] for bucket in buckets)
+
+class DualReadMessageStore:
+    """Bucketed writes with reads merged from buckets and the legacy flat collection.
+
+    Used while `python -m database.maintenance migrate-buckets` moves chats over;
+    messages keep their _id when migrated, so overlaps are de-duplicated.
+    """
+    kind = "bucketed+flat"
+
+    def __init__(self, primary, legacy):
+        self.primary = primary
+        self.legacy = legacy
+        self.collection = primary.collection
+        self.parts = [primary, legacy]
+
+    def insert(self, messages, replay=False):
+        self.primary.insert(messages, replay)
+
+    def page(self, chat_id, limit, before=None):
+        return _newest(self.primary.page(chat_id, limit, before) + self.legacy.page(chat_id, limit, before), limit)
+
+    def lookup_stages(self, limit):
+        return self.primary.lookup_stages(limit) + self.legacy.lookup_stages(limit)
+
+    def tail_from_lookup(self, doc, limit):
+        return _newest(self.primary.tail_from_lookup(doc, limit) + self.legacy.tail_from_lookup(doc, limit), limit)
+
+    def count(self, chat_id):
+        return self.primary.count(chat_id) + self.legacy.count(chat_id)
+
+    def all_messages(self, chat_id):
+        return list(reversed(_newest(self.primary.all_messages(chat_id) + self.legacy.all_messages(chat_id), None)))
+
+    def get_message(self, chat_id, message_id):
+        return self.primary.get_message(chat_id, message_id) or self.legacy.get_message(chat_id, message_id)
+
+    def iter_messages(self):
+        yield from self.primary.iter_messages()
+        yield from self.legacy.iter_messages()
+
+    def find_messages(self, refs):
+        return {**self.legacy.find_messages(refs), **self.primary.find_messages(refs)}
+
+    def restore(self, chat_id, messages):
+        self.primary.restore(chat_id, messages)
+
+    def delete_through(self, chat_id, timestamp):
+        return self.primary.delete_through(chat_id, timestamp) + self.legacy.delete_through(chat_id, timestamp)
+
+    def delete_chat(self, chat_id):
+        return self.primary.delete_chat(chat_id) + self.legacy.delete_chat(chat_id)
+
+    def delete_batch(self, chat_id, limit):
+        return self.primary.delete_batch(chat_id, limit) or self.legacy.delete_batch(chat_id, limit)
+
+def make_message_store(db, storage=MESSAGE_STORAGE):
+    """Message store for the configured layout"""
+    if storage == "bucketed":
+        buckets = BucketedMessageStore(db)
+        return DualReadMessageStore(buckets, FlatMessageStore(db)) if MESSAGE_DUAL_READ else buckets
+    return FlatMessageStore(db)
@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+from collections import deque
+from pymongo import UpdateOne
+from bson import ObjectId
+
+from services.metrics import summary
+
+# "write_behind" queues messages and flushes them in batches; "sync" writes each one immediately
+MESSAGE_PERSISTENCE = os.getenv("MESSAGE_PERSISTENCE", "write_behind")
+MESSAGE_QUEUE_MAX = int(os.getenv("MESSAGE_QUEUE_MAX", "10000"))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.25"))
+MESSAGE_FLUSH_BATCH = int(os.getenv("MESSAGE_FLUSH_BATCH", "500"))
+# Durability: drain the queue before the process exits (off = pending messages are dropped)
+MESSAGE_FLUSH_ON_SHUTDOWN = os.getenv("MESSAGE_FLUSH_ON_SHUTDOWN", "true").lower() == "true"
+LAST_MESSAGE_PREVIEW_CHARS = 120
+
+def summary_update(messages):
+    """Chat update that folds these messages (oldest first) into the denormalized summary fields"""
+    last = messages[-1]
+    return {
+        "$inc": {"message_count": len(messages)},
+        "$max": {"updated_at": max(msg["timestamp"] for msg in messages)},
+        "$set": {
+            "last_message_preview": " ".join(last["content"].split())[:LAST_MESSAGE_PREVIEW_CHARS],
+            "last_role": last["role"],
+            "last_message_id": last["_id"]
+        }
+    }
+
+def summary_filter(chat_id, messages):
+    """Matches the chat unless summary_update(messages) was already applied to it"""
+    return {"_id": ObjectId(chat_id), "last_message_id": {"$ne": messages[-1]["_id"]}}
+
+class MessageWriter:
+    """Write-behind persistence for chat messages.
+
+    save() queues a message and returns; a background thread flushes the queue
+    every MESSAGE_FLUSH_INTERVAL seconds (or as soon as a batch fills) with one
+    store insert (insert_many, or one bucket bulk write) plus one bulk write with a single coalesced summary update per chat
+    (message_count, last message preview/role, updated_at).
+    When the queue is full save() blocks until the flusher makes room.
+
+    A batch whose write fails is retried unchanged before anything newer, as a
+    replay: the store skips messages that already landed and the chat updates
+    are skipped where the batch's last message is already recorded, so a write
+    that partly succeeded is not counted twice.
+    """
+    def __init__(self, store, chats, max_size: int = MESSAGE_QUEUE_MAX,
+                 interval: float = MESSAGE_FLUSH_INTERVAL, batch_size: int = MESSAGE_FLUSH_BATCH,
+                 flush_on_shutdown: bool = MESSAGE_FLUSH_ON_SHUTDOWN):
+        self.store = store
+        self.chats = chats
+        self.max_size = max_size
+        self.interval = interval
+        self.batch_size = batch_size
+        self.flush_on_shutdown = flush_on_shutdown
+        self._queue = deque()
+        self._retry = []  # batch whose write failed, retried as it is
+        self._pending = {}  # chat_id -> queued message count
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one flush at a time keeps batches in order
+        self._stop = False
+        self._thread = None
+        self.flushed = 0
+        self.flush_errors = 0
+        self.dropped = 0
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+            self._thread.start()
+
+    def save(self, chat_id, role, content, timestamp, message_id=None):
+        """Queue a message for the next flush"""
+        message_data = {
+            "_id": message_id or ObjectId(),
+            "chat_id": chat_id,
+            "role": role,
+            "content": content,
+            "timestamp": timestamp
+        }
+        with self._cond:
+            self._start()
+            while self._depth() >= self.max_size:
+                self._cond.notify_all()
+                self._cond.wait()
+            self._queue.append(message_data)
+            self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def has_pending(self, chat_id) -> bool:
+        with self._cond:
+            return chat_id in self._pending
+
+    def discard(self, chat_id):
+        """Drop queued messages of a chat that is being deleted"""
+        with self._cond:
+            if chat_id in self._pending:
+                self._queue = deque(msg for msg in self._queue if msg["chat_id"] != chat_id)
+                self._retry = [msg for msg in self._retry if msg["chat_id"] != chat_id]
+                del self._pending[chat_id]
+                self._cond.notify_all()
+
+    def _depth(self):
+        return len(self._queue) + len(self._retry)
+
+    def _take_batch(self):
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _release(self, batch):
+        for msg in batch:
+            count = self._pending.get(msg["chat_id"], 0) - 1
+            if count > 0:
+                self._pending[msg["chat_id"]] = count
+            else:
+                self._pending.pop(msg["chat_id"], None)
+
+    def _write(self, batch, replay=False):
+        start_time = time.time()
+        self.store.insert(batch, replay)
+
+        by_chat = {}
+        for msg in batch:
+            by_chat.setdefault(msg["chat_id"], []).append(msg)
+        updates = [
+            UpdateOne(summary_filter(chat_id, messages), summary_update(messages))
+            for chat_id, messages in by_chat.items() if ObjectId.is_valid(chat_id)
+        ]
+        if updates:
+            self.chats.bulk_write(updates, ordered=False)
+
+        summary("mongo.flush_latency").observe(time.time() - start_time)
+        summary("mongo.flush_batch_size").observe(len(batch))
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of messages written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    depth = self._depth()
+                    replay = bool(self._retry)
+                    batch = self._retry if replay else self._take_batch()
+                    self._retry = []
+                if not batch:
+                    return written
+                summary("mongo.write_queue_depth").observe(depth)
+                try:
+                    self._write(batch, replay)
+                except Exception as e:
+                    print(f"Error flushing {len(batch)} messages: {e}")
+                    self.flush_errors += 1
+                    with self._cond:
+                        # Kept apart from the queue so the retry (next interval) writes exactly this batch
+                        self._retry = [msg for msg in batch if msg["chat_id"] in self._pending]
+                        self._cond.notify_all()
+                    raise
+                with self._cond:
+                    self._release(batch)
+                    self.flushed += len(batch)
+                    self._cond.notify_all()
+                written += len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stop and self._depth() < self.batch_size:
+                    self._cond.wait(self.interval)
+                if self._stop:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(self.interval)
+
+    def close(self):
+        """Stop the flusher, draining the queue first when flush_on_shutdown is set"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self.flush_on_shutdown:
+            try:
+                written = self.flush()
+                if written:
+                    print(f"Flushed {written} queued messages on shutdown")
+            except Exception:
+                pass
+        with self._cond:
+            if self._depth():
+                self.dropped += self._depth()
+                print(f"⚠️ {self._depth()} queued messages were not persisted")
+                self._queue.clear()
+                self._retry = []
+                self._pending.clear()
+
+    def stats(self):
+        with self._cond:
+            depth = self._depth()
+        return {
+            "mode": MESSAGE_PERSISTENCE,
+            "queue_depth": depth,
+            "queue_max": self.max_size,
+            "flushed": self.flushed,
+            "flush_errors": self.flush_errors,
+            "dropped": self.dropped,
+            "flush_latency": summary("mongo.flush_latency").snapshot()
+        }
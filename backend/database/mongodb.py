@@ -1,9 +1,20 @@
 
 import os
-from pymongo import MongoClient
+import time
+import base64
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient, ASCENDING, DESCENDING
 from datetime import datetime
 from bson import ObjectId
 from dotenv import load_dotenv
+from database.message_writer import MessageWriter, MESSAGE_PERSISTENCE, LAST_MESSAGE_PREVIEW_CHARS, summary_update, summary_filter
+from database.message_store import make_message_store
+from database.archive import restore_chat
+from database.message_search import MessageSearch
 
 # Load environment variables
 load_dotenv()
@@ -11,13 +22,138 @@ load_dotenv()
 # MongoDB connection
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = "AI_Chat_db"  # Fixed database name
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "32"))
+# Messages removed per round trip when purging a deleted chat
+CHAT_DELETE_BATCH_SIZE = int(os.getenv("CHAT_DELETE_BATCH_SIZE", "1000"))
+CHAT_METADATA_TTL_SECONDS = float(os.getenv("CHAT_METADATA_TTL_SECONDS", "30"))
+CHAT_METADATA_CACHE_SIZE = int(os.getenv("CHAT_METADATA_CACHE_SIZE", "1000"))
+
+# collection -> [(index name, keys)] created by ensure_indexes()
+INDEXES = {
+    "messages": [
+        # _id breaks timestamp ties for keyset pagination; also serves chat_id-only queries
+        ("chat_id_timestamp_id", [("chat_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "message_buckets": [
+        ("chat_id_start_ts_id", [("chat_id", ASCENDING), ("start_ts", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "chats": [
+        # _id breaks updated_at ties for keyset pagination of the sidebar
+        ("user_id_updated_at_id", [("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)]),
+        # Idle-chat scan of the archival job
+        ("updated_at", [("updated_at", ASCENDING)]),
+        # Deletions still to purge, resumed at startup
+        ("deleted", [("deleted", ASCENDING)]),
+        # Forks of a chat, found when it is deleted or archived
+        ("fork_of_chat_id", [("fork_of.chat_id", ASCENDING)]),
+    ],
+}
+
+# Fields the sidebar renders for a chat (no system prompt)
+CHAT_SUMMARY_PROJECTION = {
+    "title": 1, "model": 1, "created_at": 1, "updated_at": 1,
+    "message_count": 1, "last_message_preview": 1, "last_role": 1
+}
+
+def encode_cursor(doc, field="timestamp"):
+    """Opaque keyset cursor for a document: its (field, _id)"""
+    raw = f"{doc[field].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    timestamp, message_id = raw.rsplit("|", 1)
+    return datetime.fromisoformat(timestamp), ObjectId(message_id)
+
+def chat_filter(chat_id):
+    return {"_id": ObjectId(chat_id)} if ObjectId.is_valid(chat_id) else {"_id": chat_id}
+
+def fork_bound(chat):
+    """Keyset position of the last message a fork inherits, or None for an ordinary chat"""
+    fork_of = (chat or {}).get("fork_of")
+    return (fork_of["timestamp"], fork_of["message_id"]) if fork_of else None
+
+def _just_after(position):
+    # Exclusive page bound that still includes the message at `position`
+    timestamp, message_id = position
+    return timestamp, ObjectId(f"{int(str(message_id), 16) + 1:024x}")
+
+class ChatMetadataCache:
+    """Short-lived read-through cache of chat documents (system prompt, title, settings).
+
+    Writes through this MongoDB instance invalidate their entry; the TTL bounds
+    staleness from writers elsewhere.
+    """
+    def __init__(self, ttl_seconds=CHAT_METADATA_TTL_SECONDS, max_entries=CHAT_METADATA_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # chat_id -> (expires_at, chat)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chat_id):
+        """(found, chat) - a cached None means the chat is known not to exist"""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(chat_id, None)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(chat_id)
+            self.hits += 1
+            return True, dict(entry[1]) if entry[1] is not None else None
+
+    def put(self, chat_id, chat):
+        with self._lock:
+            self._entries[chat_id] = (time.monotonic() + self.ttl_seconds, dict(chat) if chat is not None else None)
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, chat_id):
+        with self._lock:
+            self._entries.pop(chat_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
 
 class MongoDB:
-    def __init__(self):
-        self.client = MongoClient(MONGO_URI)
-        self.db = self.client[DB_NAME]
+    chat_filter = staticmethod(chat_filter)
+    
+    def __init__(self, db_name=DB_NAME):
+        self.client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+        self.db = self.client[db_name]
         self.chats = self.db["chats"]
         self.messages = self.db["messages"]
+        self.store = make_message_store(self.db)
+        self.writer = MessageWriter(self.store, self.chats) if MESSAGE_PERSISTENCE == "write_behind" else None
+        self.chat_cache = ChatMetadataCache()
+        self.search = MessageSearch(self)
+    
+    def ensure_indexes(self):
+        """Create the indexes every query path relies on (idempotent)"""
+        try:
+            for collection, indexes in INDEXES.items():
+                for name, keys in indexes:
+                    self.db[collection].create_index(keys, name=name)
+            print("✅ MongoDB indexes ensured")
+            return True
+        except Exception as e:
+            print(f"Error ensuring indexes: {e}")
+            return False
+    
+    def chats_cursor(self, user_id, limit, before=None):
+        """Most recently updated first cursor behind get_all_chats (also explained by database.query_plans)"""
+        query = {"user_id": user_id, "deleted": {"$ne": True}}
+        if before is not None:
+            updated_at, chat_id = before
+            query["updated_at"] = {"$lte": updated_at}
+            query["$nor"] = [{"updated_at": updated_at, "_id": {"$gte": chat_id}}]
+        return self.chats.find(query, CHAT_SUMMARY_PROJECTION).sort(
+            [("updated_at", DESCENDING), ("_id", DESCENDING)]
+        ).limit(limit)
     
     def create_chat(self, user_id="anonymous", title="New Chat", model="gemini-2.0-flash", system_prompt=None):
         """Create a new chat and return its ID"""
@@ -26,7 +162,10 @@ class MongoDB:
             "title": title,
             "model": model,
             "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "updated_at": datetime.utcnow(),
+            "message_count": 0,
+            "last_message_preview": "",
+            "last_role": None
         }
         
         if system_prompt:
@@ -36,91 +175,345 @@ class MongoDB:
         return str(result.inserted_id)
     
     def save_message(self, chat_id, role, content):
-        """Save a message to the chat history"""
+        """Save a message to the chat history (queued for the next batch in write-behind mode)"""
+        message_id = ObjectId()
+        timestamp = datetime.utcnow()
+        if self.writer is not None:
+            try:
+                self.writer.save(chat_id, role, content, timestamp, message_id)
+                self.search.index_message(chat_id, message_id, timestamp, content)
+                return True
+            except Exception as e:
+                print(f"Error queueing message: {e}")
+                return False
+        
         try:
             message_data = {
+                "_id": message_id,
                 "chat_id": chat_id,
                 "role": role,
                 "content": content,
-                "timestamp": datetime.utcnow()
+                "timestamp": timestamp
             }
             
-            self.messages.insert_one(message_data)
+            self.store.insert([message_data])
+            self.search.index_message(chat_id, message_id, timestamp, content)
             
-            # Update chat's last updated timestamp
+            # Count, preview and updated_at change together in one atomic update
             if ObjectId.is_valid(chat_id):
-                self.chats.update_one(
-                    {"_id": ObjectId(chat_id)}, 
-                    {"$set": {"updated_at": datetime.utcnow()}}
-                )
+                self.chats.update_one(summary_filter(chat_id, [message_data]), summary_update([message_data]))
             
             return True
         except Exception as e:
             print(f"Error saving message: {e}")
             return False
     
-    def get_chat_history(self, chat_id, limit=50):
-        """Get messages for a specific chat"""
+    def get_chat_history_page(self, chat_id, limit=50, before=None):
+        """Page of a chat's messages ending just before the `before` cursor (newest page by default).
+
+        Returns {"messages": [...oldest first], "next_cursor": cursor for the older page or None}.
+        """
         try:
-            messages = list(self.messages.find(
-                {"chat_id": chat_id}
-            ).sort("timestamp", 1).limit(limit))
+            # Read-your-writes: persist this chat's queued messages first
+            if self.writer is not None and self.writer.has_pending(chat_id):
+                self.writer.flush()
+            
+            chat = self.get_chat_by_id(chat_id)
+            # Opening an archived chat brings its messages back to the hot tier
+            if before is None and (chat or {}).get("archived"):
+                restore_chat(self, chat_id)
+            
+            position = decode_cursor(before) if before else None
+            messages = self.page_segments(self.fork_segments(chat_id, chat), limit + 1, position)
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1]) if has_more else None
+            messages.reverse()
             
             # Convert ObjectId to string
             for msg in messages:
                 if "_id" in msg:
                     msg["_id"] = str(msg["_id"])
                     
-            return messages
+            return {"messages": messages, "next_cursor": next_cursor}
         except Exception as e:
             print(f"Error getting chat history: {e}")
-            return []
+            return {"messages": [], "next_cursor": None}
+    
+    def get_chat_history(self, chat_id, limit=50):
+        """Get the newest `limit` messages of a chat, oldest first"""
+        return self.get_chat_history_page(chat_id, limit)["messages"]
     
     def get_chat_by_id(self, chat_id):
-        """Get a chat by its ID"""
+        """Get a chat by its ID (read through the metadata cache)"""
         try:
-            if ObjectId.is_valid(chat_id):
-                chat = self.chats.find_one({"_id": ObjectId(chat_id)})
-            else:
-                chat = self.chats.find_one({"_id": chat_id})
+            found, chat = self.chat_cache.get(chat_id)
+            if found:
+                return chat
+            
+            chat = self.chats.find_one(chat_filter(chat_id))
+            if chat and chat.get("deleted"):
+                chat = None
             
             if chat and "_id" in chat:
                 chat["_id"] = str(chat["_id"])
-                    
+            
+            self.chat_cache.put(chat_id, chat)
             return chat
         except Exception as e:
             print(f"Error getting chat by ID: {e}")
             return None
     
-    def get_all_chats(self, user_id="anonymous", limit=20):
-        """Get all chats for a user"""
+    def fork_segments(self, chat_id, chat=None):
+        """[(chat_id, bound)] for a chat and each ancestor it was forked from.
+
+        bound is the (timestamp, _id) of the last message inherited from that
+        ancestor (None for the chat itself); segments go newest to oldest.
+        """
+        segments = [(chat_id, None)]
+        while chat and chat.get("fork_of") and len(segments) <= 100:
+            segments.append((chat["fork_of"]["chat_id"], fork_bound(chat)))
+            chat = self.get_chat_by_id(chat["fork_of"]["chat_id"])
+        return segments
+    
+    def page_segments(self, segments, limit, before=None):
+        """Up to `limit` messages older than `before` across fork segments, newest first"""
+        messages = []
+        for chat_id, bound in segments:
+            upper = before
+            if bound is not None and (upper is None or upper > _just_after(bound)):
+                upper = _just_after(bound)
+            messages += self.store.page(chat_id, limit - len(messages), upper)
+            if len(messages) >= limit:
+                break
+        return messages
+    
+    def hydration_pipeline(self, chat_id, limit):
+        """One aggregation returning the chat document with its newest `limit` messages"""
+        return [{"$match": chat_filter(chat_id)}] + self.store.lookup_stages(limit)
+    
+    def hydrate_conversation(self, chat_id, limit=50):
+        """Chat document and its newest `limit` messages (oldest first) in one round trip.
+
+        Returns (chat, messages); chat is None when there is no chat document.
+        """
         try:
-            chats = list(self.chats.find(
-                {"user_id": user_id}
-            ).sort("updated_at", -1).limit(limit))
+            # Read-your-writes: persist this chat's queued messages first
+            if self.writer is not None and self.writer.has_pending(chat_id):
+                self.writer.flush()
+            
+            result = next(self.chats.aggregate(self.hydration_pipeline(chat_id, limit)), None)
+            if result is not None and result.get("deleted"):
+                self.chat_cache.put(chat_id, None)
+                return None, []
+            if result is not None and result.get("archived"):
+                restore_chat(self, chat_id)
+                result = next(self.chats.aggregate(self.hydration_pipeline(chat_id, limit)), None)
+            if result is None:
+                # Messages saved under an ID with no chat document (older clients)
+                self.chat_cache.put(chat_id, None)
+                return None, self.get_chat_history(chat_id, limit)
+            
+            messages = self.store.tail_from_lookup(result, limit)
+            if result.get("fork_of") and len(messages) < limit:
+                # Continue into the inherited prefix
+                messages += self.page_segments(self.fork_segments(chat_id, result)[1:], limit - len(messages))
+            messages.reverse()
+            for msg in messages:
+                msg["_id"] = str(msg["_id"])
+            result["_id"] = str(result["_id"])
+            self.chat_cache.put(chat_id, result)
+            return result, messages
+        except Exception as e:
+            print(f"Error hydrating conversation: {e}")
+            return None, []
+    
+    def ensure_search_index(self):
+        """Set up message search (text index, or the in-memory fallback); returns the backend"""
+        return self.search.ensure_index()
+    
+    def search_messages(self, query, chat_id=None, limit=20, before=None):
+        """Ranked page of messages matching query; see MessageSearch.search"""
+        return self.search.search(query, chat_id, limit, before)
+    
+    def get_chats_page(self, user_id="anonymous", limit=20, before=None):
+        """Page of chat summaries, most recently updated first.
+
+        Returns {"chats": [...], "next_cursor": cursor for the next page or None}.
+        """
+        try:
+            position = decode_cursor(before) if before else None
+            chats = list(self.chats_cursor(user_id, limit + 1, position))
+            has_more = len(chats) > limit
+            chats = chats[:limit]
+            next_cursor = encode_cursor(chats[-1], "updated_at") if has_more else None
             
             # Convert ObjectId to string
             for chat in chats:
                 if "_id" in chat:
                     chat["_id"] = str(chat["_id"])
                     
-            return chats
+            return {"chats": chats, "next_cursor": next_cursor}
         except Exception as e:
             print(f"Error getting all chats: {e}")
-            return []
+            return {"chats": [], "next_cursor": None}
     
-    def delete_chat(self, chat_id):
-        """Delete a chat and all its messages"""
+    def get_all_chats(self, user_id="anonymous", limit=20):
+        """Get the most recently updated chat summaries for a user"""
+        return self.get_chats_page(user_id, limit)["chats"]
+    
+    def backfill_chat_summaries(self):
+        """Compute message_count/last message fields for chats created before they existed"""
+        updated = 0
+        for chat in self.chats.find({"message_count": {"$exists": False}}, {"_id": 1}):
+            chat_id = str(chat["_id"])
+            count = self.store.count(chat_id)
+            last = next(iter(self.store.page(chat_id, 1)), None)
+            self.chats.update_one({"_id": chat["_id"]}, {"$set": {
+                "message_count": count,
+                "last_message_preview": " ".join(last["content"].split())[:LAST_MESSAGE_PREVIEW_CHARS] if last else "",
+                "last_role": last["role"] if last else None
+            }})
+            updated += 1
+        return updated
+    
+    def fork_chat(self, chat_id, message_id=None, title=None, model=None, window=None):
+        """Branch a chat after one of its messages (its newest by default) without copying any.
+
+        The fork records the chat that owns that message and its position, and
+        stores only its own new messages; reads continue into the inherited
+        prefix. Returns {"chat_id", "message_id", "newer"} or None if the chat or
+        message does not exist. newer is how many of the newest `window` messages
+        of the source come after the fork point (None when it is further back).
+        """
         try:
-            # Delete all messages in the chat
-            self.messages.delete_many({"chat_id": chat_id})
+            # The fork point may still be queued
+            if self.writer is not None and self.writer.has_pending(chat_id):
+                self.writer.flush()
             
-            # Delete the chat itself
-            if ObjectId.is_valid(chat_id):
-                self.chats.delete_one({"_id": ObjectId(chat_id)})
-            else:
-                self.chats.delete_one({"_id": chat_id})
+            source = self.get_chat_by_id(chat_id)
+            if source is None:
+                return None
+            if source.get("archived"):
+                restore_chat(self, chat_id)
+            segments = self.fork_segments(chat_id, source)
+            
+            message = owner = None
+            for seg_chat, bound in segments:
+                if message_id is None:
+                    newest = self.store.page(seg_chat, 1, _just_after(bound) if bound else None)
+                    found = newest[0] if newest else None
+                elif ObjectId.is_valid(message_id):
+                    found = self.store.get_message(seg_chat, ObjectId(message_id))
+                    if found is not None and bound is not None and (found["timestamp"], found["_id"]) > bound:
+                        found = None
+                else:
+                    break
+                if found is not None:
+                    message, owner = found, seg_chat
+                    break
+            if message is None:
+                return None
             
+            newer = None
+            if window:
+                recent = self.page_segments(segments, window)
+                newer = next((i for i, msg in enumerate(recent) if msg["_id"] == message["_id"]), None)
+            
+            now = datetime.utcnow()
+            fork = {
+                "user_id": source.get("user_id", "anonymous"),
+                "title": title or source.get("title", "New Chat"),
+                "model": model or source.get("model"),
+                "created_at": now,
+                "updated_at": now,
+                # Counts the fork's own messages
+                "message_count": 0,
+                "last_message_preview": " ".join(message["content"].split())[:LAST_MESSAGE_PREVIEW_CHARS],
+                "last_role": message["role"],
+                # Always the chat that stores the message, so fork chains do not grow through inherited prefixes
+                "fork_of": {"chat_id": owner, "message_id": message["_id"], "timestamp": message["timestamp"]}
+            }
+            for field in ("system_prompt", "response_cache"):
+                if field in source:
+                    fork[field] = source[field]
+            
+            result = self.chats.insert_one(fork)
+            return {"chat_id": str(result.inserted_id), "message_id": str(message["_id"]), "newer": newer}
+        except Exception as e:
+            print(f"Error forking chat: {e}")
+            return None
+    
+    def detach_forks(self, chat_id):
+        """Copy what each fork inherits from a chat about to be purged into the fork itself.
+
+        This is the copy in copy-on-write: the only time forked messages are
+        duplicated. A fork of a fork then inherits from the deleted chat's own
+        parent. Returns the number of messages copied.
+        """
+        parent = self.chats.find_one(chat_filter(chat_id), {"fork_of": 1}) or {}
+        copied = 0
+        for child in self.chats.find({"fork_of.chat_id": chat_id}, {"fork_of": 1}):
+            child_id = str(child["_id"])
+            bound = fork_bound(child)
+            messages = [
+                {"_id": ObjectId(), "role": msg["role"], "content": msg["content"], "timestamp": msg["timestamp"]}
+                for msg in self.store.all_messages(chat_id) if (msg["timestamp"], msg["_id"]) <= bound
+            ]
+            self.store.restore(child_id, messages)
+            self.search.index_messages(child_id, messages)
+            
+            update = {"$inc": {"message_count": len(messages)}}
+            if parent.get("fork_of"):
+                update["$set"] = {"fork_of": parent["fork_of"]}
+            else:
+                update["$unset"] = {"fork_of": ""}
+            self.chats.update_one({"_id": child["_id"]}, update)
+            self.chat_cache.invalidate(child_id)
+            copied += len(messages)
+        return copied
+    
+    def mark_chats_deleted(self, chat_ids):
+        """Flag chats deleted so every read path hides them; returns how many chats were flagged.
+
+        The messages stay until purged with delete_message_batch()/finish_chat_deletion().
+        """
+        for chat_id in chat_ids:
+            if self.writer is not None:
+                self.writer.discard(chat_id)
+            self.chat_cache.invalidate(chat_id)
+            self.search.forget_chat(chat_id)
+        result = self.chats.update_many(
+            {"_id": {"$in": [chat_filter(chat_id)["_id"] for chat_id in chat_ids]}},
+            {"$set": {"deleted": True, "deleted_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+    
+    def pending_deletions(self):
+        """IDs of chats flagged deleted whose purge has not finished"""
+        return [str(chat["_id"]) for chat in self.chats.find({"deleted": True}, {"_id": 1})]
+    
+    def delete_message_batch(self, chat_id, limit=CHAT_DELETE_BATCH_SIZE):
+        """Delete up to `limit` messages of a chat; returns how many were deleted (0 when none are left)"""
+        return self.store.delete_batch(chat_id, limit)
+    
+    def finish_chat_deletion(self, chat_id):
+        """Remove a purged chat's archive and document, and any message that raced the purge"""
+        if self.writer is not None:
+            self.writer.discard(chat_id)
+        self.db["chats_archive"].delete_one({"_id": chat_id})
+        self.chats.delete_one(chat_filter(chat_id))
+        self.chat_cache.invalidate(chat_id)
+        return self.store.delete_chat(chat_id)
+    
+    def delete_chat(self, chat_id):
+        """Delete a chat and all its messages, in batches"""
+        try:
+            self.mark_chats_deleted([chat_id])
+            self.detach_forks(chat_id)
+            while self.delete_message_batch(chat_id):
+                pass
+            self.finish_chat_deletion(chat_id)
             return True
         except Exception as e:
             print(f"Error deleting chat: {e}")
@@ -129,6 +522,7 @@ class MongoDB:
     def update_system_prompt(self, chat_id, system_prompt):
         """Update the system prompt for a chat"""
         try:
+            self.chat_cache.invalidate(chat_id)
             if ObjectId.is_valid(chat_id):
                 result = self.chats.update_one(
                     {"_id": ObjectId(chat_id)},
@@ -144,3 +538,61 @@ class MongoDB:
         except Exception as e:
             print(f"Error updating system prompt: {e}")
             return False
+
+    def update_chat_title(self, chat_id, title):
+        """Update the title of a chat"""
+        try:
+            self.chat_cache.invalidate(chat_id)
+            result = self.chats.update_one(chat_filter(chat_id), {"$set": {"title": title}})
+            return result.matched_count > 0
+        except Exception as e:
+            print(f"Error updating chat title: {e}")
+            return False
+
+    def update_response_cache_setting(self, chat_id, enabled):
+        """Enable or disable response caching for a chat"""
+        try:
+            self.chat_cache.invalidate(chat_id)
+            result = self.chats.update_one(chat_filter(chat_id), {"$set": {"response_cache": enabled}})
+            return result.matched_count > 0
+        except Exception as e:
+            print(f"Error updating response cache setting: {e}")
+            return False
+
+    def close(self):
+        """Flush queued messages (per MESSAGE_FLUSH_ON_SHUTDOWN) and close the client"""
+        if self.writer is not None:
+            self.writer.close()
+        self.client.close()
+
+
+class AsyncMongoDB:
+    """Awaitable view of MongoDB for the async request path.
+
+    Every method of the wrapped MongoDB instance becomes a coroutine that runs on
+    a dedicated executor sized to the driver's connection pool, so blocking
+    pymongo round trips never stall the event loop.
+    """
+    def __init__(self, db=None):
+        self.db = db or MongoDB()
+        self.executor = ThreadPoolExecutor(
+            max_workers=MONGO_MAX_POOL_SIZE,
+            thread_name_prefix="mongo"
+        )
+    
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+        
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(attr, *args, **kwargs))
+        
+        call.__name__ = name
+        return call
+    
+    def close(self):
+        """Drain pending calls and close the underlying client"""
+        self.executor.shutdown(wait=True)
+        self.db.close()
@@ -0,0 +1,133 @@
+"""Query-plan check for the Mongo data layer.
+
+Runs explain() on the query behind each data-access method against a scratch
+database on the local mongod and fails if any plan contains a collection scan
+or an in-memory sort:
+
+    cd backend && python -m database.query_plans
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from database.mongodb import MongoDB
+
+QUERY_PLAN_DB = os.getenv("QUERY_PLAN_DB", "AI_Chat_db_plan_check")
+FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+
+def plan_stages(plan):
+    """All stage names in an explain() plan tree (classic and SBE layouts)"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key in ("queryPlan", "inputStage", "outerStage", "innerStage"):
+            if key in plan:
+                stages.extend(plan_stages(plan[key]))
+        for child in plan.get("inputStages", []):
+            stages.extend(plan_stages(child))
+    return stages
+
+def explain_stages(explain):
+    """Stage names of a find/delete/aggregate explain, including $lookup collection scans"""
+    if "stages" not in explain:
+        return plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    stages = []
+    for stage in explain["stages"]:
+        if "$cursor" in stage:
+            stages.extend(explain_stages(stage["$cursor"]))
+        elif "$lookup" in stage:
+            # Reported with executionStats verbosity (MongoDB 5.0+)
+            stages.append("COLLSCAN" if stage.get("collectionScans") else "$lookup")
+        else:
+            stages.extend(name for name in stage if name.startswith("$"))
+    return stages
+
+def seed(db):
+    """A few chats and messages so the planner has real collections to plan against"""
+    chat_ids = []
+    now = datetime.utcnow()
+    for i in range(3):
+        chat_ids.append(db.chats.insert_one({
+            "user_id": "anonymous" if i < 2 else "someone-else",
+            "title": f"Chat {i}",
+            "model": "gemini-2.0-flash",
+            "created_at": now,
+            "updated_at": now + timedelta(seconds=i)
+        }).inserted_id)
+    for store in db.store.parts:
+        store.insert([{
+            "chat_id": str(chat_id),
+            "role": "user" if j % 2 == 0 else "assistant",
+            "content": f"message {j}",
+            "timestamp": now + timedelta(seconds=j)
+        } for chat_id in chat_ids for j in range(10)])
+    return [str(chat_id) for chat_id in chat_ids]
+
+def query_checks(db, chat_id):
+    """(method name, explain output) for every read/delete path in MongoDB"""
+    return [
+        *[check for store in db.store.parts for check in [
+            (f"get_chat_history [{store.kind}]", store.page_cursor(chat_id, 50).explain()),
+            (f"get_chat_history_page [{store.kind}]", store.page_cursor(chat_id, 50, (datetime.utcnow(), ObjectId())).explain()),
+        ]],
+        ("hydrate_conversation", db.db.command("explain", {
+            "aggregate": "chats",
+            "pipeline": db.hydration_pipeline(chat_id, 40),
+            "cursor": {}
+        }, verbosity="executionStats")),
+        ("get_all_chats", db.chats_cursor("anonymous", 20).explain()),
+        ("get_chats_page", db.chats_cursor("anonymous", 20, (datetime.utcnow(), ObjectId())).explain()),
+        ("archive_idle_chats", db.chats.find({"updated_at": {"$lt": datetime.utcnow()}, "archived": {"$ne": True}, "deleted": {"$ne": True}}, {"_id": 1}).explain()),
+        ("pending_deletions", db.chats.find({"deleted": True}, {"_id": 1}).explain()),
+        ("get_chat_by_id", db.chats.find({"_id": ObjectId(chat_id)}).explain()),
+        *[(f"delete_chat [{store.kind}]", db.db.command("explain", {
+            "delete": store.collection.name,
+            "deletes": [{"q": {"chat_id": chat_id}, "limit": 0}]
+        }, verbosity="queryPlanner")) for store in db.store.parts],
+        *[(f"delete_message_batch [{store.kind}]", store.collection.find({"chat_id": chat_id}, {"_id": 1}).sort(
+            [("timestamp" if store.kind == "flat" else "start_ts", 1), ("_id", 1)]
+        ).limit(100).explain()) for store in db.store.parts],
+        ("detach_forks", db.chats.find({"fork_of.chat_id": chat_id}, {"fork_of": 1}).explain()),
+        *[(f"fork_chat get_message [{store.kind}]", store.collection.find(
+            {"_id": ObjectId(), "chat_id": chat_id} if store.kind == "flat" else
+            {"chat_id": chat_id, "start_ts": {"$lte": datetime.utcnow()}, "messages._id": ObjectId()}
+        ).sort([("_id", 1)] if store.kind == "flat" else [("start_ts", -1), ("_id", -1)]).limit(1).explain())
+          for store in db.store.parts],
+        # Matches come from the text index; ranking them by score is inherent to search
+        *([("search_messages", db.messages.find({"$text": {"$search": "message"}}).explain())]
+          if db.search.backend == "mongo" else []),
+        *[(f"search_messages fetch [{store.kind}]", store.collection.find(
+            {"$or": [{"chat_id": chat_id, "start_ts": {"$lte": datetime.utcnow()}, "end_ts": {"$gte": datetime.utcnow()}}]}
+        ).explain()) for store in db.store.parts if store.kind == "bucketed"],
+    ]
+
+def main():
+    db = MongoDB(db_name=QUERY_PLAN_DB)
+    failures = 0
+    try:
+        db.client.drop_database(QUERY_PLAN_DB)
+        if not db.ensure_indexes():
+            return 1
+        db.ensure_search_index()
+        chat_ids = seed(db)
+
+        for name, explain in query_checks(db, chat_ids[0]):
+            stages = explain_stages(explain)
+            bad = FORBIDDEN_STAGES.intersection(stages)
+            status = "FAIL" if bad else "ok"
+            failures += bool(bad)
+            print(f"{status:4} {name:20} {' <- '.join(stages)}")
+    finally:
+        db.client.drop_database(QUERY_PLAN_DB)
+        db.close()
+
+    if failures:
+        print(f"❌ {failures} quer{'y' if failures == 1 else 'ies'} would scan or sort in memory")
+        return 1
+    print("✅ All data-access queries are index-backed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Message search benchmark.
+
+Generates a synthetic corpus (Zipf-distributed vocabulary, chat-sized runs of
+messages), indexes it with one search backend and reports query latency
+percentiles for global and per-chat queries:
+
+    cd backend && python -m database.search_benchmark --messages 1000000
+    cd backend && python -m database.search_benchmark --backend mongo --messages 1000000
+
+The memory backend needs no mongod and times ranking only; the mongo backend
+loads a scratch database and times the full search() path (text match,
+ranking, chat titles, snippets).
+"""
+import sys
+import time
+import random
+import resource
+import argparse
+import itertools
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from services.text_index import InvertedIndex
+
+BENCHMARK_DB = "AI_Chat_db_search_benchmark"
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "be", "do", "fa", "gu", "po", "se", "ti", "xa"]
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda _: rng.random())
+
+def synthetic_messages(args, rng, words):
+    """(chat_id, _id, timestamp, content) with word frequencies following Zipf's law"""
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    start = datetime.utcnow() - timedelta(days=365)
+    per_chat = max(1, args.messages // args.chats)
+    for n in range(args.messages):
+        content = " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(8, 60)))
+        yield f"bench-{n // per_chat}", ObjectId(), start + timedelta(seconds=n), content
+
+def queries(args, rng, words):
+    """Mixed one- and two-term queries over head and mid-frequency words; some scoped to a chat"""
+    per_chat = max(1, args.messages // args.chats)
+    chats = max(1, args.messages // per_chat)
+    for _ in range(args.queries):
+        terms = rng.sample(words[10:5000], rng.choice([1, 1, 2, 2, 3]))
+        chat_id = f"bench-{rng.randrange(chats)}" if rng.random() < args.chat_share else None
+        yield " ".join(terms), chat_id
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {"p50 ms": pick(0.50), "p95 ms": pick(0.95), "p99 ms": pick(0.99), "max ms": samples[-1] * 1000}
+
+def run_memory(args, rng, words):
+    index = InvertedIndex()
+    start_time = time.perf_counter()
+    for chat_id, message_id, timestamp, content in synthetic_messages(args, rng, words):
+        index.add((timestamp, message_id, chat_id), content, chat_id)
+    build_seconds = time.perf_counter() - start_time
+
+    latencies = {"global": [], "per-chat": []}
+    for query, chat_id in queries(args, rng, words):
+        start_time = time.perf_counter()
+        index.search(query, args.limit, group=chat_id)
+        latencies["per-chat" if chat_id else "global"].append(time.perf_counter() - start_time)
+
+    print(f"built in {build_seconds:.1f}s ({args.messages / build_seconds:,.0f} messages/s), {index.stats()}, "
+          f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB")
+    return latencies
+
+def run_mongo(args, rng, words):
+    from database.mongodb import MongoDB
+    from database.message_search import MessageSearch
+
+    db = MongoDB(db_name=BENCHMARK_DB)
+    try:
+        db.client.drop_database(BENCHMARK_DB)
+        start_time = time.perf_counter()
+        batch = []
+        for chat_id, message_id, timestamp, content in synthetic_messages(args, rng, words):
+            batch.append({"_id": message_id, "chat_id": chat_id, "role": "user", "content": content, "timestamp": timestamp})
+            if len(batch) == 10000:
+                db.messages.insert_many(batch)
+                batch = []
+        if batch:
+            db.messages.insert_many(batch)
+        search = MessageSearch(db, backend="mongo")
+        if search.ensure_index() != "mongo":
+            raise SystemExit("text index could not be created")
+        print(f"loaded and indexed in {time.perf_counter() - start_time:.1f}s")
+
+        latencies = {"global": [], "per-chat": []}
+        for query, chat_id in queries(args, rng, words):
+            start_time = time.perf_counter()
+            search.search(query, chat_id, args.limit)
+            latencies["per-chat" if chat_id else "global"].append(time.perf_counter() - start_time)
+        return latencies
+    finally:
+        db.client.drop_database(BENCHMARK_DB)
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m database.search_benchmark")
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--vocabulary", type=int, default=50000, help="distinct words in the corpus")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--chat-share", type=float, default=0.3, help="fraction of queries scoped to one chat")
+    parser.add_argument("--limit", type=int, default=20, help="results per page")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    words = vocabulary(args.vocabulary, rng)
+    latencies = (run_memory if args.backend == "memory" else run_mongo)(args, rng, words)
+
+    rows = {kind: percentiles(samples) for kind, samples in latencies.items() if samples}
+    columns = list(next(iter(rows.values())))
+    print(f"{args.backend + ' queries':16}" + "".join(f"{column:>10}" for column in columns))
+    for kind, row in rows.items():
+        print(f"{kind:16}" + "".join(f"{row[column]:>10.1f}" for column in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Flat vs bucketed message storage benchmark.
+
+Writes the same synthetic conversations through each layout in write-behind
+sized batches, reads the newest page of every chat, and reports throughput
+plus document count, data size and index size. Runs against a scratch
+database on the local mongod:
+
+    cd backend && python -m database.storage_benchmark --chats 50 --messages 500
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from database.mongodb import MongoDB
+from database.message_store import FlatMessageStore, BucketedMessageStore, MESSAGE_BUCKET_SIZE
+
+BENCHMARK_DB = "AI_Chat_db_storage_benchmark"
+
+def synthetic_messages(chats, per_chat):
+    """Interleaved turns across chats, in arrival order"""
+    start = datetime.utcnow()
+    for turn in range(per_chat):
+        for chat in range(chats):
+            yield {
+                "chat_id": f"bench-{chat}",
+                "role": "user" if turn % 2 == 0 else "assistant",
+                "content": f"Turn {turn} of chat {chat}. " + "Lorem ipsum dolor sit amet. " * 8,
+                "timestamp": start + timedelta(milliseconds=turn * chats + chat)
+            }
+
+def run(store, args):
+    pending = []
+    written = 0
+    start_time = time.perf_counter()
+    for msg in synthetic_messages(args.chats, args.messages):
+        pending.append(msg)
+        if len(pending) == args.batch:
+            store.insert(pending)
+            written += len(pending)
+            pending = []
+    if pending:
+        store.insert(pending)
+        written += len(pending)
+    write_seconds = time.perf_counter() - start_time
+
+    reads = 0
+    start_time = time.perf_counter()
+    for _ in range(args.rounds):
+        for chat in range(args.chats):
+            page = store.page(f"bench-{chat}", args.page)
+            assert len(page) == min(args.page, args.messages)
+            reads += 1
+    read_seconds = time.perf_counter() - start_time
+
+    stats = store.collection.database.command("collStats", store.collection.name)
+    return {
+        "writes/s": round(written / write_seconds),
+        "page reads/s": round(reads / read_seconds),
+        "documents": stats["count"],
+        "data MB": round(stats["size"] / 2**20, 2),
+        "index KB": round(stats["totalIndexSize"] / 2**10, 1)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m database.storage_benchmark")
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=500, help="messages per chat")
+    parser.add_argument("--batch", type=int, default=50, help="messages per insert (a write-behind flush)")
+    parser.add_argument("--page", type=int, default=40, help="messages per history read")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--bucket-size", type=int, default=MESSAGE_BUCKET_SIZE)
+    args = parser.parse_args(argv)
+
+    db = MongoDB(db_name=BENCHMARK_DB)
+    try:
+        db.client.drop_database(BENCHMARK_DB)
+        db.ensure_indexes()
+        results = {
+            "flat": run(FlatMessageStore(db.db), args),
+            f"bucketed/{args.bucket_size}": run(BucketedMessageStore(db.db, args.bucket_size), args),
+        }
+    finally:
+        db.client.drop_database(BENCHMARK_DB)
+        db.close()
+
+    columns = list(next(iter(results.values())))
+    print(f"{'layout':14}" + "".join(f"{column:>14}" for column in columns))
+    for layout, row in results.items():
+        print(f"{layout:14}" + "".join(f"{row[column]:>14}" for column in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
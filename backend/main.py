@@ -1,28 +1,71 @@
 
-from fastapi import FastAPI, File, Form, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
 import os
 import time
 from datetime import datetime
 import json
+import hashlib
 import logging
 
 # Import services
-from services.gemini_service import ask_gemini
-from services.groq_service import ask_groq
+from services.gemini_service import ask_gemini_async, stream_gemini
+from services.groq_service import ask_groq_async, stream_groq
+from services.streaming import format_sse
+from services.conversation_cache import ConversationCache, CachedMessage
+from services.response_cache import ResponseCache
+from services.title_service import TitleRefiner, extract_title
+from services.chat_deletion import ChatDeleter, BULK_DELETE_MAX_CHATS
+from services.ingestion import IngestionQueue, QueueFull
+from services.document_extraction import SUPPORTED_EXTENSIONS
+from services.uploads import UploadSizeLimit, UploadTooLarge
+from services.context_builder import build_context, count_tokens
+from services.metrics import summary, snapshot_all
+from services.executors import run_blocking, shutdown_executors
+from services.provider_registry import provider_registry
+from services.health_monitor import health_monitor
+from services.provider_errors import (
+    ProviderError, ProviderTimeout, ProviderUnavailable, ProviderResponseError, error_for_status
+)
+from services.resilience import (
+    HEDGING_ENABLED, acall_with_breaker, astream_with_breaker, breaker_snapshot, hedge_delay, hedged_call
+)
 from services.simple_rag import SimpleRAG
 from services.web_search_service import WebSearchService
 
 # Import MongoDB client
-from database.mongodb import MongoDB
+from database.mongodb import AsyncMongoDB
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Chat Application", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await mongo_db.ensure_indexes()
+    await mongo_db.ensure_search_index()
+    await chat_deleter.resume()
+    health_monitor.start()
+    yield
+    health_monitor.stop()
+    await title_refiner.aclose()
+    await chat_deleter.aclose()
+    await ingestion_queue.aclose()
+    # Release pooled connections and drain blocking work on shutdown
+    await provider_registry.aclose()
+    shutdown_executors()
+    simple_rag.store.close()
+    mongo_db.close()
+
+app = FastAPI(title="AI Chat Application", version="1.0", lifespan=lifespan)
+
+# Oversized uploads are refused while the body is still arriving (added first so CORS headers still apply)
+app.add_middleware(UploadSizeLimit)
 
 # Configure CORS with production-ready settings
 app.add_middleware(
@@ -38,10 +81,12 @@ app.add_middleware(
 )
 
 # Initialize services
-mongo_db = MongoDB()
+mongo_db = AsyncMongoDB()
 simple_rag = SimpleRAG()
+ingestion_queue = IngestionQueue(simple_rag)
 web_search = WebSearchService()
-conversations_cache = {}
+conversations_cache = ConversationCache()
+response_cache = ResponseCache()
 
 # ... keep existing code (Pydantic models)
 class MessageRequest(BaseModel):
@@ -56,6 +101,7 @@ class ChatResponse(BaseModel):
     conversation_id: str
     model_used: Optional[str] = None
     agent_response: Optional[bool] = False
+    cached: Optional[bool] = False
 
 class CreateChatRequest(BaseModel):
     id: str
@@ -70,55 +116,68 @@ class SaveMessageRequest(BaseModel):
 class GenerateTitleRequest(BaseModel):
     content: str
     model: str = "groq-llama"
+    chat_id: Optional[str] = None
+
+class ResponseCacheSettingRequest(BaseModel):
+    enabled: bool
+
+class ForkChatRequest(BaseModel):
+    message_id: Optional[str] = None
+    title: Optional[str] = None
+    model: Optional[str] = None
+
+class BulkDeleteRequest(BaseModel):
+    chat_ids: List[str]
 
 class WebSearchRequest(BaseModel):
     query: str
     max_results: Optional[int] = 5
 
+OLLAMA_BASE_URL = provider_registry.config("ollama").base_url
+
+def build_ollama_payload(messages, model, stream=False):
+    """Build the Ollama /api/chat payload"""
+    # Format messages for Ollama
+    formatted_messages = []
+    for msg in messages:
+        formatted_messages.append({
+            "role": msg["role"],
+            "content": msg["content"]
+        })
+    
+    return {
+        "model": model,
+        "messages": formatted_messages,
+        "stream": stream,
+        "options": {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "top_k": 40,
+            "num_ctx": 2048,
+            "num_predict": 512,
+            "repeat_penalty": 1.1,
+        }
+    }
+
 # Enhanced Ollama handler with mobile detection
-def handle_ollama_request(messages, model="phi3:mini"):
+async def handle_ollama_request(messages, model="phi3:mini"):
     """Handle ollama requests with proper error handling"""
+    import httpx
+    
     try:
-        import requests
+        client = provider_registry.async_client("ollama")
         
-        OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        
-        # Check if Ollama is available (mainly for local development)
-        try:
-            response = requests.get(f"{OLLAMA_BASE_URL}/api/version", timeout=5)
-            if response.status_code != 200:
-                return "Ollama service is not available. Please use Gemini or Groq models for production deployment."
-        except requests.exceptions.RequestException:
-            return "Ollama service is not available. Please use Gemini or Groq models for production deployment."
-        
-        # Format messages for Ollama
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        # Cached state from the background health monitor (mainly for local development)
+        if not health_monitor.is_available("ollama"):
+            raise ProviderUnavailable("Ollama", "service is not available. Please use Gemini or Groq models for production deployment.")
         
-        payload = {
-            "model": model,
-            "messages": formatted_messages,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "top_k": 40,
-                "num_ctx": 2048,
-                "num_predict": 512,
-                "repeat_penalty": 1.1,
-            }
-        }
+        payload = build_ollama_payload(messages, model)
         
         logger.info(f"Sending request to Ollama with model: {model}")
         
-        response = requests.post(
+        response = await client.post(
             f"{OLLAMA_BASE_URL}/api/chat",
             json=payload,
-            timeout=60,
             headers={"Content-Type": "application/json"}
         )
         
@@ -130,188 +189,352 @@ def handle_ollama_request(messages, model="phi3:mini"):
                 return content
             else:
                 logger.error(f"Unexpected response format from Ollama: {result}")
-                return "Received unexpected response format from Ollama"
+                raise ProviderResponseError("Ollama", "unexpected response format", response.status_code)
         else:
-            error_msg = f"Ollama request failed with status {response.status_code}: {response.text}"
-            logger.error(error_msg)
-            return error_msg
+            logger.error(f"Ollama request failed with status {response.status_code}: {response.text}")
+            raise error_for_status("Ollama", response.status_code)
             
+    except ProviderError:
+        raise
+    except httpx.TimeoutException:
+        raise ProviderTimeout("Ollama", "request timed out")
     except Exception as e:
         logger.error(f"Error with Ollama service: {e}")
-        return f"Ollama is not available. Please use Gemini or Groq models instead."
+        raise ProviderUnavailable("Ollama", "not available. Please use Gemini or Groq models instead.")
+
+async def stream_ollama_request(messages, model="phi3:mini"):
+    """Yield Ollama response text from its newline-delimited JSON stream"""
+    import httpx
+    
+    if not health_monitor.is_available("ollama"):
+        raise ProviderUnavailable("Ollama", "service is not available")
+    
+    payload = build_ollama_payload(messages, model, stream=True)
+    
+    logger.info(f"Streaming request to Ollama with model: {model}")
+    
+    try:
+        async with provider_registry.async_client("ollama").stream(
+            "POST",
+            f"{OLLAMA_BASE_URL}/api/chat",
+            json=payload
+        ) as response:
+            if response.status_code != 200:
+                raise error_for_status("Ollama", response.status_code)
+            
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
+    except httpx.TimeoutException:
+        raise ProviderTimeout("Ollama", "stream timed out")
+    except httpx.TransportError:
+        raise ProviderUnavailable("Ollama", "cannot connect to the service")
 
 # ... keep existing code (all endpoint definitions remain the same)
 @app.get("/api/health")
 async def health_check():
-    return {"status": "ok", "message": "AI Chat API is running"}
+    return {
+        "status": "ok",
+        "message": "AI Chat API is running",
+        "conversation_cache": conversations_cache.stats(),
+        "providers": health_monitor.snapshot(),
+        "circuit_breakers": breaker_snapshot()
+    }
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "summaries": snapshot_all(),
+        "conversation_cache": conversations_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "title_jobs": title_refiner.stats(),
+        "chat_deletions": chat_deleter.stats(),
+        "message_writer": mongo_db.db.writer.stats() if mongo_db.db.writer else {"mode": "sync"},
+        "chat_metadata_cache": mongo_db.db.chat_cache.stats(),
+        "search": mongo_db.db.search.stats(),
+        "ingestion": ingestion_queue.stats()
+    }
 
 @app.post("/api/web-search")
 async def web_search_endpoint(request: WebSearchRequest):
     try:
-        search_results = web_search.search(request.query, request.max_results)
+        search_results = await run_blocking(web_search.search, request.query, request.max_results)
         return search_results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/upload-document")
+@app.post("/api/upload-document", status_code=202)
 async def upload_document(file: UploadFile = File(...), chat_id: str = Form(...)):
+    """Queue a document for ingestion; poll /api/documents/jobs/{job_id} until it is done"""
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {extension}")
+    
+    if ingestion_queue.full():
+        raise HTTPException(status_code=503, detail="Too many documents are being processed", headers={"Retry-After": "5"})
+    
     try:
-        file_content = await file.read()
-        result = simple_rag.process_document(file_content, file.filename, chat_id)
-        
-        return {
-            "success": True,
-            "message": f"Document {file.filename} processed successfully",
-            "filename": file.filename,
-            "chunk_count": result["chunk_count"]
-        }
-        
+        # Copied in chunks from the parser's spool file, never held in memory whole
+        file_path, file_id = await run_blocking(simple_rag.save_stream, file.file, file.filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        job = ingestion_queue.submit(file_path, file_id, file.filename, chat_id)
+    except QueueFull as e:
+        await run_blocking(simple_rag.release_upload, file_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    return {
+        "success": True,
+        "message": f"Document {file.filename} queued for processing",
+        **job.to_dict()
+    }
+
+@app.get("/api/documents/jobs/{job_id}")
+async def get_document_job(job_id: str):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/api/documents/jobs/{job_id}")
+async def cancel_document_job(job_id: str):
+    cancelled = ingestion_queue.cancel(job_id)
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail="Job is already indexing or finished")
+    return {"success": True}
+
+async def generate_llm_title(content, model):
+    """Ask a model for a short title (runs as a background job)"""
+    messages = [
+        {
+            "role": "system",
+            "content": "Generate a very short, descriptive title (3-4 words max) for this conversation. Only return the title, nothing else. Be concise and specific."
+        },
+        {
+            "role": "user", 
+            "content": f"Generate a short title for this content: {content[:150]}..."
+        }
+    ]
+    return await call_model('groq-llama' if model == 'groq-llama' else 'gemini-2.0-flash', messages)
+
+async def store_chat_title(chat_id, title):
+    return await mongo_db.update_chat_title(chat_id, title)
+
+async def chat_exists(chat_id):
+    return await mongo_db.get_chat_by_id(chat_id) is not None
+
+title_refiner = TitleRefiner(generate_llm_title, store_chat_title, chat_exists)
 
 @app.post("/api/generate-title")
 async def generate_title(request: GenerateTitleRequest):
-    try:
-        messages = [
-            {
-                "role": "system",
-                "content": "Generate a very short, descriptive title (3-4 words max) for this conversation. Only return the title, nothing else. Be concise and specific."
-            },
-            {
-                "role": "user", 
-                "content": f"Generate a short title for this content: {request.content[:150]}..."
-            }
-        ]
-        
-        if request.model == 'groq-llama':
-            title = ask_groq(messages)
-        else:
-            title = ask_gemini(messages)
-        
-        title = title.strip().replace('"', '').replace("'", "")
-        words = title.split()[:4]
-        title = " ".join(words)
-        
-        if len(title) > 30:
-            title = title[:27] + "..."
-            
-        return {"title": title}
-        
-    except Exception as e:
-        logger.error(f"Error generating title: {e}")
-        return {"title": "New Chat"}
+    """Instant local title; with a chat_id the chat may get an LLM-written title later"""
+    title = extract_title(request.content)
+    refining = title_refiner.schedule(request.chat_id, request.content, request.model)
+    return {"title": title, "refining": refining}
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: MessageRequest):
+DEFAULT_SYSTEM_PROMPT = "You are a helpful AI assistant that provides informative, engaging responses with appropriate emojis. Always be comprehensive and knowledgeable in your analysis."
+WEB_SEARCH_NOTICE = "\n\n🤖 *This response includes real-time information from web search.*"
+
+async def prepare_chat_turn(request: MessageRequest):
+    """Load the conversation and augment the user message.
+
+    Returns (conversation_id, messages, used_web_search, agent_response, cacheable)
+    where messages is the prompt to send, packed into the model's token budget,
+    and cacheable says whether the answer may be served from/stored in the
+    response cache. The user message is recorded with the reply by
+    finish_chat_turn, so a failed model call leaves no unanswered turn behind.
+    """
     message = request.message
     conversation_id = request.conversation_id
     system_prompt = request.system_prompt
     model = request.model
     
-    start_time = time.time()
     used_web_search = False
     agent_response = False
     
-    try:
-        if not conversation_id:
-            conversation_id = mongo_db.create_chat(
-                model=model, 
-                title=message[:30], 
-                system_prompt=system_prompt
-            )
-            
-            conversations_cache[conversation_id] = [{
-                "role": "system",
-                "content": system_prompt or "You are a helpful AI assistant that provides informative, engaging responses with appropriate emojis. Always be comprehensive and knowledgeable in your analysis."
-            }]
-        elif conversation_id not in conversations_cache:
-            messages_db = mongo_db.get_chat_history(conversation_id, limit=20)
-            chat_data = mongo_db.get_chat_by_id(conversation_id)
-            system_prompt_content = chat_data.get('system_prompt') if chat_data else "You are a helpful AI assistant that provides informative, engaging responses with appropriate emojis. Always be comprehensive and knowledgeable in your analysis."
-            
-            conversations_cache[conversation_id] = [{
-                "role": "system",
-                "content": system_prompt_content
-            }]
-            
-            for msg in messages_db:
-                if msg["role"] != "system":
-                    conversations_cache[conversation_id].append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-        
-        if len(conversations_cache[conversation_id]) > 16:
-            conversations_cache[conversation_id] = [conversations_cache[conversation_id][0]] + conversations_cache[conversation_id][-15:]
-        
-        needs_web_search = simple_rag.should_trigger_web_search(message)
-        has_documents = simple_rag.has_documents(conversation_id)
-        
-        logger.info(f"🔍 Query analysis - Needs search: {needs_web_search}, Has docs: {has_documents}")
-        
+    if not conversation_id:
+        conversation_id = await mongo_db.create_chat(
+            model=model, 
+            title=extract_title(message), 
+            system_prompt=system_prompt
+        )
+        title_refiner.schedule(conversation_id, message, model)
+        
+        history = conversations_cache.put(conversation_id, [{
+            "role": "system",
+            "content": system_prompt or DEFAULT_SYSTEM_PROMPT
+        }])
+    else:
+        history = conversations_cache.get(conversation_id)
+    
+    if history is None:
+        # Cache miss (never loaded, or evicted): rebuild from MongoDB
+        chat_data, messages_db = await mongo_db.hydrate_conversation(conversation_id, limit=conversations_cache.max_messages)
+        system_prompt_content = (chat_data or {}).get('system_prompt') or DEFAULT_SYSTEM_PROMPT
+        response_cache.set_opt_out(conversation_id, (chat_data or {}).get('response_cache') is False)
+        
+        history = conversations_cache.put(conversation_id, [{"role": "system", "content": system_prompt_content}] + [
+            msg for msg in messages_db if msg["role"] != "system"
+        ])
+    
+    needs_web_search = simple_rag.should_trigger_web_search(message)
+    # Blocking: the first use of a chat loads its documents from the store and rebuilds its index
+    has_documents = await run_blocking(simple_rag.has_documents, conversation_id)
+    
+    logger.info(f"🔍 Query analysis - Needs search: {needs_web_search}, Has docs: {has_documents}")
+    
+    enhanced_message = message
+    web_search_results = ""
+    
+    if simple_rag.is_url_analysis_request(message):
         enhanced_message = message
-        web_search_results = ""
-        
-        if simple_rag.is_url_analysis_request(message):
-            enhanced_message = message
-        elif needs_web_search and has_documents:
-            logger.info(f"🔄 Combining web search with document context for query: {message}")
-            search_data = web_search.search(message, max_results=3)
-            if search_data.get('success'):
-                web_search_results = web_search.format_search_results(search_data)
-                used_web_search = True
-                agent_response = search_data.get('used_agent', False)
-            
-            document_context = simple_rag.simple_search(message, conversation_id)
-            enhanced_message = simple_rag.combine_sources(message, document_context, web_search_results, conversation_id)
-        elif needs_web_search:
-            logger.info(f"🔍 Triggering web search for query: {message}")
-            search_data = web_search.search(message, max_results=5)
-            if search_data.get('success'):
-                web_search_results = web_search.format_search_results(search_data)
-                enhanced_message = simple_rag.enhance_with_web_search(message, web_search_results)
-                used_web_search = True
-                agent_response = search_data.get('used_agent', False)
-                logger.info(f"✅ Web search successful, agent_response: {agent_response}")
-            else:
-                logger.warning("Web search failed, using original query")
-        elif has_documents:
-            enhanced_message = simple_rag.simple_search(message, conversation_id)
-        
-        conversations_cache[conversation_id].append({
-            "role": "user",
-            "content": enhanced_message
-        })
-        
-        mongo_db.save_message(conversation_id, "user", message)
+    elif needs_web_search and has_documents:
+        logger.info(f"🔄 Combining web search with document context for query: {message}")
+        search_data = await run_blocking(web_search.search, message, max_results=3)
+        if search_data.get('success'):
+            web_search_results = web_search.format_search_results(search_data)
+            used_web_search = True
+            agent_response = search_data.get('used_agent', False)
+        
+        document_context = await run_blocking(simple_rag.simple_search, message, conversation_id)
+        enhanced_message = await run_blocking(
+            simple_rag.combine_sources, message, document_context, web_search_results, conversation_id
+        )
+    elif needs_web_search:
+        logger.info(f"🔍 Triggering web search for query: {message}")
+        search_data = await run_blocking(web_search.search, message, max_results=5)
+        if search_data.get('success'):
+            web_search_results = web_search.format_search_results(search_data)
+            enhanced_message = simple_rag.enhance_with_web_search(message, web_search_results)
+            used_web_search = True
+            agent_response = search_data.get('used_agent', False)
+            logger.info(f"✅ Web search successful, agent_response: {agent_response}")
+        else:
+            logger.warning("Web search failed, using original query")
+    elif has_documents:
+        enhanced_message = await run_blocking(simple_rag.simple_search, message, conversation_id)
+    
+    # Snapshot the prompt so concurrent turns on the same conversation can't change it mid-call.
+    # Retrieved/search context is only sent for this turn; history keeps the user's own words.
+    messages = list(history)
+    messages.append(CachedMessage("user", enhanced_message))
+    messages, prompt_tokens = build_context(messages, model)
+    
+    augmentation_tokens = count_tokens(enhanced_message) - count_tokens(message)
+    summary("chat.prompt_tokens").observe(prompt_tokens)
+    summary("chat.augmentation_tokens").observe(augmentation_tokens)
+    logger.info(f"🧮 Prompt for {model}: {len(messages)} messages, ~{prompt_tokens} tokens ({augmentation_tokens} from augmentation)")
+    
+    # Search results and document excerpts change under the same question, so
+    # only answers to the plain conversation are reused
+    cacheable = enhanced_message == message and response_cache.is_enabled(conversation_id)
+    
+    return conversation_id, messages, used_web_search, agent_response, cacheable
+
+async def finish_chat_turn(conversation_id, user_message, response_text):
+    """Record the user message and the assistant reply in the cache and MongoDB"""
+    # If the conversation was evicted meanwhile it simply reloads from MongoDB next turn
+    conversations_cache.append(conversation_id, "user", user_message)
+    conversations_cache.append(conversation_id, "assistant", response_text)
+    
+    await mongo_db.save_message(conversation_id, "user", user_message)
+    await mongo_db.save_message(conversation_id, "assistant", response_text)
+
+# Provider behind each model (unknown models fall back to Gemini) and its hedge backup
+MODEL_PROVIDERS = {
+    'gemini-2.0-flash': 'gemini',
+    'groq-llama': 'groq',
+    'phi3:mini': 'ollama',
+}
+HEDGE_BACKUPS = {
+    'gemini-2.0-flash': 'groq-llama',
+    'groq-llama': 'gemini-2.0-flash',
+    'phi3:mini': 'gemini-2.0-flash',
+}
+
+async def call_model(model, messages):
+    """Get a complete response from one model through its provider's circuit breaker"""
+    if model == 'groq-llama':
+        return await acall_with_breaker("groq", ask_groq_async, messages)
+    elif model == 'phi3:mini':
+        return await acall_with_breaker("ollama", handle_ollama_request, messages, model)
+    else:
+        return await acall_with_breaker("gemini", ask_gemini_async, messages)
+
+async def generate_response(model, messages):
+    """Get a complete response for the selected model; returns (text, model_used).
+
+    With HEDGING_ENABLED a backup model is fired when the primary fails or has
+    not answered within its p95 latency, and whichever answers first wins.
+    """
+    backup_model = HEDGE_BACKUPS.get(model) if HEDGING_ENABLED else None
+    primary = (model, lambda: call_model(model, messages))
+    backup = (backup_model, lambda: call_model(backup_model, messages)) if backup_model else None
+    delay = hedge_delay(MODEL_PROVIDERS.get(model, 'gemini'))
+    return await hedged_call(primary, backup, delay)
+
+async def generate_cached_response(model, messages, cacheable):
+    """generate_response behind the response cache; returns (text, model_used, cached)"""
+    if cacheable:
+        cached_text = response_cache.get(model, messages)
+        if cached_text is not None:
+            return cached_text, model, True
+    
+    response_text, model_used = await generate_response(model, messages)
+    if cacheable:
+        # Filed under the requested model (as the streaming path does) so a hedged backup's answer is found again
+        response_cache.put(model, messages, response_text)
+    return response_text, model_used, False
+
+def stream_response(model, messages):
+    """Get an async iterator over response tokens from the selected model"""
+    if model == 'groq-llama':
+        return astream_with_breaker("groq", stream_groq(messages))
+    elif model == 'phi3:mini':
+        return astream_with_breaker("ollama", stream_ollama_request(messages, model))
+    else:
+        return astream_with_breaker("gemini", stream_gemini(messages))
+
+def provider_error_status(error):
+    """HTTP status for a failed model call"""
+    return error.status_code if isinstance(error, ProviderError) else 500
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(request: MessageRequest):
+    model = request.model
+    start_time = time.time()
+    
+    try:
+        conversation_id, messages, used_web_search, agent_response, cacheable = await prepare_chat_turn(request)
         
         try:
-            if model == 'gemini-2.0-flash':
-                response_text = ask_gemini(conversations_cache[conversation_id])
-            elif model == 'groq-llama':
-                response_text = ask_groq(conversations_cache[conversation_id])
-            elif model == 'phi3:mini':
-                response_text = handle_ollama_request(conversations_cache[conversation_id], model)
-            else:
-                response_text = ask_gemini(conversations_cache[conversation_id])
+            response_text, model_used, cached = await generate_cached_response(model, messages, cacheable)
                 
             if used_web_search and agent_response:
-                response_text = response_text + "\n\n🤖 *This response includes real-time information from web search.*"
+                response_text = response_text + WEB_SEARCH_NOTICE
                 
             response_time = time.time() - start_time
-            logger.info(f"✅ Response generated in {response_time:.2f}s with model {model}")
+            logger.info(f"✅ Response {'served from cache' if cached else 'generated'} in {response_time:.2f}s with model {model_used}")
             
         except Exception as model_error:
+            # Provider failures are reported, never saved as if they were answers
             logger.error(f"Model {model} error: {model_error}")
             response_time = time.time() - start_time
-            raise HTTPException(status_code=500, detail=f"Model {model} is currently unavailable. Please try again or switch to a different model.")
-        
-        conversations_cache[conversation_id].append({
-            "role": "assistant",
-            "content": response_text
-        })
+            raise HTTPException(status_code=provider_error_status(model_error), detail=f"Model {model} is currently unavailable. Please try again or switch to a different model.")
         
-        mongo_db.save_message(conversation_id, "assistant", response_text)
+        await finish_chat_turn(conversation_id, request.message, response_text)
         
         if used_web_search:
             logger.info(f"✅ Response generated with web search for conversation {conversation_id}")
@@ -320,28 +543,121 @@ async def chat(request: MessageRequest):
             "role": "assistant",
             "content": response_text,
             "conversation_id": conversation_id,
-            "model_used": model,
-            "agent_response": agent_response or used_web_search
+            "model_used": model_used,
+            "agent_response": agent_response or used_web_search,
+            "cached": cached
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Chat error: {e}")
         response_time = time.time() - start_time
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: MessageRequest):
+    """Stream the assistant reply as Server-Sent Events (start, token..., done | error)"""
+    model = request.model
+    start_time = time.time()
+    
+    try:
+        conversation_id, messages, used_web_search, agent_response, cacheable = await prepare_chat_turn(request)
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        yield format_sse("start", {"conversation_id": conversation_id, "model_used": model})
+        
+        cached_text = response_cache.get(model, messages) if cacheable else None
+        if cached_text is not None:
+            yield format_sse("token", {"content": cached_text})
+            await finish_chat_turn(conversation_id, request.message, cached_text)
+            logger.info(f"✅ Streamed response served from cache in {time.time() - start_time:.2f}s")
+            yield format_sse("done", {
+                "role": "assistant",
+                "content": cached_text,
+                "conversation_id": conversation_id,
+                "model_used": model,
+                "agent_response": False,
+                "cached": True
+            })
+            return
+        
+        parts = []
+        try:
+            async for token in stream_response(model, messages):
+                if not parts:
+                    logger.info(f"⚡ First token after {time.time() - start_time:.2f}s with model {model}")
+                parts.append(token)
+                yield format_sse("token", {"content": token})
+        except Exception as model_error:
+            logger.error(f"Model {model} stream error: {model_error}")
+            yield format_sse("error", {
+                "status": provider_error_status(model_error),
+                "detail": f"Model {model} is currently unavailable. Please try again or switch to a different model."
+            })
+            return
+        
+        if used_web_search and agent_response:
+            parts.append(WEB_SEARCH_NOTICE)
+            yield format_sse("token", {"content": WEB_SEARCH_NOTICE})
+        
+        response_text = "".join(parts)
+        if cacheable:
+            response_cache.put(model, messages, response_text)
+        await finish_chat_turn(conversation_id, request.message, response_text)
+        
+        logger.info(f"✅ Streamed response completed in {time.time() - start_time:.2f}s with model {model}")
+        
+        yield format_sse("done", {
+            "role": "assistant",
+            "content": response_text,
+            "conversation_id": conversation_id,
+            "model_used": model,
+            "agent_response": agent_response or used_web_search,
+            "cached": False
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ... keep existing code (all other endpoints)
 @app.get("/api/chats")
-async def get_chats():
+async def get_chats(request: Request, limit: int = 20, before: Optional[str] = None):
+    """Sidebar page of chat summaries; pass next_cursor as `before` for older chats.
+
+    Carries an ETag so an unchanged sidebar revalidates with a bodyless 304.
+    """
     try:
-        chats = mongo_db.get_all_chats()
-        return {"chats": chats}
+        page = jsonable_encoder(await mongo_db.get_chats_page(limit=min(max(limit, 1), 100), before=before))
+        etag = 'W/"' + hashlib.sha1(json.dumps(page, sort_keys=True).encode()).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(page, headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/search/messages")
+async def search_messages(q: str, chat_id: Optional[str] = None, limit: int = 20, before: Optional[str] = None):
+    """Messages matching q, best match first, with snippets; pass next_cursor as `before` for more"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q is required")
+    try:
+        return jsonable_encoder(await mongo_db.search_messages(q, chat_id, min(max(limit, 1), 100), before))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/chats")
 async def create_chat(request: CreateChatRequest):
     try:
-        chat_id = mongo_db.create_chat(
+        chat_id = await mongo_db.create_chat(
             model=request.model,
             title=request.title,
             system_prompt=request.system_prompt
@@ -351,28 +667,64 @@ async def create_chat(request: CreateChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/chats/{chat_id}")
-async def get_chat_history(chat_id: str, limit: int = 50):
+async def get_chat_history(chat_id: str, limit: int = 50, before: Optional[str] = None):
+    """Newest `limit` messages (oldest first); pass next_cursor as `before` to page further back"""
+    try:
+        return await mongo_db.get_chat_history_page(chat_id, min(max(limit, 1), 200), before)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/chats/{chat_id}/fork")
+async def fork_chat(chat_id: str, request: ForkChatRequest):
+    """Branch a chat after message_id (its newest message by default); no messages are copied"""
     try:
-        messages = mongo_db.get_chat_history(chat_id, limit)
-        return {"messages": messages}
+        forked = await mongo_db.fork_chat(
+            chat_id, request.message_id, request.title, request.model, window=conversations_cache.max_messages
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if forked is None:
+        raise HTTPException(status_code=404, detail="Chat or message not found")
+    
+    if forked["newer"] is not None:
+        conversations_cache.fork(chat_id, forked["chat_id"], forked["newer"])
+    return {"success": True, "chat_id": forked["chat_id"], "message_id": forked["message_id"]}
 
 @app.post("/api/chats/{chat_id}/messages")
 async def save_message(chat_id: str, request: SaveMessageRequest):
     try:
-        success = mongo_db.save_message(chat_id, request.role, request.content)
+        success = await mongo_db.save_message(chat_id, request.role, request.content)
         return {"success": success}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def release_chat_state(chat_id):
+    """Drop everything this process holds for a deleted chat"""
+    conversations_cache.discard(chat_id)
+    response_cache.set_opt_out(chat_id, False)
+    await run_blocking(simple_rag.drop_chat, chat_id)
+
+chat_deleter = ChatDeleter(mongo_db, release_chat_state)
+
 @app.delete("/api/chats/{chat_id}")
 async def delete_chat(chat_id: str):
+    """Hide the chat immediately; its messages and documents are removed in the background"""
     try:
-        success = mongo_db.delete_chat(chat_id)
-        if success and chat_id in conversations_cache:
-            del conversations_cache[chat_id]
-        return {"success": success}
+        await chat_deleter.delete([chat_id])
+        return {"success": True}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/chats/bulk-delete")
+async def bulk_delete_chats(request: BulkDeleteRequest):
+    """Delete many chats at once (background purge, like DELETE /api/chats/{chat_id})"""
+    if not request.chat_ids:
+        raise HTTPException(status_code=400, detail="chat_ids is required")
+    if len(request.chat_ids) > BULK_DELETE_MAX_CHATS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_DELETE_MAX_CHATS} chats per request")
+    try:
+        flagged = await chat_deleter.delete(request.chat_ids)
+        return {"success": True, "requested": len(set(request.chat_ids)), "deleted": flagged}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -380,15 +732,23 @@ async def delete_chat(chat_id: str):
 async def update_system_prompt(chat_id: str, request: dict):
     try:
         system_prompt = request.get('system_prompt', '')
-        success = mongo_db.update_system_prompt(chat_id, system_prompt)
+        success = await mongo_db.update_system_prompt(chat_id, system_prompt)
         
-        if success and chat_id in conversations_cache:
-            system_idx = next((i for i, msg in enumerate(conversations_cache[chat_id]) 
-                             if msg["role"] == "system"), None)
-            if system_idx is not None:
-                conversations_cache[chat_id][system_idx]["content"] = system_prompt
-            else:
-                conversations_cache[chat_id].insert(0, {"role": "system", "content": system_prompt})
+        if success:
+            conversations_cache.set_system_prompt(chat_id, system_prompt)
+        
+        return {"success": success}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.patch("/api/chats/{chat_id}/response-cache")
+async def update_response_cache_setting(chat_id: str, request: ResponseCacheSettingRequest):
+    """Opt a conversation out of (or back into) response caching"""
+    try:
+        success = await mongo_db.update_response_cache_setting(chat_id, request.enabled)
+        
+        if success:
+            response_cache.set_opt_out(chat_id, not request.enabled)
         
         return {"success": success}
     except Exception as e:
@@ -397,7 +757,7 @@ async def update_system_prompt(chat_id: str, request: dict):
 @app.get("/api/documents")
 async def get_uploaded_documents(chat_id: str = None):
     try:
-        documents = simple_rag.get_document_list(chat_id)
+        documents = await run_blocking(simple_rag.get_document_list, chat_id)
         return {"documents": documents}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -405,7 +765,7 @@ async def get_uploaded_documents(chat_id: str = None):
 @app.delete("/api/documents/{filename}")
 async def delete_document(filename: str, chat_id: str = None):
     try:
-        success = simple_rag.delete_document(filename, chat_id)
+        success = await run_blocking(simple_rag.delete_document, filename, chat_id)
         return {"success": success}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -417,15 +777,14 @@ async def scrape_url(request: dict):
         if not url:
             raise HTTPException(status_code=400, detail="URL is required")
         
-        import requests
         from bs4 import BeautifulSoup
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, timeout=10, headers=headers)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        response = await run_blocking(provider_registry.session("web").get, url, timeout=10, headers=headers)
+        soup = await run_blocking(BeautifulSoup, response.content, 'html.parser')
         
         title = soup.find('title').get_text() if soup.find('title') else ''
         
@@ -8,6 +8,10 @@ from services.gemini_service import ask_gemini
 from services.grok_service import ask_grok
 from services.openai_service import ask_openai
 from services.ollama_service import ask_ollama
+from services.conversation_cache import ConversationCache, CachedMessage
+from services.context_builder import build_context
+from services.provider_errors import ProviderError
+from services.resilience import call_with_breaker
 import logging
 
 # Set up logging
@@ -20,8 +24,8 @@ mongo_db = MongoDB()
 # Create a blueprint for chat routes
 chat_router = Blueprint('chat', __name__, url_prefix='/api')
 
-# In-memory conversation cache (temporary, before saving to MongoDB)
-conversations_cache = {}
+# Bounded in-memory conversation cache; evicted conversations reload from MongoDB
+conversations_cache = ConversationCache()
 
 # Default system message (used as fallback)
 default_system_message = {
@@ -47,43 +51,33 @@ def chat():
     
     try:
         # Create a new conversation if it doesn't exist
+        history = conversations_cache.get(conversation_id) if conversation_id else None
         if not conversation_id:
             logger.info("🆕 Creating new conversation...")
             if system_prompt:
                 conversation_id = mongo_db.create_chat(model=model, title=message[:30], system_prompt=system_prompt)
                 logger.info(f"✅ New conversation created with ID: {conversation_id} and custom system prompt")
-                conversations_cache[conversation_id] = [{
+                history = conversations_cache.put(conversation_id, [{
                     "role": "system",
                     "content": system_prompt
-                }]
+                }])
             else:
                 conversation_id = mongo_db.create_chat(model=model, title=message[:30])
                 logger.info(f"✅ New conversation created with ID: {conversation_id} with default system prompt")
-                conversations_cache[conversation_id] = [default_system_message]
-        elif conversation_id not in conversations_cache:
+                history = conversations_cache.put(conversation_id, [default_system_message])
+        elif history is None:
             logger.info(f"📚 Loading conversation history for ID: {conversation_id}")
-            messages_db = mongo_db.get_chat_history(conversation_id)
-            
-            chat_data = mongo_db.get_chat_by_id(conversation_id)
+            chat_data, messages_db = mongo_db.hydrate_conversation(conversation_id, limit=conversations_cache.max_messages)
             system_prompt_content = chat_data.get('system_prompt', default_system_message["content"]) if chat_data else default_system_message["content"]
             
-            conversations_cache[conversation_id] = [{
-                "role": "system",
-                "content": system_prompt_content
-            }]
-            
-            for msg in messages_db:
-                if msg["role"] != "system":
-                    conversations_cache[conversation_id].append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
+            history = conversations_cache.put(conversation_id, [{"role": "system", "content": system_prompt_content}] + [
+                msg for msg in messages_db if msg["role"] != "system"
+            ])
         
         # Add user message to conversation cache
-        conversations_cache[conversation_id].append({
-            "role": "user",
-            "content": message
-        })
+        messages = list(history) + [CachedMessage("user", message)]
+        conversations_cache.append(conversation_id, "user", message)
+        messages, prompt_tokens = build_context(messages, model)
         
         # Save user message to MongoDB
         logger.info("💾 Saving user message to MongoDB...")
@@ -96,22 +90,22 @@ def chat():
         try:
             if model in ['gpt-4o', 'gpt-4o-mini']:
                 logger.info(f"🔵 Calling OpenAI with model {model}")
-                response_text = ask_openai(conversations_cache[conversation_id], model)
+                response_text = call_with_breaker("openai", ask_openai, messages, model)
             elif model == 'gemini-2.0-flash':
                 logger.info("🟢 Calling Gemini API")
-                response_text = ask_gemini(conversations_cache[conversation_id])
+                response_text = call_with_breaker("gemini", ask_gemini, messages)
             elif model == 'claude-3-sonnet':
                 logger.info("🟣 Calling Claude API")
-                response_text = ask_claude(conversations_cache[conversation_id])
+                response_text = call_with_breaker("anthropic", ask_claude, messages)
             elif model == 'grok-2':
                 logger.info("🟡 Calling Grok API")
-                response_text = ask_grok(conversations_cache[conversation_id])
+                response_text = call_with_breaker("grok", ask_grok, messages)
             elif model == 'phi3:mini':
                 logger.info("🟠 Calling Ollama with phi3:mini")
-                response_text = ask_ollama(conversations_cache[conversation_id], model)
+                response_text = call_with_breaker("ollama", ask_ollama, messages, model)
             else:
                 logger.warning(f"⚠️ Unknown model {model}, defaulting to OpenAI")
-                response_text = ask_openai(conversations_cache[conversation_id], "gpt-4o")
+                response_text = call_with_breaker("openai", ask_openai, messages, "gpt-4o")
             
             logger.info(f"✅ Response received from {model}: {len(response_text)} characters")
             
@@ -120,17 +114,19 @@ def chat():
             # Fallback to a working model
             logger.info("🔄 Attempting fallback to Gemini...")
             try:
-                response_text = ask_gemini(conversations_cache[conversation_id])
+                response_text = call_with_breaker("gemini", ask_gemini, messages)
                 logger.info("✅ Fallback successful")
             except Exception as fallback_error:
+                # Report the failure instead of saving an apology as the assistant's answer
                 logger.error(f"❌ Fallback failed: {str(fallback_error)}")
-                response_text = f"Sorry, I encountered an error processing your request with {model}. Please try again or switch to a different model."
+                status = model_error.status_code if isinstance(model_error, ProviderError) else 503
+                return jsonify({
+                    "error": f"Sorry, I encountered an error processing your request with {model}. Please try again or switch to a different model.",
+                    "conversation_id": conversation_id
+                }), status
         
         # Add assistant response to conversation cache
-        conversations_cache[conversation_id].append({
-            "role": "assistant",
-            "content": response_text
-        })
+        conversations_cache.append(conversation_id, "assistant", response_text)
         
         # Save assistant response to MongoDB
         logger.info("💾 Saving assistant response to MongoDB...")
@@ -157,8 +153,9 @@ def chat():
 @chat_router.route('/chats', methods=['GET'])
 def get_chats():
     try:
-        chats = mongo_db.get_all_chats()
-        return jsonify({"chats": chats})
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        page = mongo_db.get_chats_page(limit=limit, before=request.args.get('before'))
+        return jsonify(page)
         
     except Exception as e:
         logger.error(f"Error: {str(e)}")
@@ -167,9 +164,9 @@ def get_chats():
 @chat_router.route('/chats/<chat_id>', methods=['GET'])
 def get_chat_history(chat_id):
     try:
-        limit = request.args.get('limit', 50, type=int)
-        messages = mongo_db.get_chat_history(chat_id, limit)
-        return jsonify({"messages": messages})
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        page = mongo_db.get_chat_history_page(chat_id, limit, request.args.get('before'))
+        return jsonify(page)
         
     except Exception as e:
         logger.error(f"Error: {str(e)}")
@@ -181,8 +178,7 @@ def delete_chat(chat_id):
         success = mongo_db.delete_chat(chat_id)
         
         if success:
-            if chat_id in conversations_cache:
-                del conversations_cache[chat_id]
+            conversations_cache.discard(chat_id)
             
             return jsonify({
                 "success": True,
@@ -207,16 +203,7 @@ def update_system_prompt(chat_id):
         success = mongo_db.update_system_prompt(chat_id, system_prompt)
         
         if success:
-            if chat_id in conversations_cache:
-                system_idx = next((i for i, msg in enumerate(conversations_cache[chat_id]) if msg["role"] == "system"), None)
-                
-                if system_idx is not None:
-                    conversations_cache[chat_id][system_idx]["content"] = system_prompt
-                else:
-                    conversations_cache[chat_id].insert(0, {
-                        "role": "system",
-                        "content": system_prompt
-                    })
+            conversations_cache.set_system_prompt(chat_id, system_prompt)
             
             return jsonify({
                 "success": True,
@@ -0,0 +1,107 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Chats purged at the same time; the rest wait their turn so deletes never crowd out requests
+CHAT_DELETE_CONCURRENCY = int(os.getenv("CHAT_DELETE_CONCURRENCY", "2"))
+BULK_DELETE_MAX_CHATS = int(os.getenv("BULK_DELETE_MAX_CHATS", "500"))
+
+
+class ChatDeleter:
+    """Background chat deletion.
+
+    delete() flags the chats deleted in one update (they disappear from the
+    sidebar and every read path) and returns. A background job per chat then
+    drops its in-process state through release(chat_id) - caches, RAG
+    documents, unreferenced files - and purges its messages one batch per mongo
+    round trip before removing the chat document. Chats still flagged when the
+    process stops are picked up again by resume().
+    """
+    def __init__(self, db, release: Callable[[str], Awaitable[None]],
+                 concurrency: int = CHAT_DELETE_CONCURRENCY):
+        self._db = db
+        self._release = release
+        self._concurrency = concurrency
+        self._slots = None  # created on first use, inside the running loop
+        self._in_flight = {}  # chat_id -> asyncio.Task
+        self.requested = 0
+        self.purged_chats = 0
+        self.purged_messages = 0
+        self.failed = 0
+
+    async def delete(self, chat_ids: Iterable[str]) -> int:
+        """Flag chats deleted and schedule their purge; returns how many chat documents were flagged"""
+        chat_ids = list(dict.fromkeys(chat_id for chat_id in chat_ids if chat_id))
+        if not chat_ids:
+            return 0
+        flagged = await self._db.mark_chats_deleted(chat_ids)
+        for chat_id in chat_ids:
+            self._schedule(chat_id)
+        return flagged
+
+    async def resume(self) -> int:
+        """Schedule purges left unfinished by a previous process"""
+        try:
+            chat_ids = await self._db.pending_deletions()
+        except Exception as e:
+            # Still flagged, so the next start picks them up
+            logger.error(f"Could not look up pending chat deletions: {e}")
+            return 0
+        for chat_id in chat_ids:
+            self._schedule(chat_id)
+        if chat_ids:
+            logger.info(f"🗑️ Resuming deletion of {len(chat_ids)} chats")
+        return len(chat_ids)
+
+    def _schedule(self, chat_id: str):
+        if chat_id in self._in_flight:
+            return
+        self.requested += 1
+        self._in_flight[chat_id] = asyncio.ensure_future(self._run(chat_id))
+
+    async def _run(self, chat_id: str):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+        try:
+            await self._release(chat_id)
+            async with self._slots:
+                # Forks get their own copy of what they inherit before it goes
+                await self._db.detach_forks(chat_id)
+                messages = 0
+                # One executor call per batch lets other mongo work interleave
+                while True:
+                    deleted = await self._db.delete_message_batch(chat_id)
+                    if not deleted:
+                        break
+                    messages += deleted
+                messages += await self._db.finish_chat_deletion(chat_id)
+            self.purged_chats += 1
+            self.purged_messages += messages
+            logger.info(f"🗑️ Purged chat {chat_id} ({messages} messages)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The chat stays flagged deleted and is retried by the next resume()
+            self.failed += 1
+            logger.error(f"Purging chat {chat_id} failed: {e}")
+        finally:
+            self._in_flight.pop(chat_id, None)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "requested": self.requested,
+            "purged_chats": self.purged_chats,
+            "purged_messages": self.purged_messages,
+            "failed": self.failed
+        }
+
+    async def aclose(self):
+        """Cancel outstanding purges; their chats stay flagged for the next start"""
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -2,6 +2,8 @@
 import os
 import time
 from dotenv import load_dotenv
+from services.provider_registry import provider_registry
+from services.provider_errors import ProviderError, ProviderNotConfigured, ProviderResponseError
 
 # Load environment variables
 load_dotenv()
@@ -14,12 +16,15 @@ def ask_claude(messages):
     try:
         print("Starting Claude request...")
         if not CLAUDE_API_KEY:
-            return "Claude API key not configured. Please set ANTHROPIC_API_KEY in .env file."
+            raise ProviderNotConfigured("Claude", "API key not configured. Please set ANTHROPIC_API_KEY in .env file.")
         
         # Import here to avoid errors if package is not installed
         from anthropic import Anthropic
         
-        client = Anthropic(api_key=CLAUDE_API_KEY)
+        client = provider_registry.sdk_client("anthropic", lambda: Anthropic(
+            api_key=CLAUDE_API_KEY,
+            timeout=provider_registry.timeout("anthropic")
+        ))
         
         # Format messages for Claude API
         claude_messages = []
@@ -45,6 +50,8 @@ def ask_claude(messages):
         print(f"Request completed in {end_time - start_time:.2f} seconds")
         
         return response.content[0].text
+    except ProviderError:
+        raise
     except Exception as e:
         print(f"Error in Claude service: {str(e)}")
-        return f"An error occurred with Claude: {str(e)}"
+        raise ProviderResponseError("Claude", str(e))
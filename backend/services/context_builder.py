@@ -0,0 +1,99 @@
+import os
+import math
+import logging
+from typing import List, Tuple
+
+from services.conversation_cache import CachedMessage
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the context we send to any provider; larger prompts mostly buy latency
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "8192"))
+
+# model -> (context window, tokens reserved for the completion)
+MODEL_CONTEXT_LIMITS = {
+    "gemini-2.0-flash": (1048576, 1024),
+    "groq-llama": (131072, 1024),
+    "phi3:mini": (2048, 512),  # Ollama runs with num_ctx=2048, num_predict=512
+    "gpt-4o": (128000, 1024),
+    "gpt-4o-mini": (128000, 1024),
+    "claude-3-sonnet": (200000, 1024),
+    "grok-2": (131072, 1024),
+}
+DEFAULT_CONTEXT_LIMIT = (8192, 1024)
+
+# Role/separator framing each chat message adds on top of its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# The estimator is approximate, so leave headroom rather than risk provider-side truncation
+BUDGET_SAFETY_RATIO = 0.9
+
+def count_tokens(text: str) -> int:
+    """Estimate the token count of a string (~4 characters per token for English text)"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / 4)
+
+def message_tokens(msg) -> int:
+    """Token count for one message; memoized on CachedMessage instances"""
+    if isinstance(msg, CachedMessage):
+        if msg.tokens is None:
+            msg.tokens = count_tokens(msg.content) + MESSAGE_OVERHEAD_TOKENS
+        return msg.tokens
+    return count_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def prompt_budget(model: str) -> int:
+    """Tokens available for the prompt after reserving room for the model's output"""
+    context_window, output_tokens = MODEL_CONTEXT_LIMITS.get(model, DEFAULT_CONTEXT_LIMIT)
+    context_window = min(context_window, MAX_CONTEXT_TOKENS)
+    return int((context_window - output_tokens) * BUDGET_SAFETY_RATIO)
+
+def _truncate(msg, max_tokens: int) -> CachedMessage:
+    """Cut a message's content down to roughly max_tokens, keeping its beginning"""
+    max_chars = max(0, (max_tokens - MESSAGE_OVERHEAD_TOKENS) * 4)
+    return CachedMessage(msg["role"], msg["content"][:max_chars])
+
+def build_context(messages, model: str) -> Tuple[List, int]:
+    """Pack the newest turns of a conversation into the model's token budget.
+
+    The leading system prompt and the latest message are always kept (the latest
+    is truncated if it alone would overflow); older turns are added newest-first
+    until the budget runs out. A system prompt too long to leave the latest
+    message half the budget (or all it needs) is truncated to make that room.
+    Returns (messages, prompt_tokens).
+    """
+    if not messages:
+        return [], 0
+
+    budget = prompt_budget(model)
+    system = [messages[0]] if messages[0]["role"] == "system" else []
+    turns = messages[len(system):]
+
+    used = sum(message_tokens(msg) for msg in system)
+    room = budget - (min(message_tokens(turns[-1]), budget // 2) if turns else 0)
+    if used > room:
+        logger.warning(f"✂️ System prompt exceeds the {model} prompt budget, truncating")
+        system = [_truncate(system[0], room)]
+        used = message_tokens(system[0])
+    if not turns:
+        return list(system), used
+
+    latest = turns[-1]
+    if used + message_tokens(latest) > budget:
+        logger.warning(f"✂️ Latest message exceeds the {model} prompt budget, truncating")
+        latest = _truncate(latest, budget - used)
+    used += message_tokens(latest)
+
+    kept = [latest]
+    for msg in reversed(turns[:-1]):
+        tokens = message_tokens(msg)
+        if used + tokens > budget:
+            break
+        kept.append(msg)
+        used += tokens
+    kept.reverse()
+
+    if len(kept) < len(turns):
+        logger.info(f"✂️ Context for {model}: kept {len(kept)}/{len(turns)} turns, {used}/{budget} tokens")
+
+    return system + kept, used
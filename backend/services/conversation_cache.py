@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Budget for the in-process conversation cache; evicted conversations reload from MongoDB
+CONVERSATION_CACHE_MAX_ENTRIES = int(os.getenv("CONVERSATION_CACHE_MAX_ENTRIES", "1000"))
+CONVERSATION_CACHE_MAX_BYTES = int(os.getenv("CONVERSATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CONVERSATION_CACHE_TTL_SECONDS = float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "1800"))
+CONVERSATION_CACHE_MAX_MESSAGES = int(os.getenv("CONVERSATION_CACHE_MAX_MESSAGES", "40"))
+
+# Approximate fixed cost of one CachedMessage (object header + three slots + list pointer)
+_MESSAGE_OVERHEAD = 72
+
+
+class CachedMessage:
+    """Compact chat message; role strings are interned so every message shares them"""
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str):
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = None  # memoized by services.context_builder.message_tokens
+
+    # Dict-style access keeps the provider clients working unchanged
+    def __getitem__(self, key):
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+    def nbytes(self) -> int:
+        return _MESSAGE_OVERHEAD + sys.getsizeof(self.content)
+
+    def __repr__(self):
+        return f"CachedMessage({self.role!r}, {self.content[:30]!r})"
+
+
+class _Entry:
+    __slots__ = ("messages", "nbytes", "last_access")
+
+    def __init__(self, messages: List[CachedMessage], now: float):
+        self.messages = messages
+        self.nbytes = sum(msg.nbytes() for msg in messages)
+        self.last_access = now
+
+
+class ConversationCache:
+    """LRU + idle-TTL cache of conversation messages bounded by entry count and bytes.
+
+    Entries are kept in access order, so both LRU victims and idle conversations
+    sit at the front of the OrderedDict and eviction never scans the whole cache.
+    """
+
+    def __init__(self, max_entries: int = CONVERSATION_CACHE_MAX_ENTRIES,
+                 max_bytes: int = CONVERSATION_CACHE_MAX_BYTES,
+                 ttl_seconds: float = CONVERSATION_CACHE_TTL_SECONDS,
+                 max_messages: int = CONVERSATION_CACHE_MAX_MESSAGES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._entries = OrderedDict()  # conversation_id -> _Entry
+        self._lock = threading.RLock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _is_expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.last_access > self.ttl_seconds
+
+    def _remove(self, conversation_id: str) -> Optional[_Entry]:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self.total_bytes -= entry.nbytes
+        return entry
+
+    def _evict(self, now: float):
+        # Idle entries are the least recently used, so they are always at the front
+        while self._entries:
+            conversation_id, entry = next(iter(self._entries.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._remove(conversation_id)
+            self.expirations += 1
+
+        # Always keep the most recently used conversation, even if it alone exceeds the budget
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            conversation_id, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.nbytes
+            self.evictions += 1
+            logger.debug(f"Evicted conversation {conversation_id} from cache")
+
+    def _trim(self, entry: _Entry):
+        messages = entry.messages
+        if len(messages) <= self.max_messages:
+            return
+
+        # Keep the system prompt pinned and drop the oldest turns after it
+        start = 1 if messages and messages[0].role == "system" else 0
+        drop = len(messages) - self.max_messages
+        removed = messages[start:start + drop]
+        del messages[start:start + drop]
+        freed = sum(msg.nbytes() for msg in removed)
+        entry.nbytes -= freed
+        self.total_bytes -= freed
+
+    def get(self, conversation_id: str) -> Optional[List[CachedMessage]]:
+        """Return the cached messages for a conversation, or None on a miss"""
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(conversation_id)
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(conversation_id)
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry.last_access = now
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return entry.messages
+
+    def __contains__(self, conversation_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            return entry is not None and not self._is_expired(entry, time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, conversation_id: str, messages) -> List[CachedMessage]:
+        """Store (or replace) a conversation from role/content mappings"""
+        compact = [
+            msg if isinstance(msg, CachedMessage) else CachedMessage(msg["role"], msg["content"])
+            for msg in messages
+        ]
+        with self._lock:
+            now = time.monotonic()
+            self._remove(conversation_id)
+            entry = _Entry(compact, now)
+            self._entries[conversation_id] = entry
+            self.total_bytes += entry.nbytes
+            self._trim(entry)
+            self._evict(now)
+            return entry.messages
+
+    def append(self, conversation_id: str, role: str, content: str) -> bool:
+        """Append a message to a cached conversation; returns False if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return False
+
+            message = CachedMessage(role, content)
+            now = time.monotonic()
+            entry.messages.append(message)
+            entry.nbytes += message.nbytes()
+            entry.last_access = now
+            self.total_bytes += message.nbytes()
+            self._entries.move_to_end(conversation_id)
+            self._trim(entry)
+            self._evict(now)
+            return True
+
+    def set_system_prompt(self, conversation_id: str, system_prompt: str) -> bool:
+        """Replace (or insert) the system prompt of a cached conversation"""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return False
+
+            message = CachedMessage("system", system_prompt)
+            messages = entry.messages
+            if messages and messages[0].role == "system":
+                delta = message.nbytes() - messages[0].nbytes()
+                messages[0] = message
+            else:
+                delta = message.nbytes()
+                messages.insert(0, message)
+            entry.nbytes += delta
+            self.total_bytes += delta
+            return True
+
+    def fork(self, parent_id: str, child_id: str, drop_newest: int = 0) -> bool:
+        """Cache a fork of a cached conversation without copying its messages.
+
+        The fork shares the parent's CachedMessage objects (content and memoized
+        token counts) up to the fork point, i.e. all but the newest drop_newest.
+        Shared messages count against the byte budget of each entry. Returns
+        False when the parent is not cached or the fork point is outside its
+        cached window.
+        """
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(parent_id)
+            if entry is None or self._is_expired(entry, now):
+                return False
+            start = 1 if entry.messages and entry.messages[0].role == "system" else 0
+            if drop_newest >= len(entry.messages) - start:
+                return False
+
+            self._remove(child_id)
+            child = _Entry(entry.messages[:len(entry.messages) - drop_newest], now)
+            self._entries[child_id] = child
+            self.total_bytes += child.nbytes
+            self._evict(now)
+            return True
+
+    def discard(self, conversation_id: str) -> bool:
+        """Drop a conversation from the cache"""
+        with self._lock:
+            return self._remove(conversation_id) is not None
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss/eviction counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
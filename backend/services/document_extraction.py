@@ -0,0 +1,205 @@
+import os
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+import PyPDF2
+import mammoth
+
+from services.executors import PROCESS_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Module-level functions (no service state) so ingestion jobs can run them in worker processes
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt', '.md')
+# Smallest page range handed to a worker; every task re-reads the PDF's page tree, so tasks stay few
+PDF_MIN_PAGES_PER_TASK = int(os.getenv("PDF_MIN_PAGES_PER_TASK", "16"))
+
+def pdf_page_count(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: int = None) -> Iterator[str]:
+    """Text of each page in [start, stop), parsed one page at a time"""
+    with open(file_path, 'rb') as file:
+        pages = PyPDF2.PdfReader(file).pages
+        stop = len(pages) if stop is None else min(stop, len(pages))
+        for number in range(start, stop):
+            yield pages[number].extract_text()
+
+def extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop); one task of a parallel extraction"""
+    return list(iter_pdf_pages(file_path, start, stop))
+
+def page_ranges(page_count: int, workers: int = PROCESS_POOL_SIZE) -> List[Tuple[int, int]]:
+    """Contiguous ranges, two per worker so a slow range doesn't leave the others idle"""
+    size = max(PDF_MIN_PAGES_PER_TASK, -(-page_count // (2 * workers)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def iter_pdf_pages_parallel(file_path: str, executor, workers: int = PROCESS_POOL_SIZE) -> Iterator[str]:
+    """Pages in order, extracted by executor one page range per task, at most workers ranges ahead"""
+    ranges = deque(page_ranges(pdf_page_count(file_path), workers))
+    pending = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < workers:
+                pending.append(executor.submit(extract_pdf_pages, file_path, *ranges.popleft()))
+            yield from pending.popleft().result()
+    finally:
+        # The consumer stopped early or a range failed
+        for future in pending:
+            future.cancel()
+
+def join_pages(pages: Iterable[str]) -> str:
+    """Document text from page texts, in one join"""
+    return "\n".join(pages).strip()
+
+def extract_text_from_pdf(file_path: str, executor=None) -> str:
+    """Extract text from PDF file; with a process executor, page ranges are extracted in parallel"""
+    try:
+        if executor is None:
+            return join_pages(iter_pdf_pages(file_path))
+        return join_pages(iter_pdf_pages_parallel(file_path, executor))
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF {file_path}: {e}")
+        return ""
+
+def extract_text_from_docx(file_path: str) -> str:
+    """Extract text from DOCX file"""
+    try:
+        with open(file_path, "rb") as docx_file:
+            result = mammoth.extract_raw_text(docx_file)
+            return result.value
+    except Exception as e:
+        logger.error(f"Error extracting text from DOCX {file_path}: {e}")
+        return ""
+
+def extract_text_from_txt(file_path: str) -> str:
+    """Extract text from TXT file"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read()
+    except Exception as e:
+        logger.error(f"Error extracting text from TXT {file_path}: {e}")
+        return ""
+
+def extract_text(file_path: str, executor=None) -> str:
+    """Extract text from various file formats"""
+    extension = Path(file_path).suffix.lower()
+
+    if extension == '.pdf':
+        return extract_text_from_pdf(file_path, executor)
+    elif extension == '.docx':
+        return extract_text_from_docx(file_path)
+    elif extension in ['.txt', '.md']:
+        return extract_text_from_txt(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {extension}")
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """Split text into chunks with overlap"""
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+
+        if end < len(text):
+            for i in range(end, max(start + chunk_size//2, end - 100), -1):
+                if text[i] in '.!?\n':
+                    end = i + 1
+                    break
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        start = end - overlap
+        if start >= len(text):
+            break
+
+    return chunks
+
+class Chunker:
+    """chunk_text() over text that arrives in pieces (e.g. PDF pages).
+
+    feed() returns the chunks that are final given the text so far and close()
+    the rest; together they are exactly chunk_text(text.strip()) for the
+    concatenated pieces. Only the text from the next chunk's start is kept.
+    """
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self._buffer = ""  # text from absolute position _offset on
+        self._offset = 0
+        self._start = 0  # absolute position of the next chunk
+        self._chunked = False
+
+    def feed(self, piece: str) -> List[str]:
+        if not self._buffer and not self._offset:
+            piece = piece.lstrip()
+        self._buffer += piece
+        # Trailing whitespace may yet be stripped, so only text up to the last non-space is settled
+        return self._advance(self._offset + len(self._buffer.rstrip()), final=False)
+
+    def close(self) -> List[str]:
+        self._buffer = self._buffer.rstrip()
+        length = self._offset + len(self._buffer)
+        if not self._chunked and length <= self.chunk_size:
+            return [self._buffer]
+        return self._advance(length, final=True)
+
+    def _advance(self, length: int, final: bool) -> List[str]:
+        chunks = []
+        buffer, offset, start = self._buffer, self._offset, self._start
+        # Same steps as chunk_text; before close() a step needs the text past its chunk's end
+        while start < length and (final or start + self.chunk_size < length):
+            self._chunked = True
+            end = start + self.chunk_size
+
+            if end < length:
+                for i in range(end, max(start + self.chunk_size//2, end - 100), -1):
+                    if buffer[i - offset] in '.!?\n':
+                        end = i + 1
+                        break
+
+            chunk = buffer[start - offset:end - offset].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            start = end - self.overlap
+
+        self._start = start
+        if start > offset:
+            self._buffer = buffer[start - offset:]
+            self._offset = start
+        return chunks
+
+def chunk_pages(pages: Iterable[str]) -> Tuple[str, List[str]]:
+    """Text and chunks of a PDF whose pages arrive in order, chunked as each page comes in"""
+    chunker = Chunker()
+    texts, chunks = [], []
+    for page in pages:
+        chunks.extend(chunker.feed("\n" + page if texts else page))
+        texts.append(page)
+    text = join_pages(texts)
+    if not text:
+        raise ValueError("No text could be extracted from the document")
+    return text, chunks + chunker.close()
+
+def extract_chunks(file_path: str, executor=None) -> Tuple[str, List[str]]:
+    """Text and chunks of a saved upload; the CPU-bound half of ingestion.
+
+    With a process executor, PDF page ranges are extracted in parallel.
+    """
+    if Path(file_path).suffix.lower() == '.pdf':
+        pages = iter_pdf_pages(file_path) if executor is None else iter_pdf_pages_parallel(file_path, executor)
+        return chunk_pages(pages)
+    text = extract_text(file_path, executor)
+    if not text:
+        raise ValueError("No text could be extracted from the document")
+    return text, chunk_text(text)
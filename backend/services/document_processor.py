@@ -1,16 +1,16 @@
 
-import os
 import hashlib
 from typing import List, Dict, Any
-import asyncio
 from pathlib import Path
 import logging
 
 # For different file types
-import PyPDF2
 import docx
 import mammoth
 
+from services import document_extraction
+from services.executors import process_executor
+
 logger = logging.getLogger(__name__)
 
 class DocumentProcessor:
@@ -33,17 +33,8 @@ class DocumentProcessor:
         return str(file_path)
     
     def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
-        try:
-            text = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text.strip()
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF {file_path}: {e}")
-            return ""
+        """Extract text from PDF file, page ranges in parallel across the worker processes"""
+        return document_extraction.extract_text_from_pdf(file_path, process_executor())
     
     def extract_text_from_docx(self, file_path: str) -> str:
         """Extract text from DOCX file"""
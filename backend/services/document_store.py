@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+import logging
+from array import array
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Extracted text and chunk boundaries of every uploaded document, so SimpleRAG survives restarts
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", "documents/store.sqlite3")
+# Reads go through a memory map of the database file up to this size
+DOCUMENT_STORE_MMAP_BYTES = int(os.getenv("DOCUMENT_STORE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    chat_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    file_path TEXT,
+    upload_time TEXT,
+    chunk_count INTEGER NOT NULL,
+    full_text TEXT NOT NULL,
+    chunk_spans BLOB NOT NULL,
+    PRIMARY KEY (chat_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS documents_file_path ON documents (file_path);
+"""
+
+def chunk_spans(text: str, chunks: List[str]) -> array:
+    """(start, end) offsets of each chunk in text, flattened; chunks are in order and may overlap"""
+    spans = array("I")
+    position = 0
+    for chunk in chunks:
+        start = text.find(chunk, position)
+        if start < 0:
+            raise ValueError("chunk is not a substring of the document text")
+        spans.append(start)
+        spans.append(start + len(chunk))
+        position = start + 1
+    return spans
+
+class DocumentStore:
+    """SQLite store of each chat's documents: full text once, chunks as (start, end) spans.
+
+    Chunks overlap, so storing boundaries instead of chunk strings keeps the
+    file near the size of the extracted text. Opening the store reads nothing;
+    SimpleRAG loads a chat's documents the first time the chat needs them.
+    """
+    def __init__(self, path: str = DOCUMENT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"PRAGMA mmap_size={DOCUMENT_STORE_MMAP_BYTES}")
+            self._conn.executescript(SCHEMA)
+
+    def add_document(self, chat_id: Optional[str], file_id: str, filename: str, file_path: str,
+                     upload_time: str, text: str, chunks: List[str]):
+        spans = chunk_spans(text, chunks)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (chat_id or "", file_id, filename, file_path, upload_time, len(chunks), text, spans.tobytes())
+            )
+
+    def load_chat(self, chat_id: str) -> Dict[str, Dict]:
+        """{file_id: document_data} for a chat, in SimpleRAG.chat_documents layout"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_id, filename, file_path, upload_time, full_text, chunk_spans "
+                "FROM documents WHERE chat_id = ? ORDER BY rowid",
+                (chat_id,)
+            ).fetchall()
+        documents = {}
+        for file_id, filename, file_path, upload_time, text, blob in rows:
+            spans = array("I")
+            spans.frombytes(blob)
+            documents[file_id] = {
+                "filename": filename,
+                "chunks": [text[spans[i]:spans[i + 1]] for i in range(0, len(spans), 2)],
+                "full_text": text,
+                "upload_time": upload_time,
+                "file_path": file_path
+            }
+        return documents
+
+    def list_documents(self) -> List[Dict]:
+        """Metadata of every stored document (no text)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_id, filename, file_path, chunk_count, upload_time, chat_id FROM documents ORDER BY rowid"
+            ).fetchall()
+        return [
+            {"id": file_id, "filename": filename, "file_path": file_path, "chunks": chunks,
+             "upload_time": upload_time, "chat_id": chat_id or None}
+            for file_id, filename, file_path, chunks, upload_time, chat_id in rows
+        ]
+
+    def has_documents(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is not None
+
+    def delete_document(self, chat_id: str, file_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE chat_id = ? AND file_id = ?", (chat_id, file_id))
+
+    def delete_chat(self, chat_id: str) -> List[str]:
+        """Delete a chat's documents; returns their file paths"""
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute(
+                "SELECT file_path FROM documents WHERE chat_id = ?", (chat_id,)
+            )]
+            self._conn.execute("DELETE FROM documents WHERE chat_id = ?", (chat_id,))
+        return paths
+
+    def referenced_paths(self, paths) -> set:
+        """Those of paths that some stored document still uses"""
+        paths = list(set(filter(None, paths)))
+        if not paths:
+            return set()
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT file_path FROM documents WHERE file_path IN ({','.join('?' * len(paths))})", paths
+            )}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,94 @@
+import os
+import asyncio
+import functools
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Bounded pool for blocking I/O (SDK calls, scraping, web search) so it never runs on the event loop
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_POOL_SIZE,
+    thread_name_prefix="blocking"
+)
+
+# Worker processes for CPU-bound parsing (document extraction), started on first use.
+# spawn keeps workers from inheriting the server's threads and sockets.
+PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+PROCESS_POOL_START_METHOD = os.getenv("PROCESS_POOL_START_METHOD", "spawn")
+
+_process_executor = None
+_process_lock = threading.Lock()
+
+def process_executor() -> ProcessPoolExecutor:
+    global _process_executor
+    with _process_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(
+                max_workers=PROCESS_POOL_SIZE,
+                mp_context=multiprocessing.get_context(PROCESS_POOL_START_METHOD)
+            )
+        return _process_executor
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the shared bounded executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+async def run_in_process(func, *args, **kwargs):
+    """Run a picklable module-level callable in the worker process pool and await its result"""
+    global _process_executor
+    loop = asyncio.get_running_loop()
+    executor = process_executor()
+    try:
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    except BrokenProcessPool:
+        # A worker died (crash, OOM kill); start a fresh pool for the next caller
+        with _process_lock:
+            if _process_executor is executor:
+                _process_executor = None
+        executor.shutdown(wait=False)
+        raise
+
+async def iterate_blocking(func, *args, **kwargs):
+    """Drive a blocking iterator on the shared executor and yield its items asynchronously"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    stopped = threading.Event()
+    
+    def produce():
+        try:
+            for item in func(*args, **kwargs):
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+    
+    loop.run_in_executor(blocking_executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Lets the producer thread exit early if the consumer goes away
+        stopped.set()
+
+def shutdown_executors():
+    """Stop accepting new blocking work and wait for in-flight calls"""
+    logger.info("Shutting down blocking executor")
+    blocking_executor.shutdown(wait=True)
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=True, cancel_futures=True)
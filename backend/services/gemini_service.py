@@ -3,8 +3,11 @@ import time
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from services.executors import run_blocking, iterate_blocking
+from services.provider_errors import (
+    ProviderError, ProviderNotConfigured, ProviderAuthError, ProviderRateLimited,
+    ProviderTimeout, ProviderResponseError
+)
 
 # Load environment variables
 load_dotenv()
@@ -31,33 +34,52 @@ if GEMINI_API_KEY:
     except Exception as e:
         print(f"Error initializing Gemini model: {e}")
 
+# Generation settings tuned for speed, shared by the blocking and streaming paths
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "top_k": 20,  # Reduced for faster generation
+    "max_output_tokens": 1024,  # Reduced for faster response
+    "candidate_count": 1,  # Only generate one candidate
+}
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+def _build_prompt(messages):
+    """Flatten chat messages into a single Gemini prompt"""
+    # Extract the system message if it exists
+    system_message = next((msg["content"] for msg in messages if msg["role"] == "system"), None)
+    
+    # Build prompt more efficiently
+    prompt_parts = []
+    
+    # Add system message at the beginning if it exists
+    if system_message:
+        prompt_parts.append(f"SYSTEM: {system_message}")
+    
+    # Add the conversation history (already packed to the token budget by context_builder)
+    for msg in messages:
+        if msg["role"] == "system":
+            continue
+        prompt_parts.append(f"{msg['role'].upper()}: {msg['content']}")
+    
+    return "\n\n".join(prompt_parts)
+
 def ask_gemini(messages):
     """Send message to Gemini and return response - optimized for speed"""
     try:
         if not GEMINI_API_KEY or not model:
-            return "Gemini API key not configured. Please set GEMINI_API_KEY in .env file."
+            raise ProviderNotConfigured("Gemini", "API key not configured. Please set GEMINI_API_KEY in .env file.")
             
         print("🚀 Starting optimized Gemini request...")
         start_time = time.time()
         
-        # Extract the system message if it exists
-        system_message = next((msg["content"] for msg in messages if msg["role"] == "system"), None)
-        
-        # Build prompt more efficiently
-        prompt_parts = []
-        
-        # Add system message at the beginning if it exists
-        if system_message:
-            prompt_parts.append(f"SYSTEM: {system_message}")
-        
-        # Add the conversation history (limit to last 10 messages for speed)
-        conversation_messages = [msg for msg in messages if msg["role"] != "system"]
-        recent_messages = conversation_messages[-10:]  # Only use last 10 messages
-        
-        for msg in recent_messages:
-            prompt_parts.append(f"{msg['role'].upper()}: {msg['content']}")
-        
-        formatted_content = "\n\n".join(prompt_parts)
+        formatted_content = _build_prompt(messages)
         
         print(f"📝 Prompt length: {len(formatted_content)} characters")
         print(f"🔑 Using API key: {GEMINI_API_KEY[:10]}...{GEMINI_API_KEY[-5:]}")
@@ -67,19 +89,8 @@ def ask_gemini(messages):
         
         response = model.generate_content(
             formatted_content,
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "top_k": 20,  # Reduced for faster generation
-                "max_output_tokens": 1024,  # Reduced for faster response
-                "candidate_count": 1,  # Only generate one candidate
-            },
-            safety_settings=[
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS
         )
         
         end_time = time.time()
@@ -88,29 +99,59 @@ def ask_gemini(messages):
         
         if not response.text:
             print("⚠️ Warning: Empty response received from Gemini API")
-            raise Exception("Empty response from Gemini API")
+            raise ProviderResponseError("Gemini", "empty response")
             
         print(f"📄 Response length: {len(response.text)} characters")
         print(f"🏃‍♂️ Speed improvement: ~{max(0, 3.0 - response_time):.1f}s faster than before")
         
         return response.text
         
+    except ProviderError:
+        raise
     except Exception as e:
         print(f"❌ Error in optimized Gemini service: {str(e)}")
         import traceback
         print(f"🔍 Full traceback: {traceback.format_exc()}")
-        
-        # Provide a more helpful error message
-        if "quota" in str(e).lower():
-            return "⚠️ Gemini API quota exceeded. Please check your API key limits or try again later."
-        elif "api key" in str(e).lower():
-            return "🔑 Invalid Gemini API key. Please check your API key configuration."
-        else:
-            return f"⚠️ Gemini service temporarily unavailable: {str(e)}"
+        raise _classify_error(e)
+
+def _classify_error(e):
+    """Map a Gemini SDK exception to a typed provider error"""
+    message = str(e).lower()
+    if "quota" in message or "429" in message:
+        return ProviderRateLimited("Gemini", "API quota exceeded. Please check your API key limits or try again later.")
+    elif "api key" in message:
+        return ProviderAuthError("Gemini", "invalid API key. Please check your API key configuration.")
+    elif "deadline" in message or "timed out" in message:
+        return ProviderTimeout("Gemini", "request timed out")
+    else:
+        return ProviderResponseError("Gemini", f"service temporarily unavailable: {str(e)}")
 
-# Async version for future use
 async def ask_gemini_async(messages):
-    """Async version of ask_gemini for better performance"""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        return await loop.run_in_executor(executor, ask_gemini, messages)
+    """Async version of ask_gemini; the blocking SDK call runs on the shared bounded executor"""
+    return await run_blocking(ask_gemini, messages)
+
+def _generate_stream(prompt):
+    """Blocking generator over the text of each streamed Gemini chunk"""
+    response = model.generate_content(
+        prompt,
+        generation_config=GENERATION_CONFIG,
+        safety_settings=SAFETY_SETTINGS,
+        stream=True
+    )
+    for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+async def stream_gemini(messages):
+    """Yield Gemini response text as it is generated"""
+    if not GEMINI_API_KEY or not model:
+        raise ProviderNotConfigured("Gemini", "API key not configured. Please set GEMINI_API_KEY in .env file.")
+    
+    print("🚀 Starting streaming Gemini request...")
+    try:
+        async for text in iterate_blocking(_generate_stream, _build_prompt(messages)):
+            yield text
+    except ProviderError:
+        raise
+    except Exception as e:
+        raise _classify_error(e)
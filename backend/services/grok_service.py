@@ -4,6 +4,11 @@ import requests
 import json
 import time
 from dotenv import load_dotenv
+from services.provider_registry import provider_registry
+from services.provider_errors import (
+    ProviderError, ProviderNotConfigured, ProviderTimeout, ProviderUnavailable,
+    ProviderResponseError, error_for_status
+)
 
 # Load environment variables
 load_dotenv()
@@ -19,7 +24,7 @@ def ask_grok(messages):
         
         if not GROK_API_KEY:
             print("⚠️ Grok API key not configured")
-            return "Grok API key not configured. Please set GROK_API_KEY in environment variables."
+            raise ProviderNotConfigured("Grok", "API key not configured. Please set GROK_API_KEY in environment variables.")
         
         # Format messages for Grok API (similar to OpenAI format)
         formatted_messages = []
@@ -44,11 +49,11 @@ def ask_grok(messages):
         print(f"🟡 Sending request to Grok API with {len(formatted_messages)} messages")
         start_time = time.time()
         
-        response = requests.post(
+        response = provider_registry.session("grok").post(
             GROK_API_URL,
             headers=headers,
             json=payload,
-            timeout=120
+            timeout=provider_registry.timeout("grok")
         )
         
         end_time = time.time()
@@ -62,18 +67,20 @@ def ask_grok(messages):
                 return content
             else:
                 print("⚠️ No choices in Grok response")
-                return "No response generated from Grok"
+                raise ProviderResponseError("Grok", "no response generated", response.status_code)
         else:
             print(f"❌ Grok API error: {response.status_code}")
             print(f"Error details: {response.text}")
-            return f"Grok API error: {response.status_code}. Please check your API key and try again."
+            raise error_for_status("Grok", response.status_code)
             
+    except ProviderError:
+        raise
     except requests.exceptions.Timeout:
         print("⏰ Grok API request timed out")
-        return "Grok API request timed out. Please try again."
+        raise ProviderTimeout("Grok", "request timed out")
     except requests.exceptions.ConnectionError:
         print("🔌 Cannot connect to Grok API")
-        return "Cannot connect to Grok API. Please check your internet connection."
+        raise ProviderUnavailable("Grok", "cannot connect to API")
     except Exception as e:
         print(f"💥 Error in Grok service: {str(e)}")
-        return f"An error occurred with Grok API: {str(e)}"
+        raise ProviderResponseError("Grok", str(e))
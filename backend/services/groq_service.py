@@ -1,9 +1,16 @@
 
 import os
 import requests
+import httpx
 import json
 import time
 from dotenv import load_dotenv
+from services.provider_registry import provider_registry
+from services.streaming import stream_openai_compatible
+from services.provider_errors import (
+    ProviderError, ProviderNotConfigured, ProviderTimeout, ProviderUnavailable,
+    ProviderResponseError, error_for_status
+)
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +19,47 @@ load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 
+def _build_request(messages):
+    """Build headers and payload for a GROQ chat completion"""
+    # Format messages for GROQ API
+    formatted_messages = []
+    for msg in messages:
+        formatted_messages.append({
+            "role": msg["role"],
+            "content": msg["content"]
+        })
+    
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "messages": formatted_messages,
+        "model": "llama-3.1-70b-versatile",
+        "temperature": 0.7,
+        "max_tokens": 1024,
+        "stream": False
+    }
+    
+    return headers, payload
+
+def _parse_response(response):
+    """Extract the completion text from a requests/httpx response"""
+    if response.status_code == 200:
+        result = response.json()
+        if result.get("choices") and len(result["choices"]) > 0:
+            content = result["choices"][0]["message"]["content"]
+            print(f"✅ GROQ response received: {len(content)} characters")
+            return content
+        else:
+            print("⚠️ No choices in GROQ response")
+            raise ProviderResponseError("GROQ", "no response generated", response.status_code)
+    else:
+        print(f"❌ GROQ API error: {response.status_code}")
+        print(f"Error details: {response.text}")
+        raise error_for_status("GROQ", response.status_code)
+
 def ask_groq(messages):
     """Send message to GROQ API and return response"""
     try:
@@ -19,63 +67,81 @@ def ask_groq(messages):
         
         if not GROQ_API_KEY:
             print("⚠️ GROQ API key not configured")
-            return "GROQ API key not configured. Please set GROQ_API_KEY in environment variables."
-        
-        # Format messages for GROQ API
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+            raise ProviderNotConfigured("GROQ", "API key not configured. Please set GROQ_API_KEY in environment variables.")
         
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
+        headers, payload = _build_request(messages)
         
-        payload = {
-            "messages": formatted_messages,
-            "model": "llama-3.1-70b-versatile",
-            "temperature": 0.7,
-            "max_tokens": 1024,
-            "stream": False
-        }
-        
-        print(f"🟡 Sending request to GROQ API with {len(formatted_messages)} messages")
+        print(f"🟡 Sending request to GROQ API with {len(payload['messages'])} messages")
         print(f"🟡 Using API key: {GROQ_API_KEY[:5]}...{GROQ_API_KEY[-5:] if GROQ_API_KEY else 'None'}")
         start_time = time.time()
         
-        response = requests.post(
+        response = provider_registry.session("groq").post(
             GROQ_API_URL,
             headers=headers,
             json=payload,
-            timeout=120
+            timeout=provider_registry.timeout("groq")
         )
         
         end_time = time.time()
         print(f"🟡 GROQ API request completed in {end_time - start_time:.2f} seconds")
         
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("choices") and len(result["choices"]) > 0:
-                content = result["choices"][0]["message"]["content"]
-                print(f"✅ GROQ response received: {len(content)} characters")
-                return content
-            else:
-                print("⚠️ No choices in GROQ response")
-                return "No response generated from GROQ"
-        else:
-            print(f"❌ GROQ API error: {response.status_code}")
-            print(f"Error details: {response.text}")
-            return f"GROQ API error: {response.status_code}. Please check your API key and try again."
+        return _parse_response(response)
             
+    except ProviderError:
+        raise
     except requests.exceptions.Timeout:
         print("⏰ GROQ API request timed out")
-        return "GROQ API request timed out. Please try again."
+        raise ProviderTimeout("GROQ", "request timed out")
     except requests.exceptions.ConnectionError:
         print("🔌 Cannot connect to GROQ API")
-        return "Cannot connect to GROQ API. Please check your internet connection."
+        raise ProviderUnavailable("GROQ", "cannot connect to API")
+    except Exception as e:
+        print(f"💥 Error in GROQ service: {str(e)}")
+        raise ProviderResponseError("GROQ", str(e))
+
+async def ask_groq_async(messages):
+    """Send message to GROQ API over the shared pooled async client"""
+    try:
+        print("🟡 Starting async GROQ API request...")
+        
+        if not GROQ_API_KEY:
+            print("⚠️ GROQ API key not configured")
+            raise ProviderNotConfigured("GROQ", "API key not configured. Please set GROQ_API_KEY in environment variables.")
+        
+        headers, payload = _build_request(messages)
+        
+        print(f"🟡 Sending request to GROQ API with {len(payload['messages'])} messages")
+        start_time = time.time()
+        
+        response = await provider_registry.async_client("groq").post(
+            GROQ_API_URL,
+            headers=headers,
+            json=payload
+        )
+        
+        end_time = time.time()
+        print(f"🟡 GROQ API request completed in {end_time - start_time:.2f} seconds")
+        
+        return _parse_response(response)
+            
+    except ProviderError:
+        raise
+    except httpx.TimeoutException:
+        print("⏰ GROQ API request timed out")
+        raise ProviderTimeout("GROQ", "request timed out")
+    except httpx.TransportError:
+        print("🔌 Cannot connect to GROQ API")
+        raise ProviderUnavailable("GROQ", "cannot connect to API")
     except Exception as e:
         print(f"💥 Error in GROQ service: {str(e)}")
-        return f"An error occurred with GROQ API: {str(e)}"
+        raise ProviderResponseError("GROQ", str(e))
+
+async def stream_groq(messages):
+    """Yield GROQ response text as tokens arrive"""
+    if not GROQ_API_KEY:
+        raise ProviderNotConfigured("GROQ", "API key not configured. Please set GROQ_API_KEY in environment variables.")
+    
+    print("🟡 Starting streaming GROQ API request...")
+    headers, payload = _build_request(messages)
+    async for content in stream_openai_compatible(provider_registry.async_client("groq"), GROQ_API_URL, headers, payload, "GROQ"):
+        yield content
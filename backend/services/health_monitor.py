@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+import logging
+from typing import Callable, Dict, Optional
+from dotenv import load_dotenv
+from services.provider_registry import provider_registry
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "30"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "3"))
+
+class ProviderHealth:
+    """Last known health of one provider"""
+    __slots__ = ("status", "latency_ms", "checked_at", "error")
+
+    def __init__(self):
+        self.status = "unknown"  # unknown | up | down | not_configured
+        self.latency_ms = None
+        self.checked_at = None
+        self.error = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "status": self.status,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at,
+            "error": self.error
+        }
+
+class HealthMonitor:
+    """Probes each provider on an interval from a background thread.
+
+    Request paths call is_available(), which only reads the cached state, so no
+    chat request ever waits on a liveness round trip. Providers that have not
+    been probed yet are treated as available.
+    """
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL):
+        self.interval = interval
+        self._probes = {}  # name -> callable returning True/False, or None when not configured
+        self._states = {}  # name -> ProviderHealth
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, probe: Callable[[], Optional[bool]]):
+        self._probes[name] = probe
+        self._states.setdefault(name, ProviderHealth())
+
+    def probe(self, name: str):
+        """Run one provider's probe now and record the result"""
+        state = self._states[name]
+        start_time = time.time()
+        try:
+            result = self._probes[name]()
+            error = None
+        except Exception as e:
+            result = False
+            error = str(e)
+
+        latency_ms = round((time.time() - start_time) * 1000, 1)
+        previous = state.status
+        state.status = "not_configured" if result is None else "up" if result else "down"
+        state.latency_ms = latency_ms if result is not None else None
+        state.checked_at = time.time()
+        state.error = error
+
+        if previous != state.status:
+            logger.info(f"🩺 Provider {name}: {previous} -> {state.status} ({latency_ms} ms)")
+
+    def probe_all(self):
+        for name in list(self._probes):
+            self.probe(name)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_all()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background probe thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+            self._thread.start()
+            logger.info(f"🩺 Health monitor started (interval {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=HEALTH_PROBE_TIMEOUT + 1)
+
+    def is_available(self, name: str) -> bool:
+        """Instant read of the cached state; only a confirmed 'down' counts as unavailable"""
+        state = self._states.get(name)
+        return state is None or state.status != "down"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: state.to_dict() for name, state in self._states.items()}
+
+def _probe_ollama():
+    base_url = provider_registry.config("ollama").base_url
+    response = provider_registry.session("ollama").get(f"{base_url}/api/version", timeout=HEALTH_PROBE_TIMEOUT)
+    return response.status_code == 200
+
+def _probe_bearer(provider: str, env_key: str, path: str):
+    def probe():
+        api_key = os.getenv(env_key)
+        if not api_key:
+            return None
+        base_url = provider_registry.config(provider).base_url
+        response = provider_registry.session(provider).get(
+            f"{base_url}{path}",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=HEALTH_PROBE_TIMEOUT
+        )
+        return response.status_code == 200
+    return probe
+
+def _probe_gemini():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    response = provider_registry.session("web").get(
+        "https://generativelanguage.googleapis.com/v1beta/models",
+        params={"key": api_key, "pageSize": 1},
+        timeout=HEALTH_PROBE_TIMEOUT
+    )
+    return response.status_code == 200
+
+# Process-wide monitor shared by main.py and the provider services
+health_monitor = HealthMonitor()
+health_monitor.register("gemini", _probe_gemini)
+health_monitor.register("groq", _probe_bearer("groq", "GROQ_API_KEY", "/openai/v1/models"))
+health_monitor.register("grok", _probe_bearer("grok", "GROK_API_KEY", "/v1/models"))
+health_monitor.register("ollama", _probe_ollama)
@@ -0,0 +1,253 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from services import document_extraction
+from services.executors import PROCESS_POOL_SIZE, run_blocking, run_in_process
+
+logger = logging.getLogger(__name__)
+
+# Jobs accepted but not finished (queued + running); uploads beyond this are refused
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+# Documents of one chat processed at the same time, so one chat's batch upload can't take every worker
+INGEST_PER_CHAT = int(os.getenv("INGEST_PER_CHAT", "2"))
+# Finished jobs kept for status polling
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "1000"))
+
+class QueueFull(Exception):
+    pass
+
+class IngestJob:
+    """Status of one upload: queued -> extracting -> indexing -> done (or failed / cancelled)"""
+    __slots__ = ("id", "chat_id", "filename", "file_path", "file_id", "status", "progress", "error",
+                 "result", "pages", "created_at", "updated_at", "cancelled")
+
+    def __init__(self, chat_id: Optional[str], filename: str, file_path: str, file_id: str):
+        self.id = uuid.uuid4().hex
+        self.chat_id = chat_id
+        self.filename = filename
+        self.file_path = file_path
+        self.file_id = file_id
+        self.status = "queued"
+        self.progress = 0.0
+        self.error = None
+        self.result = None
+        self.pages = None  # [extracted, total] for PDFs
+        self.created_at = self.updated_at = time.time()
+        self.cancelled = False
+
+    def advance(self, status: str, progress: float):
+        self.status = status
+        self.progress = progress
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "chat_id": self.chat_id,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": round(self.progress, 2),
+            "error": self.error,
+            "chunk_count": self.result["chunk_count"] if self.result else None,
+            "pages": {"done": self.pages[0], "total": self.pages[1]} if self.pages else None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+class IngestionQueue:
+    """Background document ingestion.
+
+    submit() registers a job for an upload already saved to disk and returns
+    it at once. Each job extracts and chunks the file in the worker process
+    pool (PDF parsing is CPU-bound and would otherwise hold the GIL against the
+    event loop), then stores and indexes it through SimpleRAG.add_document.
+    At most PROCESS_POOL_SIZE jobs run at a time and at most INGEST_PER_CHAT
+    per chat; the rest wait as queued.
+
+    PDFs are split into page ranges extracted in parallel across the pool; the
+    pages are chunked in order as their ranges come back, and progress follows
+    the pages extracted.
+
+    Cancelling a queued job stops it outright. A running extraction task can't
+    be interrupted, so a job cancelled while extracting is reported cancelled
+    immediately and stops when its current task returns (for a PDF, the page
+    range in progress). Every job releases its saved upload when it ends; the
+    file of a cancelled or failed job is removed unless a document or another
+    upload in progress uses it. Once indexing has started the job runs to
+    completion.
+    """
+    def __init__(self, rag, max_queued: int = INGEST_QUEUE_SIZE,
+                 per_chat: int = INGEST_PER_CHAT, workers: int = PROCESS_POOL_SIZE):
+        self._rag = rag
+        self._max_queued = max_queued
+        self._per_chat = per_chat
+        self._workers = workers
+        self._slots = None  # created on first use, inside the running loop
+        self._chat_slots = {}  # chat_id -> asyncio.Semaphore, dropped when the chat has no jobs
+        self._chat_jobs = {}  # chat_id -> jobs in flight
+        self._jobs = OrderedDict()  # job_id -> IngestJob, oldest first
+        self._in_flight = {}  # job_id -> asyncio.Task
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def full(self) -> bool:
+        return len(self._in_flight) >= self._max_queued
+
+    def submit(self, file_path: str, file_id: str, filename: str, chat_id: Optional[str] = None) -> IngestJob:
+        if self.full():
+            self.rejected += 1
+            raise QueueFull(f"{len(self._in_flight)} documents are already being processed")
+        job = IngestJob(chat_id, filename, file_path, file_id)
+        self._jobs[job.id] = job
+        self._chat_jobs[chat_id] = self._chat_jobs.get(chat_id, 0) + 1
+        self.submitted += 1
+        task = asyncio.ensure_future(self._run(job))
+        task.add_done_callback(lambda _: self._finished(job))
+        self._in_flight[job.id] = task
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[bool]:
+        """None for an unknown job; False once it is indexing or finished"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status == "queued":
+            job.cancelled = True
+            self._in_flight[job_id].cancel()
+        elif job.status == "extracting":
+            job.cancelled = True
+        else:
+            return False
+        job.advance("cancelled", job.progress)
+        return True
+
+    def _trim(self):
+        finished = len(self._jobs) - len(self._in_flight)
+        if finished <= INGEST_JOB_HISTORY:
+            return
+        for job_id in [job_id for job_id in self._jobs if job_id not in self._in_flight]:
+            del self._jobs[job_id]
+            finished -= 1
+            if finished <= INGEST_JOB_HISTORY:
+                break
+
+    async def _run(self, job: IngestJob):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._workers)
+        chat_slots = self._chat_slots.setdefault(job.chat_id, asyncio.Semaphore(self._per_chat))
+        upload = job.file_path
+        file_path = os.path.abspath(upload)
+        indexing = False
+        try:
+            async with chat_slots, self._slots:
+                job.advance("extracting", 0.2)
+                if file_path.lower().endswith(".pdf"):
+                    text, chunks = await self._extract_pdf(job, file_path)
+                else:
+                    text, chunks = await run_in_process(document_extraction.extract_chunks, file_path)
+                if job.cancelled:
+                    raise asyncio.CancelledError()
+                indexing = True
+                job.advance("indexing", 0.8)
+                job.result = await run_blocking(self._index, job, upload, text, chunks)
+            job.advance("done", 1.0)
+            self.completed += 1
+        except asyncio.CancelledError:
+            # Shutdown may interrupt indexing, which finishes in its thread and releases the file there
+            if not indexing:
+                await run_blocking(self._rag.release_upload, upload)
+            job.file_path = None  # handled; see _finished
+            logger.info(f"🚫 Ingestion of {job.filename} cancelled")
+        except Exception as e:
+            self.failed += 1
+            job.error = str(e)
+            job.advance("failed", job.progress)
+            if not indexing:
+                await run_blocking(self._rag.release_upload, upload)
+            logger.error(f"Ingesting document {job.filename} failed: {e}")
+
+    def _index(self, job: IngestJob, upload: str, text: str, chunks):
+        try:
+            return self._rag.add_document(job.chat_id, job.file_id, job.filename, upload, text, chunks)
+        finally:
+            self._rag.release_upload(upload)
+
+    async def _extract_pdf(self, job: IngestJob, file_path: str):
+        page_count = await run_in_process(document_extraction.pdf_page_count, file_path)
+        ranges = deque(document_extraction.page_ranges(page_count, self._workers))
+        job.pages = [0, page_count]
+        chunker = document_extraction.Chunker()
+        pages, chunks = [], []
+        pending = deque()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < self._workers:
+                    pending.append(asyncio.ensure_future(
+                        run_in_process(document_extraction.extract_pdf_pages, file_path, *ranges.popleft())
+                    ))
+                for page in await pending.popleft():
+                    chunks.extend(chunker.feed("\n" + page if pages else page))
+                    pages.append(page)
+                job.pages[0] = len(pages)
+                if job.cancelled:
+                    raise asyncio.CancelledError()
+                job.advance("extracting", 0.2 + 0.6 * len(pages) / max(page_count, 1))
+        finally:
+            for future in pending:
+                future.cancel()
+        text = document_extraction.join_pages(pages)
+        if not text:
+            raise ValueError("No text could be extracted from the document")
+        chunks.extend(chunker.close())
+        return text, chunks
+
+    def _finished(self, job: IngestJob):
+        # A done callback rather than finally: a task cancelled before its first step never runs its body
+        if job.status not in ("done", "failed"):
+            self.cancelled += 1
+            job.cancelled = True
+            job.advance("cancelled", job.progress)
+            if job.file_path:
+                # Cancelled before its first step, so _run never got to release the file
+                self._rag.release_upload(job.file_path)
+        self._in_flight.pop(job.id, None)
+        self._chat_jobs[job.chat_id] -= 1
+        if not self._chat_jobs[job.chat_id]:
+            del self._chat_jobs[job.chat_id]
+            self._chat_slots.pop(job.chat_id, None)
+
+    def stats(self):
+        counts = {}
+        for job_id in self._in_flight:
+            status = self._jobs[job_id].status
+            counts[status] = counts.get(status, 0) + 1
+        return {
+            "queued": counts.get("queued", 0),
+            "extracting": counts.get("extracting", 0),
+            "indexing": counts.get("indexing", 0),
+            "capacity": self._max_queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected
+        }
+
+    async def aclose(self):
+        """Cancel outstanding jobs; their uploads are discarded"""
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
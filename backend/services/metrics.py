@@ -0,0 +1,56 @@
+import threading
+from collections import deque
+from typing import Dict
+
+class Summary:
+    """Running count/total of observations plus a window of recent samples for percentiles"""
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+            self.last = value
+            self.samples.append(value)
+
+    def percentile(self, p: float) -> float:
+        """Percentile (0-100) over the recent window, 0.0 when empty"""
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self.percentile(50), 4),
+            "p95": round(self.percentile(95), 4),
+            "max": round(self.max, 4),
+            "last": round(self.last, 4)
+        }
+
+_summaries = {}
+_registry_lock = threading.Lock()
+
+def summary(name: str) -> Summary:
+    """Get (or create) the process-wide summary with this name"""
+    with _registry_lock:
+        if name not in _summaries:
+            _summaries[name] = Summary()
+        return _summaries[name]
+
+def snapshot_all() -> Dict[str, Dict[str, float]]:
+    """Snapshot every registered summary, keyed by name"""
+    with _registry_lock:
+        items = list(_summaries.items())
+    return {name: item.snapshot() for name, item in sorted(items)}
@@ -2,16 +2,18 @@
 import requests
 import time
 import json
+from services.provider_registry import provider_registry
+from services.health_monitor import health_monitor
+from services.provider_errors import (
+    ProviderError, ProviderTimeout, ProviderUnavailable, ProviderResponseError, error_for_status
+)
 
-OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_BASE_URL = provider_registry.config("ollama").base_url
 
 def check_ollama_status():
-    """Check if Ollama service is running"""
-    try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/version", timeout=5)
-        return response.status_code == 200
-    except requests.exceptions.RequestException:
-        return False
+    """Check if Ollama service is running, from the health monitor's cached state"""
+    health_monitor.start()
+    return health_monitor.is_available("ollama")
 
 def ask_ollama(messages, model="phi3:mini"):
     """Send message to Ollama and return response with optimizations"""
@@ -19,7 +21,7 @@ def ask_ollama(messages, model="phi3:mini"):
         print(f"Starting Ollama request with model: {model}")
         
         if not check_ollama_status():
-            return "Ollama service is not running. Please start Ollama and ensure the phi3:mini model is installed."
+            raise ProviderUnavailable("Ollama", "service is not running. Please start Ollama and ensure the phi3:mini model is installed.")
         
         # Format messages for Ollama
         formatted_messages = []
@@ -53,10 +55,10 @@ def ask_ollama(messages, model="phi3:mini"):
         start_time = time.time()
         
         # Make request with longer timeout but optimized settings
-        response = requests.post(
+        response = provider_registry.session("ollama").post(
             f"{OLLAMA_BASE_URL}/api/chat",
             json=payload,
-            timeout=60,  # Increased timeout
+            timeout=provider_registry.timeout("ollama"),
             headers={"Content-Type": "application/json"}
         )
         
@@ -71,17 +73,17 @@ def ask_ollama(messages, model="phi3:mini"):
                 return content
             else:
                 print(f"Unexpected response format: {result}")
-                return "Received unexpected response format from Ollama"
+                raise ProviderResponseError("Ollama", "unexpected response format", response.status_code)
         else:
-            error_msg = f"Ollama request failed with status {response.status_code}: {response.text}"
-            print(error_msg)
-            return error_msg
+            print(f"Ollama request failed with status {response.status_code}: {response.text}")
+            raise error_for_status("Ollama", response.status_code)
             
+    except ProviderError:
+        raise
     except requests.exceptions.Timeout:
-        return "Request to Ollama timed out. The model might be processing a complex query."
+        raise ProviderTimeout("Ollama", "request timed out. The model might be processing a complex query.")
     except requests.exceptions.ConnectionError:
-        return "Could not connect to Ollama. Please ensure Ollama is running on localhost:11434"
+        raise ProviderUnavailable("Ollama", f"could not connect. Please ensure Ollama is running on {OLLAMA_BASE_URL}")
     except Exception as e:
-        error_msg = f"Error communicating with Ollama: {str(e)}"
-        print(error_msg)
-        return error_msg
+        print(f"Error communicating with Ollama: {str(e)}")
+        raise ProviderResponseError("Ollama", str(e))
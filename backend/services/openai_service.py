@@ -3,6 +3,8 @@ import os
 import time
 import openai
 from dotenv import load_dotenv
+from services.provider_registry import provider_registry
+from services.provider_errors import ProviderError, ProviderNotConfigured, ProviderResponseError
 
 # Load environment variables
 load_dotenv()
@@ -10,29 +12,35 @@ load_dotenv()
 # API key from environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Configure the SDK once; its HTTP calls go through the registry's pooled session
+if OPENAI_API_KEY:
+    openai.api_key = OPENAI_API_KEY
+    openai.requestssession = provider_registry.session("openai")
+
 def ask_openai(messages, model="gpt-4o"):
     """Send message to OpenAI and return response"""
     try:
         print(f"Starting OpenAI request with model: {model}")
         if not OPENAI_API_KEY:
-            return "OpenAI API key not configured. Please set OPENAI_API_KEY in .env file."
-        
-        openai.api_key = OPENAI_API_KEY
+            raise ProviderNotConfigured("OpenAI", "API key not configured. Please set OPENAI_API_KEY in .env file.")
         
         start_time = time.time()
         response = openai.ChatCompletion.create(
             model=model,
-            messages=messages,
+            messages=[{"role": msg["role"], "content": msg["content"]} for msg in messages],
             temperature=0.7,
             max_tokens=1024,
             top_p=1.0,
             frequency_penalty=0.0,
             presence_penalty=0.0,
+            request_timeout=provider_registry.timeout("openai"),
         )
         end_time = time.time()
         print(f"Request completed in {end_time - start_time:.2f} seconds")
         
         return response.choices[0].message["content"]
+    except ProviderError:
+        raise
     except Exception as e:
         print(f"Error in OpenAI service: {str(e)}")
-        return f"An error occurred with OpenAI: {str(e)}"
+        raise ProviderResponseError("OpenAI", str(e))
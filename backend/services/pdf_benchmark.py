@@ -0,0 +1,119 @@
+"""PDF extraction benchmark: the old serial `text +=` loop vs page-parallel extraction.
+
+Writes a synthetic multi-hundred-page PDF (Helvetica text, ~45 lines a page)
+and times full-text extraction serially and with page ranges spread over
+worker pools of each size, plus the time until the first chunk is available
+when pages are streamed into the chunker:
+
+    cd backend && python -m services.pdf_benchmark --pages 300 600 --workers 1 2 4 8
+
+Speedup is bounded by the cores available; os.cpu_count() is printed first.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+from services.document_extraction import Chunker, iter_pdf_pages, iter_pdf_pages_parallel, join_pages
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "be", "do", "fa", "gu", "po", "se", "ti", "xa"]
+
+def synthetic_pdf(path, pages, rng, lines=45):
+    """Minimal PDF writer: one content stream of Tj lines per page"""
+    words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(5000)]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(pages):
+        text = [" ".join(rng.choices(words, k=rng.randint(8, 14))).capitalize() + "." for _ in range(lines)]
+        stream = ("BT /F1 10 Tf 14 TL 50 760 Td " + " ".join(f"({line}) Tj T*" for line in text) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects),))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        file.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+def concat_extract(path):
+    """The previous extract_text_from_pdf body"""
+    text = ""
+    with open(path, 'rb') as file:
+        for page in PyPDF2.PdfReader(file).pages:
+            text += page.extract_text() + "\n"
+    return text.strip()
+
+def first_chunk_seconds(pages):
+    """Seconds until the streamed pages yield the first chunk"""
+    start_time = time.perf_counter()
+    chunker, first = Chunker(), None
+    for number, page in enumerate(pages):
+        if chunker.feed(page if not number else "\n" + page) and first is None:
+            first = time.perf_counter() - start_time
+    chunker.close()
+    return first if first is not None else time.perf_counter() - start_time
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings), result
+
+def run(path, page_count, args):
+    rows = []
+    baseline, expected = best_of(args.repeat, lambda: concat_extract(path))
+    rows.append(("serial +=", 1, baseline, 1.0, first_chunk_seconds(iter_pdf_pages(path))))
+    seconds, text = best_of(args.repeat, lambda: join_pages(iter_pdf_pages(path)))
+    assert text == expected
+    rows.append(("serial join", 1, seconds, baseline / seconds, first_chunk_seconds(iter_pdf_pages(path))))
+
+    context = multiprocessing.get_context("spawn")
+    for workers in args.workers:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            # Start the workers outside the timed region
+            list(executor.map(abs, range(workers)))
+            seconds, text = best_of(args.repeat, lambda: join_pages(iter_pdf_pages_parallel(path, executor, workers)))
+            assert text == expected
+            first = first_chunk_seconds(iter_pdf_pages_parallel(path, executor, workers))
+        rows.append(("parallel", workers, seconds, baseline / seconds, first))
+
+    print(f"\n{page_count} pages ({os.path.getsize(path) / 1e6:.1f} MB, {len(expected) / 1e6:.1f}M characters)")
+    print(f"{'mode':14}{'workers':>9}{'seconds':>10}{'speedup':>10}{'pages/s':>10}{'1st chunk ms':>14}")
+    for mode, workers, seconds, speedup, first in rows:
+        print(f"{mode:14}{workers:>9}{seconds:>10.2f}{speedup:>10.2f}{page_count / seconds:>10.0f}{first * 1000:>14.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m services.pdf_benchmark")
+    parser.add_argument("--pages", type=int, nargs="+", default=[300, 600])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is reported")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    print(f"os.cpu_count() = {os.cpu_count()}")
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        for page_count in args.pages:
+            path = os.path.join(directory, f"synthetic-{page_count}.pdf")
+            synthetic_pdf(path, page_count, rng)
+            run(path, page_count, args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
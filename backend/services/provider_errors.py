@@ -0,0 +1,52 @@
+class ProviderError(Exception):
+    """Base error for a failed LLM provider call.
+
+    trips_breaker marks failures that say something about provider health
+    (timeouts, connection errors, 5xx, rate limits) as opposed to caller or
+    configuration mistakes, which should not open the circuit.
+    """
+    status_code = 502
+    trips_breaker = True
+
+    def __init__(self, provider: str, message: str):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.message = message
+
+class ProviderNotConfigured(ProviderError):
+    status_code = 503
+    trips_breaker = False
+
+class ProviderAuthError(ProviderError):
+    status_code = 502
+    trips_breaker = False
+
+class ProviderTimeout(ProviderError):
+    status_code = 504
+
+class ProviderUnavailable(ProviderError):
+    status_code = 503
+
+class ProviderRateLimited(ProviderError):
+    status_code = 429
+
+class ProviderResponseError(ProviderError):
+    """The provider answered with an error status or an unusable body"""
+    def __init__(self, provider: str, message: str, status: int = None):
+        super().__init__(provider, message)
+        self.status = status
+        # 4xx other than 429 is a bad request from us, not a sick provider
+        self.trips_breaker = status is None or status >= 500
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling the provider while its circuit breaker is open"""
+    status_code = 503
+    trips_breaker = False
+
+def error_for_status(provider: str, status: int, detail: str = "") -> ProviderError:
+    """Map an HTTP error status from a provider to a typed error"""
+    if status == 429:
+        return ProviderRateLimited(provider, f"rate limited (429) {detail}".strip())
+    if status in (401, 403):
+        return ProviderAuthError(provider, f"authentication failed ({status}), check the API key")
+    return ProviderResponseError(provider, f"API error {status} {detail}".strip(), status)
@@ -0,0 +1,126 @@
+import os
+import threading
+import logging
+import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Pool defaults; each can be overridden per provider, e.g. GROQ_POOL_SIZE=50 or OLLAMA_TIMEOUT=90
+PROVIDER_POOL_SIZE = int(os.getenv("PROVIDER_POOL_SIZE", "20"))
+PROVIDER_KEEPALIVE = int(os.getenv("PROVIDER_KEEPALIVE", "10"))
+PROVIDER_CONNECT_TIMEOUT = float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# provider -> (base URL, default read timeout in seconds)
+PROVIDER_ENDPOINTS = {
+    "groq": ("https://api.groq.com", 120),
+    "grok": ("https://api.x.ai", 120),
+    "openai": ("https://api.openai.com", 120),
+    "anthropic": ("https://api.anthropic.com", 120),
+    "ollama": (os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"), 60),
+    "web": ("", 10),  # scraping and web search
+}
+
+class ProviderConfig:
+    """Connection settings for one provider, resolved from the environment"""
+    def __init__(self, name: str):
+        base_url, timeout = PROVIDER_ENDPOINTS.get(name, ("", 120))
+        prefix = name.upper()
+        self.name = name
+        self.base_url = base_url
+        self.pool_size = int(os.getenv(f"{prefix}_POOL_SIZE", PROVIDER_POOL_SIZE))
+        self.keepalive = int(os.getenv(f"{prefix}_KEEPALIVE", PROVIDER_KEEPALIVE))
+        self.timeout = float(os.getenv(f"{prefix}_TIMEOUT", timeout))
+        self.connect_timeout = float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", PROVIDER_CONNECT_TIMEOUT))
+        # Plain-HTTP local servers (Ollama) gain nothing from HTTP/2
+        self.http2 = HTTP2_ENABLED and HTTP2_AVAILABLE and base_url.startswith("https://")
+
+class ProviderRegistry:
+    """Owns long-lived, pooled keep-alive clients for every LLM provider.
+
+    Sync callers (the Flask router, SDK-based services) get a requests.Session per
+    provider; async callers get an httpx.AsyncClient per provider. Clients are
+    created lazily and reused for the life of the process, so only the first
+    request to a provider pays the TCP+TLS handshake.
+    """
+    def __init__(self):
+        self._configs = {}
+        self._sessions = {}
+        self._async_clients = {}
+        self._sdk_clients = {}
+        self._lock = threading.Lock()
+
+    def config(self, name: str) -> ProviderConfig:
+        if name not in self._configs:
+            self._configs[name] = ProviderConfig(name)
+        return self._configs[name]
+
+    def session(self, name: str) -> requests.Session:
+        """Pooled requests.Session for a provider"""
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                config = self.config(name)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.pool_size)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[name] = session
+            return session
+
+    def async_client(self, name: str) -> httpx.AsyncClient:
+        """Pooled httpx.AsyncClient for a provider (HTTP/2 where available)"""
+        with self._lock:
+            client = self._async_clients.get(name)
+            if client is None or client.is_closed:
+                config = self.config(name)
+                client = httpx.AsyncClient(
+                    http2=config.http2,
+                    limits=httpx.Limits(
+                        max_connections=config.pool_size,
+                        max_keepalive_connections=config.keepalive
+                    ),
+                    timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout)
+                )
+                self._async_clients[name] = client
+                logger.info(f"🔌 Created {name} client (pool={config.pool_size}, http2={config.http2})")
+            return client
+
+    def sdk_client(self, name: str, factory):
+        """Create an SDK client once via factory() and reuse it"""
+        with self._lock:
+            if name not in self._sdk_clients:
+                self._sdk_clients[name] = factory()
+            return self._sdk_clients[name]
+
+    def timeout(self, name: str) -> float:
+        return self.config(name).timeout
+
+    async def aclose(self):
+        """Close every pooled client"""
+        with self._lock:
+            async_clients = list(self._async_clients.values())
+            sessions = list(self._sessions.values())
+            self._async_clients.clear()
+            self._sessions.clear()
+            self._sdk_clients.clear()
+        for client in async_clients:
+            await client.aclose()
+        for session in sessions:
+            session.close()
+        logger.info("Closed pooled provider clients")
+
+# Process-wide registry shared by main.py and routers/chat.py
+provider_registry = ProviderRegistry()
@@ -0,0 +1,92 @@
+"""SimpleRAG retrieval benchmark: substring scan vs the per-chat BM25 index.
+
+Generates synthetic ~1000-character chunks (Zipf-distributed vocabulary),
+indexes them and times top-3 retrieval for the same queries both ways:
+
+    cd backend && python -m services.rag_benchmark --chunks 10 1000 100000
+"""
+import sys
+import time
+import random
+import argparse
+import itertools
+
+from services.text_index import InvertedIndex
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "zi", "be", "do", "fa", "gu", "po", "se", "ti", "xa"]
+
+def substring_scan(chunks, query, top_k=3):
+    """The previous simple_search ranking: query words found anywhere in each lowercased chunk"""
+    query_words = query.lower().split()
+    relevant = []
+    for chunk in chunks:
+        chunk_lower = chunk.lower()
+        score = sum(1 for word in query_words if word in chunk_lower)
+        if score > 0:
+            relevant.append((score, chunk))
+    relevant.sort(key=lambda item: item[0], reverse=True)
+    return relevant[:top_k]
+
+def corpus(count, rng, words):
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    for _ in range(count):
+        chunk = []
+        while sum(map(len, chunk)) + len(chunk) < 1000:
+            chunk.append(" ".join(rng.choices(words, cum_weights=weights, k=rng.randint(6, 18))).capitalize() + ".")
+        yield " ".join(chunk)
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+def run(count, args, rng, words):
+    chunks = list(corpus(count, rng, words))
+    start_time = time.perf_counter()
+    index = InvertedIndex()
+    for number, chunk in enumerate(chunks):
+        index.add(("file", number), chunk)
+    build_seconds = time.perf_counter() - start_time
+
+    query_set = [" ".join(rng.sample(words[20:3000], rng.randint(2, 5))) for _ in range(args.queries)]
+    timings = {"scan": [], "bm25": []}
+    for query in query_set:
+        start_time = time.perf_counter()
+        substring_scan(chunks, query)
+        timings["scan"].append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        index.search(query, 3)
+        timings["bm25"].append(time.perf_counter() - start_time)
+
+    scan, bm25 = percentile(timings["scan"], 0.5), percentile(timings["bm25"], 0.5)
+    return {
+        "index build s": build_seconds,
+        "scan p50 ms": scan,
+        "scan p99 ms": percentile(timings["scan"], 0.99),
+        "bm25 p50 ms": bm25,
+        "bm25 p99 ms": percentile(timings["bm25"], 0.99),
+        "speedup": scan / bm25 if bm25 else float("inf")
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m services.rag_benchmark")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    words = set()
+    while len(words) < args.vocabulary:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words, key=lambda _: rng.random())
+
+    rows = {count: run(count, args, rng, words) for count in args.chunks}
+    columns = list(next(iter(rows.values())))
+    print(f"{'chunks':>8}" + "".join(f"{column:>15}" for column in columns))
+    for count, row in rows.items():
+        print(f"{count:>8}" + "".join(f"{row[column]:>15.2f}" for column in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
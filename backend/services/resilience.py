@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from services.metrics import summary
+from services.provider_errors import ProviderError, ProviderResponseError, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RECOVERY_SECONDS = float(os.getenv("CIRCUIT_RECOVERY_SECONDS", "30"))
+
+# Hedging fires a backup provider when the primary is slower than its own p95
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "8"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Per-provider circuit breaker.
+
+    closed: calls flow; consecutive health failures are counted.
+    open: calls are rejected immediately until the recovery timeout passes.
+    half_open: a single trial call is let through; success closes the circuit,
+    failure re-opens it.
+    """
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 recovery_seconds: float = CIRCUIT_RECOVERY_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.recovery_seconds:
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+                logger.info(f"⚡ Circuit {self.name}: open -> half_open")
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"⚡ Circuit {self.name}: {self.state} -> closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self, error: Exception):
+        # Config/caller errors say nothing about provider health
+        if isinstance(error, ProviderError) and not error.trips_breaker:
+            self.release_trial()
+            return
+
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"⚡ Circuit {self.name}: {self.state} -> open after {self.failures} failures ({error})")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
+    def release_trial(self):
+        """Give back a half-open trial slot whose call ended without a verdict"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "rejected": self.rejected
+            }
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+def breaker_snapshot() -> Dict[str, Dict]:
+    with _breakers_lock:
+        items = list(_breakers.items())
+    return {name: breaker.snapshot() for name, breaker in items}
+
+def _wrap_error(provider: str, error: Exception) -> ProviderError:
+    if isinstance(error, ProviderError):
+        return error
+    return ProviderResponseError(provider, str(error))
+
+def call_with_breaker(provider: str, func, *args, **kwargs):
+    """Call a blocking provider function through its circuit breaker"""
+    breaker = get_breaker(provider)
+    if not breaker.allow_request():
+        raise CircuitOpenError(provider, "circuit open, provider temporarily skipped")
+
+    start_time = time.time()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        breaker.record_failure(e)
+        raise _wrap_error(provider, e)
+    breaker.record_success()
+    summary(f"provider.{provider}.latency").observe(time.time() - start_time)
+    return result
+
+async def acall_with_breaker(provider: str, func: Callable[..., Awaitable], *args, **kwargs):
+    """Await a provider coroutine through its circuit breaker, recording its latency"""
+    breaker = get_breaker(provider)
+    if not breaker.allow_request():
+        raise CircuitOpenError(provider, "circuit open, provider temporarily skipped")
+
+    start_time = time.time()
+    try:
+        result = await func(*args, **kwargs)
+    except asyncio.CancelledError:
+        # Lost a hedge race; not a verdict on provider health
+        breaker.release_trial()
+        raise
+    except Exception as e:
+        breaker.record_failure(e)
+        raise _wrap_error(provider, e)
+    breaker.record_success()
+    summary(f"provider.{provider}.latency").observe(time.time() - start_time)
+    return result
+
+async def astream_with_breaker(provider: str, stream):
+    """Relay a provider token stream through its circuit breaker"""
+    breaker = get_breaker(provider)
+    if not breaker.allow_request():
+        raise CircuitOpenError(provider, "circuit open, provider temporarily skipped")
+
+    start_time = time.time()
+    completed = False
+    try:
+        async for token in stream:
+            yield token
+        completed = True
+    except Exception as e:
+        breaker.record_failure(e)
+        raise _wrap_error(provider, e)
+    finally:
+        if completed:
+            breaker.record_success()
+            summary(f"provider.{provider}.latency").observe(time.time() - start_time)
+        else:
+            # Client went away mid-stream (or the failure was already recorded)
+            breaker.release_trial()
+
+def hedge_delay(provider: str) -> float:
+    """Seconds to wait on the primary before hedging: its recent p95 latency"""
+    latency = summary(f"provider.{provider}.latency")
+    if latency.count < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, latency.percentile(95))
+
+async def hedged_call(primary: Tuple[str, Callable[[], Awaitable]],
+                      backup: Optional[Tuple[str, Callable[[], Awaitable]]],
+                      delay: float):
+    """Run the primary call, firing the backup if it has not answered within delay or fails.
+
+    primary/backup are (label, zero-arg coroutine factory). Returns
+    (result, label_that_answered); the slower call is cancelled.
+    """
+    primary_name, primary_call = primary
+    if backup is None:
+        return await primary_call(), primary_name
+    backup_name, backup_call = backup
+
+    tasks = {asyncio.ensure_future(primary_call()): primary_name}
+    errors = []
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            logger.info(f"🪁 {primary_name} not answered after {delay:.2f}s, hedging with {backup_name}")
+        else:
+            task = done.pop()
+            if task.exception() is None:
+                return task.result(), primary_name
+            errors.append(task.exception())
+            del tasks[task]
+            logger.warning(f"🪁 {primary_name} failed ({task.exception()}), falling back to {backup_name}")
+
+        tasks[asyncio.ensure_future(backup_call())] = backup_name
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks.pop(task)
+                if task.exception() is None:
+                    return task.result(), name
+                errors.append(task.exception())
+        raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
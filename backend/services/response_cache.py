@@ -0,0 +1,193 @@
+import os
+import re
+import math
+import time
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Off by default: with the hashed bag-of-words embedding below, prompts differing only in
+# "ascending"/"descending" or "First"/"Second" can score above the threshold, so it would
+# serve wrong answers. Only enable it once embed() is backed by a real embedding model.
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD", "0.92"))
+
+# Dimensions of the hashed feature space used for single-turn query embeddings
+EMBEDDING_DIMS = 1024
+
+_WORD_RE = re.compile(r"\w+")
+
+def normalize(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different prompts share a key"""
+    return " ".join(text.split()).casefold()
+
+def embed(text: str) -> Dict[int, float]:
+    """Unit-length sparse embedding from hashed unigrams and bigrams.
+
+    A dependency-free stand-in for a model embedding: paraphrases that share
+    most of their words land close together, but so do questions differing in
+    one word that changes the meaning, hence the semantic tier defaults to off.
+    """
+    words = _WORD_RE.findall(text.casefold())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = {}
+    for feature in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        index = digest % EMBEDDING_DIMS
+        vector[index] = vector.get(index, 0.0) + (1.0 if digest >> 63 else -1.0)
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if not norm:
+        return {}
+    return {index: value / norm for index, value in vector.items()}
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+class _Entry:
+    __slots__ = ("response", "created_at", "bucket", "vector")
+
+    def __init__(self, response: str, created_at: float, bucket: Optional[str], vector):
+        self.response = response
+        self.created_at = created_at
+        self.bucket = bucket
+        self.vector = vector
+
+class ResponseCache:
+    """Cache of model answers keyed on model + system prompt + trimmed history.
+
+    The exact tier hashes the normalized prompt. The optional semantic tier
+    covers single-turn prompts (system + one user message): a new query reuses
+    an answer whose embedding is within the similarity threshold, searched only
+    among entries with the same model and system prompt.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+                 semantic: bool = RESPONSE_CACHE_SEMANTIC,
+                 threshold: float = RESPONSE_CACHE_SEMANTIC_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.threshold = threshold
+        self._entries = OrderedDict()  # key -> _Entry, in LRU order
+        self._buckets = {}  # model + system prompt hash -> set of single-turn keys
+        self._opted_out = set()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _split(messages):
+        system = next((msg["content"] for msg in messages if msg["role"] == "system"), "")
+        turns = [msg for msg in messages if msg["role"] != "system"]
+        return system, turns
+
+    @staticmethod
+    def _bucket(model: str, system: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize(system)}".encode()).hexdigest()
+
+    def make_key(self, model: str, messages) -> Tuple[str, Optional[str], Optional[str]]:
+        """Return (exact key, semantic bucket, single-turn query) for a prompt"""
+        system, turns = self._split(messages)
+        payload = json.dumps([model, normalize(system)] + [[msg["role"], normalize(msg["content"])] for msg in turns])
+        key = hashlib.sha256(payload.encode()).hexdigest()
+        if len(turns) == 1 and turns[0]["role"] == "user":
+            return key, self._bucket(model, system), turns[0]["content"]
+        return key, None, None
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.bucket is not None:
+            bucket = self._buckets.get(entry.bucket)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[entry.bucket]
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def is_enabled(self, conversation_id: Optional[str] = None) -> bool:
+        return RESPONSE_CACHE_ENABLED and (conversation_id is None or conversation_id not in self._opted_out)
+
+    def set_opt_out(self, conversation_id: str, opted_out: bool):
+        """Exclude (or re-include) a conversation from response caching"""
+        with self._lock:
+            if opted_out:
+                self._opted_out.add(conversation_id)
+            else:
+                self._opted_out.discard(conversation_id)
+
+    def get(self, model: str, messages) -> Optional[str]:
+        """Cached answer for this prompt, or None"""
+        key, bucket, query = self.make_key(model, messages)
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.response
+
+            if self.semantic and bucket is not None and bucket in self._buckets:
+                vector = embed(query)
+                best_key, best_score = None, self.threshold
+                for candidate in list(self._buckets[bucket]):
+                    candidate_entry = self._entries[candidate]
+                    if self._expired(candidate_entry, now):
+                        self._remove(candidate)
+                        continue
+                    score = cosine(vector, candidate_entry.vector)
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    logger.info(f"🧠 Semantic response cache hit (similarity {best_score:.3f})")
+                    return self._entries[best_key].response
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, messages, response: str):
+        """Store an answer for this prompt"""
+        key, bucket, query = self.make_key(model, messages)
+        vector = embed(query) if self.semantic and bucket is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(response, time.time(), bucket if vector else None, vector)
+            if vector:
+                self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": RESPONSE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "opted_out_conversations": len(self._opted_out)
+            }
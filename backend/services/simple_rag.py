@@ -1,24 +1,39 @@
 
 import os
-import hashlib
-from typing import List, Dict, Any, Optional
+from typing import BinaryIO, List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import logging
-import PyPDF2
-import docx
-import mammoth
 from datetime import datetime
 import re
+import threading
+from collections import OrderedDict
+from services import document_extraction
+from services.executors import process_executor
+from services.uploads import UploadWriter
+from services.text_index import InvertedIndex
+from services.document_store import DocumentStore
 
 logger = logging.getLogger(__name__)
 
+# Chats whose documents and BM25 index stay in memory; others reload from the document store
+RAG_RESIDENT_CHATS = int(os.getenv("RAG_RESIDENT_CHATS", "256"))
+
 class SimpleRAG:
     def __init__(self):
         self.documents_dir = Path("documents")
         self.documents_dir.mkdir(exist_ok=True)
-        self.documents_metadata = []
-        # Store documents per chat
-        self.chat_documents = {}  # chat_id -> {file_id: document_data}
+        # Persistent text and chunk boundaries; chats are loaded from it on first use
+        self.store = DocumentStore()
+        # Resident documents per chat, least recently used first
+        self.chat_documents = OrderedDict()  # chat_id -> {file_id: document_data}
+        # BM25 index over each chat's chunks, keyed by (file_id, chunk number)
+        self.chat_indexes = {}  # chat_id -> InvertedIndex
+        # Uploads, searches and deletions all run on executor threads
+        self._lock = threading.Lock()
+        # chat_id -> {"loads", "stale"} for store reads in progress; a write marks them stale
+        self._loading = {}
+        # file path -> uploads saved but not yet stored or given up on; collect_files leaves them
+        self._pinned = {}
         
         # Enhanced web search trigger keywords
         self.search_triggers = [
@@ -49,139 +64,165 @@ class SimpleRAG:
         ]
     
     # ... keep existing code (file processing methods remain the same)
-    def save_file(self, file_content: bytes, filename: str) -> str:
-        """Save uploaded file and return file path"""
-        file_hash = hashlib.md5(file_content).hexdigest()[:10]
-        extension = Path(filename).suffix
-        safe_filename = f"{file_hash}_{filename}"
-        
-        file_path = self.documents_dir / safe_filename
-        
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
-            
-        return str(file_path)
+    def upload_writer(self) -> UploadWriter:
+        """Streams an upload into documents_dir under a content-addressed name"""
+        return UploadWriter(self.documents_dir)
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
-        try:
-            text = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text.strip()
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF {file_path}: {e}")
-            return ""
+    def save_file(self, file_content: bytes, filename: str) -> Tuple[str, str]:
+        """Save uploaded file and return (file path, file id); release_upload() when done with it"""
+        with self.upload_writer() as writer:
+            writer.write(file_content)
+            return self._commit_upload(writer, filename)
     
-    def extract_text_from_docx(self, file_path: str) -> str:
-        """Extract text from DOCX file"""
-        try:
-            with open(file_path, "rb") as docx_file:
-                result = mammoth.extract_raw_text(docx_file)
-                return result.value
-        except Exception as e:
-            logger.error(f"Error extracting text from DOCX {file_path}: {e}")
-            return ""
+    def save_stream(self, source: BinaryIO, filename: str) -> Tuple[str, str]:
+        """Save an upload read from a file object in chunks; raises UploadTooLarge past the limit"""
+        with self.upload_writer() as writer:
+            writer.copy(source)
+            return self._commit_upload(writer, filename)
     
-    def extract_text_from_txt(self, file_path: str) -> str:
-        """Extract text from TXT file"""
+    def _commit_upload(self, writer: UploadWriter, filename: str) -> Tuple[str, str]:
+        # Pinned before the rename: an identical upload's cleanup may be removing the same file
+        file_path = writer.target(filename)
+        with self._lock:
+            self._pinned[file_path] = self._pinned.get(file_path, 0) + 1
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
-        except Exception as e:
-            logger.error(f"Error extracting text from TXT {file_path}: {e}")
-            return ""
+            return writer.commit(filename)
+        except Exception:
+            self._unpin(file_path)
+            raise
+    
+    def _unpin(self, file_path: str):
+        with self._lock:
+            count = self._pinned.get(file_path, 0) - 1
+            if count > 0:
+                self._pinned[file_path] = count
+            else:
+                self._pinned.pop(file_path, None)
+    
+    def release_upload(self, file_path: str) -> int:
+        """Done with a saved upload: stored as a document, or failed or cancelled.
+
+        Removes the file unless a document or another upload in progress uses it;
+        returns the number of files removed.
+        """
+        self._unpin(file_path)
+        return self.collect_files([file_path])
     
     def extract_text(self, file_path: str) -> str:
         """Extract text from various file formats"""
-        extension = Path(file_path).suffix.lower()
-        
-        if extension == '.pdf':
-            return self.extract_text_from_pdf(file_path)
-        elif extension == '.docx':
-            return self.extract_text_from_docx(file_path)
-        elif extension in ['.txt', '.md']:
-            return self.extract_text_from_txt(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {extension}")
+        return document_extraction.extract_text(file_path, process_executor())
     
     def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """Split text into chunks with overlap"""
-        if len(text) <= chunk_size:
-            return [text]
-        
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + chunk_size
-            
-            if end < len(text):
-                for i in range(end, max(start + chunk_size//2, end - 100), -1):
-                    if text[i] in '.!?\n':
-                        end = i + 1
-                        break
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            start = end - overlap
-            if start >= len(text):
-                break
-        
-        return chunks
+        return document_extraction.chunk_text(text, chunk_size, overlap)
     
     def process_document(self, file_content: bytes, filename: str, chat_id: str = None) -> Dict[str, Any]:
         """Process a document and store it for a specific chat"""
         try:
-            file_path = self.save_file(file_content, filename)
-            text = self.extract_text(file_path)
-            
-            if not text:
-                raise ValueError("No text could be extracted from the document")
-            
-            chunks = self.chunk_text(text)
-            file_id = hashlib.md5(file_content).hexdigest()[:10]
-            
-            # Store document for specific chat
-            if chat_id:
-                if chat_id not in self.chat_documents:
-                    self.chat_documents[chat_id] = {}
-                
-                self.chat_documents[chat_id][file_id] = {
-                    "filename": filename,
-                    "chunks": chunks,
-                    "full_text": text,
-                    "upload_time": str(datetime.now()),
-                    "file_path": file_path
-                }
-            
-            # Update global metadata
-            self.documents_metadata.append({
-                "id": file_id,
-                "filename": filename,
-                "file_path": file_path,
-                "chunks": len(chunks),
-                "upload_time": str(datetime.now()),
-                "chat_id": chat_id
-            })
-            
-            logger.info(f"Processed document {filename} with {len(chunks)} chunks for chat {chat_id}")
-            
-            return {
-                "filename": filename,
-                "chunk_count": len(chunks),
-                "file_path": file_path,
-                "file_id": file_id
-            }
+            file_path, file_id = self.save_file(file_content, filename)
+            try:
+                text, chunks = document_extraction.extract_chunks(file_path, process_executor())
+                return self.add_document(chat_id, file_id, filename, file_path, text, chunks)
+            finally:
+                self.release_upload(file_path)
             
         except Exception as e:
             logger.error(f"Error processing document {filename}: {e}")
             raise Exception(f"Document processing failed: {str(e)}")
     
+    def add_document(self, chat_id: Optional[str], file_id: str, filename: str, file_path: str,
+                     text: str, chunks: List[str]) -> Dict[str, Any]:
+        """Persist an extracted document and index its chunks for the chat"""
+        upload_time = str(datetime.now())
+        self.store.add_document(chat_id, file_id, filename, file_path, upload_time, text, chunks)
+        
+        if chat_id:
+            with self._lock:
+                self._mark_stale(chat_id)
+                # A resident chat takes the upload in place; others read it from the store when loaded
+                documents = self.chat_documents.get(chat_id)
+                if documents is not None:
+                    documents[file_id] = {
+                        "filename": filename,
+                        "chunks": chunks,
+                        "full_text": text,
+                        "upload_time": upload_time,
+                        "file_path": file_path
+                    }
+                    
+                    index = self.chat_indexes[chat_id]
+                    for number, chunk in enumerate(chunks):
+                        index.add((file_id, number), chunk)
+        
+        logger.info(f"Processed document {filename} with {len(chunks)} chunks for chat {chat_id}")
+        
+        return {
+            "filename": filename,
+            "chunk_count": len(chunks),
+            "file_path": file_path,
+            "file_id": file_id
+        }
+    
+    def _chat_documents(self, chat_id: str) -> Dict[str, Dict]:
+        """A chat's documents, rehydrated from the store (with their index) on first access.
+
+        The store read and index build run outside the lock; a write to the chat
+        meanwhile marks the load stale and it is redone, so a resident chat never
+        misses a document or keeps a deleted one.
+        """
+        while True:
+            with self._lock:
+                documents = self.chat_documents.get(chat_id)
+                if documents is not None:
+                    self.chat_documents.move_to_end(chat_id)
+                    return documents
+                loading = self._loading.setdefault(chat_id, {"loads": 0, "stale": False})
+                loading["loads"] += 1
+            
+            try:
+                documents = self.store.load_chat(chat_id)
+                index = InvertedIndex()
+                for file_id, doc_data in documents.items():
+                    for number, chunk in enumerate(doc_data["chunks"]):
+                        index.add((file_id, number), chunk)
+            except BaseException:
+                with self._lock:
+                    self._end_load(chat_id, loading)
+                raise
+            
+            # Same critical section as the stale check, so no write can slip in before the insert
+            with self._lock:
+                self._end_load(chat_id, loading)
+                if loading["stale"]:
+                    continue
+                if not documents:
+                    # Not made resident: most chats have no documents
+                    return {}
+                if chat_id not in self.chat_documents:
+                    self.chat_documents[chat_id] = documents
+                    self.chat_indexes[chat_id] = index
+                    self._evict_resident()
+                    logger.info(f"📚 Loaded {len(documents)} documents of chat {chat_id} from the document store")
+                return self.chat_documents[chat_id]
+    
+    def _end_load(self, chat_id: str, loading: Dict):
+        # Caller holds self._lock
+        loading["loads"] -= 1
+        if not loading["loads"]:
+            self._loading.pop(chat_id, None)
+    
+    def _mark_stale(self, chat_id: str):
+        # Caller holds self._lock, after writing the store
+        loading = self._loading.get(chat_id)
+        if loading is not None:
+            loading["stale"] = True
+    
+    def _evict_resident(self):
+        # Caller holds self._lock
+        while len(self.chat_documents) > RAG_RESIDENT_CHATS:
+            chat_id, _ = self.chat_documents.popitem(last=False)
+            self.chat_indexes.pop(chat_id, None)
+    
     def should_trigger_web_search(self, query: str) -> bool:
         """Enhanced determination if a query should trigger web search"""
         query_lower = query.lower()
@@ -242,29 +283,26 @@ class SimpleRAG:
     
     # ... keep existing code (remaining methods stay the same)
     def simple_search(self, query: str, chat_id: str = None, top_k: int = 3) -> str:
-        """Simple keyword-based search through documents for a specific chat"""
-        if not chat_id or chat_id not in self.chat_documents or not self.chat_documents[chat_id]:
+        """BM25 search through the chunks of a chat's documents; returns the query augmented with the best chunks"""
+        documents = self._chat_documents(chat_id) if chat_id else {}
+        if not documents:
             return query
         
         try:
-            query_words = query.lower().split()
+            index = self.chat_indexes.get(chat_id)
             relevant_chunks = []
             
-            for file_id, doc_data in self.chat_documents[chat_id].items():
-                for chunk in doc_data["chunks"]:
-                    chunk_lower = chunk.lower()
-                    score = sum(1 for word in query_words if word in chunk_lower)
-                    
-                    if score > 0:
-                        relevant_chunks.append({
-                            "chunk": chunk,
-                            "score": score,
-                            "filename": doc_data["filename"]
-                        })
+            for score, (file_id, number) in (index.search(query, top_k) if index else []):
+                doc_data = documents.get(file_id)
+                if doc_data is not None:
+                    relevant_chunks.append({
+                        "chunk": doc_data["chunks"][number],
+                        "score": score,
+                        "filename": doc_data["filename"]
+                    })
             
-            # Sort by relevance score
-            relevant_chunks.sort(key=lambda x: x["score"], reverse=True)
-            top_chunks = relevant_chunks[:top_k]
+            # Already ranked, best first
+            top_chunks = relevant_chunks
             
             if not top_chunks:
                 return query
@@ -363,16 +401,13 @@ Please provide a comprehensive response using all available sources:"""
     def has_documents(self, chat_id: str = None) -> bool:
         """Check if any documents are loaded for a specific chat"""
         if not chat_id:
-            return len(self.documents_metadata) > 0
-        return chat_id in self.chat_documents and len(self.chat_documents[chat_id]) > 0
+            return self.store.has_documents()
+        return len(self._chat_documents(chat_id)) > 0
     
     def get_document_list(self, chat_id: str = None) -> List[Dict]:
         """Get list of uploaded documents for a specific chat"""
         if not chat_id:
-            return self.documents_metadata
-        
-        if chat_id not in self.chat_documents:
-            return []
+            return self.store.list_documents()
         
         return [
             {
@@ -382,33 +417,72 @@ Please provide a comprehensive response using all available sources:"""
                 "chunks": len(doc_data["chunks"]),
                 "upload_time": doc_data["upload_time"]
             }
-            for file_id, doc_data in self.chat_documents[chat_id].items()
+            for file_id, doc_data in self._chat_documents(chat_id).items()
         ]
     
     def delete_document(self, filename: str, chat_id: str = None) -> bool:
         """Delete a document from a specific chat"""
         try:
-            if chat_id and chat_id in self.chat_documents:
-                # Find and remove from chat documents
-                file_id_to_remove = None
-                for file_id, doc_data in self.chat_documents[chat_id].items():
-                    if doc_data["filename"] == filename:
-                        file_id_to_remove = file_id
-                        break
-                
-                if file_id_to_remove:
-                    del self.chat_documents[chat_id][file_id_to_remove]
-                    
-                    # Remove from global metadata
-                    self.documents_metadata = [
-                        doc for doc in self.documents_metadata 
-                        if not (doc["filename"] == filename and doc.get("chat_id") == chat_id)
-                    ]
-                    
-                    logger.info(f"Deleted document {filename} from chat {chat_id}")
-                    return True
+            documents = self._chat_documents(chat_id) if chat_id else {}
+            # Find the document to remove
+            file_id_to_remove = None
+            for file_id, doc_data in list(documents.items()):
+                if doc_data["filename"] == filename:
+                    file_id_to_remove = file_id
+                    file_path = doc_data.get("file_path")
+                    break
             
-            return False
+            if not file_id_to_remove:
+                return False
+            
+            self.store.delete_document(chat_id, file_id_to_remove)
+            with self._lock:
+                self._mark_stale(chat_id)
+                resident = self.chat_documents.get(chat_id)
+                removed = resident.pop(file_id_to_remove, None) if resident is not None else None
+                index = self.chat_indexes.get(chat_id)
+                if removed is not None and index is not None:
+                    for number in range(len(removed["chunks"])):
+                        index.remove((file_id_to_remove, number))
+            self.collect_files([file_path])
+            
+            logger.info(f"Deleted document {filename} from chat {chat_id}")
+            return True
         except Exception as e:
             logger.error(f"Error deleting document {filename}: {e}")
             return False
+    
+    def drop_chat(self, chat_id: str) -> int:
+        """Forget every document of a deleted chat and remove files no other chat uses.
+
+        Returns the number of files removed.
+        """
+        paths = self.store.delete_chat(chat_id)
+        with self._lock:
+            self._mark_stale(chat_id)
+            self.chat_documents.pop(chat_id, None)
+            self.chat_indexes.pop(chat_id, None)
+        
+        removed = self.collect_files(paths)
+        if paths:
+            logger.info(f"🗑️ Dropped {len(paths)} documents of chat {chat_id}, removed {removed} files")
+        return removed
+    
+    def collect_files(self, paths) -> int:
+        """Delete those of `paths` that no remaining document or upload in progress references.
+
+        Files are named by content hash, so the same upload in two chats shares one
+        file; it goes only when the last reference does.
+        """
+        with self._lock:
+            referenced = self.store.referenced_paths(paths) | self._pinned.keys()
+            removed = 0
+            for path in set(filter(None, paths)) - referenced:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not remove document file {path}: {e}")
+            return removed
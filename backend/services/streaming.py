@@ -0,0 +1,39 @@
+import json
+import logging
+import httpx
+from services.provider_errors import ProviderTimeout, ProviderUnavailable, error_for_status
+
+logger = logging.getLogger(__name__)
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_openai_compatible(client, url, headers, payload, provider):
+    """Yield content deltas from an OpenAI-compatible chat completions SSE stream"""
+    payload = dict(payload, stream=True)
+    
+    try:
+        async with client.stream("POST", url, headers=headers, json=payload) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"{provider} stream error {response.status_code}: {body[:500]!r}")
+                raise error_for_status(provider, response.status_code)
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                
+                chunk = json.loads(data)
+                choices = chunk.get("choices") or []
+                if choices:
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+    except httpx.TimeoutException:
+        raise ProviderTimeout(provider, "stream timed out")
+    except httpx.TransportError:
+        raise ProviderUnavailable(provider, "cannot connect to API")
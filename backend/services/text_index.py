@@ -0,0 +1,223 @@
+import re
+import math
+import heapq
+import threading
+from array import array
+from typing import Hashable, List, Optional, Tuple
+
+# Function words that carry no meaning for retrieval
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves
+""".split())
+
+_WORD_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+
+def stem(word: str) -> str:
+    """Light plural/verb-suffix folding so "queries" matches "query" and "indexed" matches "index" """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    if len(word) > 5 and word.endswith("ing"):
+        return _undouble(word[:-3])
+    if len(word) > 4 and word.endswith("ed") and not word.endswith("eed"):
+        return _undouble(word[:-2])
+    return word
+
+def _undouble(word: str) -> str:
+    # running -> run, stopped -> stop (but not fall, miss, buzz)
+    if len(word) > 2 and word[-1] == word[-2] and word[-1] not in "lsz":
+        return word[:-1]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    """Casefolded, stemmed content words of text (possessives and stopwords dropped)"""
+    terms = []
+    for word in _WORD_RE.findall(text.casefold()):
+        word = word.split("'", 1)[0]
+        if word not in STOPWORDS and (len(word) > 1 or word.isdigit()):
+            terms.append(stem(word))
+    return terms
+
+
+class InvertedIndex:
+    """Incremental inverted index with BM25 ranking.
+
+    Documents are added and removed one at a time (optionally tagged with a
+    group such as a chat ID to filter on). Postings are packed into
+    array('I') runs of (doc number, term frequency); removed documents are
+    tombstoned and the postings compacted once they are mostly dead, so memory
+    stays around 8 bytes per (document, distinct term) pair plus the keys.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # term -> array('I') [doc, tf, doc, tf, ...]
+        self._keys = []  # doc number -> key (None once removed)
+        self._groups = []  # doc number -> group
+        self._lengths = array("I")  # doc number -> token count
+        self._docs = {}  # key -> doc number
+        self._by_group = {}  # group -> [doc numbers]
+        self._total_length = 0
+        self._dead = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._docs
+
+    def add(self, key: Hashable, text: str, group: Hashable = None) -> bool:
+        """Index text under key; False if key is already indexed"""
+        counts = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        length = sum(counts.values())
+
+        with self._lock:
+            if key in self._docs:
+                return False
+            doc = len(self._keys)
+            self._keys.append(key)
+            self._groups.append(group)
+            self._lengths.append(length)
+            self._docs[key] = doc
+            self._by_group.setdefault(group, []).append(doc)
+            self._total_length += length
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = array("I")
+                postings.append(doc)
+                postings.append(tf)
+            return True
+
+    def remove(self, key: Hashable) -> bool:
+        with self._lock:
+            doc = self._docs.pop(key, None)
+            if doc is None:
+                return False
+            self._tombstone(doc)
+            group_docs = self._by_group.get(self._groups[doc])
+            if group_docs is not None:
+                group_docs.remove(doc)
+                if not group_docs:
+                    del self._by_group[self._groups[doc]]
+            self._maybe_compact()
+            return True
+
+    def remove_group(self, group: Hashable) -> int:
+        """Remove every document of a group; returns how many were removed"""
+        with self._lock:
+            docs = self._by_group.pop(group, [])
+            for doc in docs:
+                del self._docs[self._keys[doc]]
+                self._tombstone(doc)
+            self._maybe_compact()
+            return len(docs)
+
+    def _tombstone(self, doc: int):
+        self._keys[doc] = None
+        self._groups[doc] = None
+        self._total_length -= self._lengths[doc]
+        self._dead += 1
+
+    def _maybe_compact(self):
+        if self._dead < 1024 or self._dead * 2 < len(self._keys):
+            return
+        # Renumber live documents and drop dead postings
+        renumber = {}
+        keys, groups, lengths = [], [], array("I")
+        for doc, key in enumerate(self._keys):
+            if key is not None:
+                renumber[doc] = len(keys)
+                keys.append(key)
+                groups.append(self._groups[doc])
+                lengths.append(self._lengths[doc])
+        postings = {}
+        for term, old in self._postings.items():
+            new = array("I")
+            for i in range(0, len(old), 2):
+                doc = renumber.get(old[i])
+                if doc is not None:
+                    new.append(doc)
+                    new.append(old[i + 1])
+            if new:
+                postings[term] = new
+        self._postings = postings
+        self._keys, self._groups, self._lengths = keys, groups, lengths
+        self._docs = {key: doc for doc, key in enumerate(keys)}
+        self._by_group = {}
+        for doc, group in enumerate(groups):
+            self._by_group.setdefault(group, []).append(doc)
+        self._dead = 0
+
+    def search(self, query: str, limit: int = 10, group: Hashable = None,
+               after: Optional[Tuple[float, Hashable]] = None) -> List[Tuple[float, Hashable]]:
+        """Best `limit` (score, key) pairs for query, highest first (ties: larger key first).
+
+        group restricts results to one group; after is the last (score, key) of
+        the previous page.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            live = len(self._docs)
+            if not terms or not live:
+                return []
+            average_length = self._total_length / live or 1.0
+            k1, b = self.k1, self.b
+            keys, groups, lengths = self._keys, self._groups, self._lengths
+
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings) // 2  # dead postings overcount slightly until compaction
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                for i in range(0, len(postings), 2):
+                    doc = postings[i]
+                    if keys[doc] is None or (group is not None and groups[doc] != group):
+                        continue
+                    tf = postings[i + 1]
+                    norm = k1 * (1 - b + b * lengths[doc] / average_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+            ranked = ((round(score, 6), keys[doc]) for doc, score in scores.items())
+            if after is not None:
+                ranked = (item for item in ranked if item < after)
+            return heapq.nlargest(limit, ranked)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "terms": len(self._postings),
+                "postings": sum(len(postings) for postings in self._postings.values()) // 2,
+                "tombstones": self._dead
+            }
+
+
+def snippet(text: str, query: str, width: int = 160) -> str:
+    """Window of text around the first query term, collapsed to one line"""
+    text = " ".join(text.split())
+    if len(text) <= width:
+        return text
+    terms = set(tokenize(query))
+    first = next((
+        match.start() for match in _WORD_RE.finditer(text)
+        if stem(match.group().casefold().split("'", 1)[0]) in terms
+    ), 0)
+    start = max(0, first - width // 4)
+    end = min(len(text), start + width)
+    start = max(0, end - width)
+    return ("…" if start else "") + text[start:end].strip() + ("…" if end < len(text) else "")
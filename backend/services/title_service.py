@@ -0,0 +1,173 @@
+import os
+import re
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+from bson import ObjectId
+
+from services.text_index import STOPWORDS as FUNCTION_WORDS
+
+logger = logging.getLogger(__name__)
+
+TITLE_MAX_WORDS = int(os.getenv("TITLE_MAX_WORDS", "4"))
+TITLE_MAX_CHARS = 30
+# Refine local titles with an LLM in the background (one call per chat at most)
+TITLE_LLM_REFINE = os.getenv("TITLE_LLM_REFINE", "true").lower() == "true"
+DEFAULT_TITLE = "New Chat"
+
+# Function words plus the request phrasing people wrap questions in ("can you explain...")
+STOPWORDS = FUNCTION_WORDS | frozenset("""
+please help tell explain show give write make create need want know like get let us
+hi hello hey thanks thank ok okay also really something anything way ways use using
+""".split())
+
+_URL_RE = re.compile(r"https?://\S+")
+_CODE_RE = re.compile(r"```.*?```", re.S)
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#'.-]*|[^\sA-Za-z0-9]")
+
+def _candidate_phrases(text: str) -> List[List[str]]:
+    """Runs of content words, split at stopwords and punctuation"""
+    phrases, current = [], []
+    for token in _TOKEN_RE.findall(text):
+        word = token.strip(".'-")
+        if not word or not word[0].isalnum() or word.lower() in STOPWORDS:
+            if current:
+                phrases.append(current)
+                current = []
+            continue
+        current.append(word)
+    if current:
+        phrases.append(current)
+    return phrases
+
+def _format(words: List[str]) -> str:
+    # Keep acronyms and mixed-case names (API, iPhone) as typed
+    title = " ".join(word if not word.islower() else word.capitalize() for word in words)
+    if len(title) > TITLE_MAX_CHARS:
+        title = title[:TITLE_MAX_CHARS - 3].rstrip() + "..."
+    return title
+
+def content_word_count(text: str) -> int:
+    return sum(len(phrase) for phrase in _candidate_phrases(_CODE_RE.sub(" ", _URL_RE.sub(" ", text))))
+
+def extract_title(text: str, max_words: int = TITLE_MAX_WORDS) -> str:
+    """Local extractive title: the best-scoring keyword phrases, in original order.
+
+    Phrases are scored RAKE-style (word degree / frequency), so multi-word
+    noun phrases such as "binary search tree" win over isolated words.
+    """
+    text = _CODE_RE.sub(" ", _URL_RE.sub(" ", text[:2000]))
+    phrases = _candidate_phrases(text)
+    if not phrases:
+        return DEFAULT_TITLE
+
+    frequency, degree = {}, {}
+    for phrase in phrases:
+        for word in phrase:
+            key = word.lower()
+            frequency[key] = frequency.get(key, 0) + 1
+            degree[key] = degree.get(key, 0) + len(phrase)
+
+    def score(phrase):
+        return sum(degree[word.lower()] / frequency[word.lower()] for word in phrase)
+
+    ranked = sorted(range(len(phrases)), key=lambda index: (-score(phrases[index]), index))
+    chosen, used, seen = [], 0, set()
+    for index in ranked:
+        phrase = [word for word in phrases[index] if word.lower() not in seen][:max_words - used]
+        if not phrase:
+            continue
+        chosen.append((index, phrase))
+        seen.update(word.lower() for word in phrase)
+        used += len(phrase)
+        if used >= max_words:
+            break
+
+    words = [word for _, phrase in sorted(chosen) for word in phrase]
+    return _format(words)
+
+def clean_llm_title(title: str, max_words: int = TITLE_MAX_WORDS) -> str:
+    """Normalize a model-written title to the same shape as local ones"""
+    words = title.strip().replace('"', '').replace("'", "").split()[:max_words]
+    return _format(words) if words else ""
+
+class TitleRefiner:
+    """Deduplicated background LLM titling.
+
+    schedule() returns immediately; at most one LLM title job runs per chat, and
+    chats that already got one are skipped. store(chat_id, title) persists the
+    result. Ids that are not stored chats (client-side ids, deleted chats) are
+    turned away before any LLM call: malformed ones in schedule(), and ones
+    exists(chat_id) doesn't find when the job starts.
+    """
+    def __init__(self, generate: Callable[[str, str], Awaitable[str]],
+                 store: Callable[[str, str], Awaitable[bool]],
+                 exists: Optional[Callable[[str], Awaitable[bool]]] = None, remember: int = 10000):
+        self._generate = generate
+        self._store = store
+        self._exists = exists
+        self._remember = remember
+        self._in_flight = {}  # chat_id -> asyncio.Task
+        self._done = OrderedDict()  # chat_ids already refined, bounded
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.skipped = 0
+        self.unknown = 0
+        self.failed = 0
+
+    def schedule(self, chat_id: str, content: str, model: str) -> bool:
+        """Start a background LLM title job for chat_id; False if not needed or already done"""
+        if not TITLE_LLM_REFINE or not chat_id:
+            return False
+        if not ObjectId.is_valid(chat_id):
+            self.unknown += 1
+            return False
+        if chat_id in self._in_flight or chat_id in self._done:
+            self.deduplicated += 1
+            return False
+        if content_word_count(content) <= TITLE_MAX_WORDS:
+            # The local title already is the whole message
+            self.skipped += 1
+            return False
+
+        self.scheduled += 1
+        task = asyncio.ensure_future(self._run(chat_id, content, model))
+        self._in_flight[chat_id] = task
+        return True
+
+    async def _run(self, chat_id: str, content: str, model: str):
+        try:
+            if self._exists is not None and not await self._exists(chat_id):
+                self.unknown += 1
+                return
+            title = clean_llm_title(await self._generate(content, model))
+            if title:
+                await self._store(chat_id, title)
+                logger.info(f"🏷️ Refined title for chat {chat_id}: {title}")
+        except Exception as e:
+            # The local title stays; nothing user-facing depends on this job
+            self.failed += 1
+            logger.warning(f"Background title generation failed for chat {chat_id}: {e}")
+        finally:
+            self._in_flight.pop(chat_id, None)
+            self._done[chat_id] = True
+            while len(self._done) > self._remember:
+                self._done.popitem(last=False)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "scheduled": self.scheduled,
+            "deduplicated": self.deduplicated,
+            "skipped_short": self.skipped,
+            "unknown_chat": self.unknown,
+            "failed": self.failed
+        }
+
+    async def aclose(self):
+        """Cancel outstanding title jobs"""
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,114 @@
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Tuple
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+# Largest accepted document; bodies over this (plus form overhead) are refused while still arriving
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Multipart boundaries, headers and the other form fields around the file
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+class UploadTooLarge(Exception):
+    pass
+
+def too_large_detail(max_bytes: int = UPLOAD_MAX_BYTES) -> str:
+    return f"File is larger than the {max_bytes / (1024 * 1024):.3g} MB upload limit"
+
+class UploadWriter:
+    """Writes an upload to a temp file in its final directory, hashing and counting as it goes.
+
+    commit() renames it atomically to a content-addressed name (sha256 of the
+    bytes plus the original extension), so readers never see a partial file and
+    identical uploads share one file. The md5 prefix is the document's file_id,
+    as before.
+    """
+    def __init__(self, directory: Path, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._md5 = hashlib.md5()
+        fd, self._temp_path = tempfile.mkstemp(dir=self.directory, prefix=".upload-")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(too_large_detail(self.max_bytes))
+        self._sha256.update(data)
+        self._md5.update(data)
+        self._file.write(data)
+
+    def copy(self, source: BinaryIO):
+        """Stream a file object in UPLOAD_CHUNK_BYTES reads"""
+        while True:
+            data = source.read(UPLOAD_CHUNK_BYTES)
+            if not data:
+                break
+            self.write(data)
+
+    def target(self, filename: str) -> str:
+        """Path commit() will move the upload to"""
+        return str(self.directory / f"{self._sha256.hexdigest()}{Path(filename).suffix.lower()}")
+
+    def commit(self, filename: str) -> Tuple[str, str]:
+        """Move the upload into place; returns (file_path, file_id)"""
+        self._file.close()
+        file_path = self.target(filename)
+        os.replace(self._temp_path, file_path)
+        return str(file_path), self._md5.hexdigest()[:10]
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.discard()
+
+class UploadSizeLimit:
+    """ASGI middleware refusing oversized upload bodies before they are parsed.
+
+    A declared Content-Length over the limit is answered with 413 without
+    reading the body; otherwise body bytes are counted as they arrive and the
+    request fails with 413 as soon as the count passes the limit, so the form
+    parser never spools more than that.
+    """
+    def __init__(self, app, paths=("/api/upload-document",), max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+        self.body_limit = max_bytes + UPLOAD_FORM_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.body_limit:
+            response = JSONResponse({"detail": too_large_detail(self.max_bytes)}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.body_limit:
+                    # Re-raised untouched by FastAPI's body parsing; the exception handler answers 413
+                    raise HTTPException(status_code=413, detail=too_large_detail(self.max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,6 +1,6 @@
 
-import requests
 from bs4 import BeautifulSoup
+from services.provider_registry import provider_registry
 import json
 import logging
 from typing import List, Dict, Optional
@@ -24,7 +24,7 @@ class WebSearchService:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
             
-            response = requests.get(url, headers=headers, timeout=self.timeout)
+            response = provider_registry.session("web").get(url, headers=headers, timeout=self.timeout)
             data = response.json()
             
             results = []
@@ -63,7 +63,7 @@ class WebSearchService:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
             
-            response = requests.get(search_url, headers=headers, timeout=self.timeout)
+            response = provider_registry.session("web").get(search_url, headers=headers, timeout=self.timeout)
             soup = BeautifulSoup(response.content, 'html.parser')
             
             results = []
@@ -102,7 +102,7 @@ class WebSearchService:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
             
-            response = requests.get(search_url, headers=headers, timeout=self.timeout)
+            response = provider_registry.session("web").get(search_url, headers=headers, timeout=self.timeout)
             soup = BeautifulSoup(response.content, 'html.parser')
             
             results = []
@@ -4,6 +4,7 @@ import { Send, Plus, FileAudio, FileImage, File, Link, Archive } from "lucide-re
 import { FormEvent, useState, useRef, useEffect } from "react";
 import { useToast } from "@/hooks/use-toast";
 import { apiClient } from "@/services/apiClient";
+import { apiService } from "@/services/api";
 import { FileProcessor } from "@/services/fileProcessor";
 import { UrlContentService } from "@/services/urlContentService";
 import { 
@@ -145,7 +146,7 @@ export default function ChatInput({ onSend, disabled = false, rewriteMessage, on
               },
             });
 
-            const { filename, chunk_count } = response.data;
+            const { filename, chunk_count } = await apiService.waitForDocumentJob(response.data.job_id);
             
             toast({
               title: "Document processed for AI context",
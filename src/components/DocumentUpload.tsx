@@ -5,6 +5,7 @@ import { Input } from "@/components/ui/input";
 import { FileText, Upload, CheckCircle, AlertCircle } from "lucide-react";
 import { useToast } from "@/components/ui/use-toast";
 import { apiClient } from "@/services/apiClient";
+import { apiService } from "@/services/api";
 
 interface DocumentUploadProps {
   onUploadSuccess?: (filename: string, chunkCount: number) => void;
@@ -54,7 +55,7 @@ export default function DocumentUpload({ onUploadSuccess }: DocumentUploadProps)
         },
       });
 
-      const { filename, chunk_count } = response.data;
+      const { filename, chunk_count } = await apiService.waitForDocumentJob(response.data.job_id);
       
       setUploadedFiles(prev => [...prev, filename]);
       
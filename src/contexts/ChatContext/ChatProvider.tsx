@@ -94,9 +94,9 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
   };
 
   // Generate title for chat based on content
-  const generateChatTitle = async (content: string, model: ModelType): Promise<string> => {
+  const generateChatTitle = async (content: string, model: ModelType, chatId?: string): Promise<string> => {
     try {
-      const response = await apiService.generateTitle(content, model);
+      const response = await apiService.generateTitle(content, model, chatId);
       return response.title || 'New Chat';
     } catch (error) {
       console.error('Failed to generate title:', error);
@@ -167,7 +167,7 @@ export function ChatProvider({ children }: { children: React.ReactNode }) {
               
               // Generate new title if needed
               if (shouldUpdateTitle) {
-                generateChatTitle(message.content, chat.model).then(newTitle => {
+                generateChatTitle(message.content, chat.model, chatId).then(newTitle => {
                   setChats(prevChats => prevChats.map(c => 
                     c.id === chatId ? { ...c, title: newTitle } : c
                   ));
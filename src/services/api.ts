@@ -113,6 +113,38 @@ class ApiService {
     return response.json();
   }
 
+  async forkChat(chatId: string, messageId?: string, title?: string) {
+    const response = await fetch(`${API_BASE_URL}/chats/${chatId}/fork`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ message_id: messageId, title }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to fork chat");
+    }
+
+    return response.json();
+  }
+
+  async deleteChats(chatIds: string[]) {
+    const response = await fetch(`${API_BASE_URL}/chats/bulk-delete`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({ chat_ids: chatIds }),
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to delete chats");
+    }
+
+    return response.json();
+  }
+
   async updateSystemPrompt(chatId: string, systemPrompt: string) {
     const response = await fetch(`${API_BASE_URL}/chats/${chatId}/system-prompt`, {
       method: "PATCH",
@@ -150,7 +182,7 @@ class ApiService {
     return response.json();
   }
 
-  async generateTitle(content: string, model: string = "groq-llama") {
+  async generateTitle(content: string, model: string = "groq-llama", chatId?: string) {
     const response = await fetch(`${API_BASE_URL}/generate-title`, {
       method: "POST",
       headers: {
@@ -159,6 +191,7 @@ class ApiService {
       body: JSON.stringify({
         content,
         model,
+        chat_id: chatId,
       }),
     });
 
@@ -183,6 +216,43 @@ class ApiService {
       throw new Error("Failed to upload document");
     }
 
+    // Ingestion runs in the background; resolve once the document is searchable
+    const job = await response.json();
+    return this.waitForDocumentJob(job.job_id);
+  }
+
+  async getDocumentJob(jobId: string) {
+    const response = await fetch(`${API_BASE_URL}/documents/jobs/${jobId}`);
+
+    if (!response.ok) {
+      throw new Error("Failed to fetch document job");
+    }
+
+    return response.json();
+  }
+
+  async waitForDocumentJob(jobId: string, intervalMs = 500) {
+    while (true) {
+      const job = await this.getDocumentJob(jobId);
+      if (job.status === "done") {
+        return job;
+      }
+      if (job.status === "failed" || job.status === "cancelled") {
+        throw new Error(job.error || `Document processing ${job.status}`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  }
+
+  async cancelDocumentJob(jobId: string) {
+    const response = await fetch(`${API_BASE_URL}/documents/jobs/${jobId}`, {
+      method: "DELETE",
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to cancel document job");
+    }
+
     return response.json();
   }
 